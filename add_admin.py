@@ -1,13 +1,16 @@
 from services.auth_service import AuthService
-from database.connection import get_db_connection
+from database.connection import db_connection, close_db
 import asyncio
 
 
 async def create_admin():
-    conn = await get_db_connection()
-    service = AuthService(conn)
-    await service.create_user("admin", "admin123")
-    print("admin created")
+    try:
+        async with db_connection() as conn:
+            service = AuthService(conn)
+            await service.create_user("admin", "admin123")
+        print("admin created")
+    finally:
+        await close_db()
 
 
 asyncio.run(create_admin())
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
 from services.auth_service import AuthService
+from services.login_throttle import login_throttle
+from services.session_service import create_session_token
+from deps.auth import get_current_user
 from deps.db import get_db
 from config.config import load_config
 
@@ -10,6 +13,7 @@ config = load_config()
 @router.post("/login")
 async def login(
     payload: dict,
+    request: Request,
     response: Response,
     conn=Depends(get_db),
 ):
@@ -19,15 +23,28 @@ async def login(
     if not username or not password:
         raise HTTPException(status_code=400, detail="Username and password required")
 
+    ip = request.client.host if request.client else None
+    retry_after = login_throttle.check(username, ip)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+
     service = AuthService(conn)
     user = await service.authenticate(username, password)
 
     if not user:
+        login_throttle.record_failure(username, ip)
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    login_throttle.reset(username)
+
     response.set_cookie(
         key=config.auth.cookie_name,
-        value=str(user["id"]),
+        value=create_session_token(user["id"]),
+        max_age=config.auth.session_ttl,
         httponly=True,
         samesite="lax",
     )
@@ -42,16 +59,5 @@ async def logout(response: Response):
 
 
 @router.get("/me")
-async def me(request: Request, conn=Depends(get_db)):
-    user_id = request.cookies.get(config.auth.cookie_name)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-
-    row = await conn.fetchrow(
-        "SELECT id, username FROM users WHERE id=$1",
-        int(user_id),
-    )
-    if not row:
-        raise HTTPException(status_code=401, detail="Invalid session")
-
-    return {"id": row["id"], "username": row["username"]}
+async def me(user=Depends(get_current_user)):
+    return {"id": user["id"], "username": user["username"]}
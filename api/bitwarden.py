@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
 from api.schemas.bitwarden import (
     CreateLoginRequest,
     CreateLoginResponse,
+    BulkCreateLoginRequest,
+    BulkCreateLoginResponse,
 )
 import logging
 from deps.bitwarden import get_bitwarden_client
@@ -10,6 +13,7 @@ from services.bitwarden_vault_client import (
     BitwardenVaultLocked,
     BitwardenVaultError,
 )
+from services.bitwarden_service import BatchInProgressError, create_bitwarden_logins
 from config.config import load_config
 from deps.auth import get_current_user
 
@@ -27,21 +31,19 @@ config = load_config()
     "/logins",
     response_model=CreateLoginResponse,
 )
-def create_bitwarden_login(
+async def create_bitwarden_login(
         payload: CreateLoginRequest,
         client: BitwardenVaultClient = Depends(get_bitwarden_client),
 ):
     try:
-        logger.info(f"Создание пароля BitWarden для")
-        item = client.create_login(
-            organization_id=config.btw.organization_id,
-            collection_id=config.btw.collection_id,
+        logger.info(f"Создание пароля BitWarden для {payload.username}")
+        item = await client.create_login(
             name=payload.name,
             username=payload.username,
             password=payload.password,
             notes=payload.notes,
         )
-        logger.info(f"✅ Пароль BitWarden для создан!")
+        logger.info(f"✅ Пароль BitWarden для {payload.username} создан!")
     except BitwardenVaultLocked:
         raise HTTPException(
             status_code=503,
@@ -57,3 +59,41 @@ def create_bitwarden_login(
         "id": item["id"],
         "name": item["name"],
     }
+
+
+@router.post(
+    "/logins/bulk",
+    response_model=BulkCreateLoginResponse,
+)
+async def create_bitwarden_logins_bulk(
+        payload: BulkCreateLoginRequest,
+        idempotency_key: Optional[str] = Header(None, max_length=200),
+        client: BitwardenVaultClient = Depends(get_bitwarden_client),
+):
+    """
+    Создать несколько записей за один запрос.
+
+    Заголовок Idempotency-Key делает повтор пакета безопасным:
+    уже созданные записи не дублируются. Пока пакет с тем же ключом
+    выполняется, повтор получает 409.
+    """
+    if len(payload.items) > config.btw.bulk_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: maximum is {config.btw.bulk_max_items}",
+        )
+
+    logger.info(f"Массовое создание паролей BitWarden: {len(payload.items)} записей")
+    try:
+        result = await create_bitwarden_logins(
+            client,
+            [item.model_dump() for item in payload.items],
+            idempotency_key,
+        )
+    except BatchInProgressError:
+        raise HTTPException(status_code=409, detail="Batch in progress")
+    logger.info(
+        f"✅ Массовое создание BitWarden: создано {result['created']}, "
+        f"уже было {result['existing']}, ошибок {result['failed']}"
+    )
+    return result
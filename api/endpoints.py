@@ -1,9 +1,9 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Depends, Request
 import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from ldap3 import Server, Connection, ALL, Tls
-import socket
+import re
+import uuid
 
 from api.models import (
     UserCreateRequest,
@@ -11,24 +11,46 @@ from api.models import (
     PositionResponse,
     MailCreateRequest,
     MailResponse,
-    EmployeeSearchResponse, ADGroupRuleCreate
+    EmployeeSearchResponse, ADGroupRuleCreate,
+    BulkRegisterResponse
 )
 from services.mail_service import create_mail_account_async
-from services.ad_service import create_ad_account
-from services.bitwarden_service import create_bitwarden_password
+from services.provisioning_worker import build_provisioning_jobs
+from services.health_prober import (
+    get_health_prober,
+    BACKEND_AD,
+    BACKEND_DATABASE,
+    BACKEND_MAIL,
+    STATUS_ERROR,
+    STATUS_OK,
+)
+from services.ad_group_resolver import MATCH_ANY, MATCH_REGEX, compile_pattern, invalidate_group_rules
+from services.provisioning_trace import build_timeline, span, start_trace
+from services.stats_service import get_statistics_snapshot
+from services.bulk_onboarding import ingest_bulk_upload, BulkUploadError, FORMAT_CSV, FORMAT_JSONL
 from database.db import (
     search_employees,
     create_employee_record,
     add_mail_to_employee,
     get_employee_by_login,
-    get_employee_statistics,
-    get_employees_paginated
+    get_employees_paginated,
+    enqueue_provisioning_job,
+    get_onboarding_batch_progress,
+    get_operation_logs,
+    get_provisioning_spans,
+    SEARCH_MODE_CONTAINS,
+    SEARCH_MODE_PREFIX,
+    TOTAL_EXACT,
+    TOTAL_ESTIMATE,
+    TOTAL_NONE
 )
-from database.connection import get_db_connection
+from database.connection import db_connection
+from deps.auth import get_current_user
 from config.config import load_config
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
+config = load_config()
 
 # Предопределенные должности
 POSITIONS = [
@@ -70,13 +92,9 @@ async def get_positions():
 async def get_statistics():
     """Получить статистику системы"""
     try:
-        conn = await get_db_connection()
-        try:
-            stats = await get_employee_statistics(conn)
-            stats["last_registration"] = datetime.now().isoformat()
-            return stats
-        finally:
-            await conn.close()
+        stats = await get_statistics_snapshot()
+        stats["last_registration"] = datetime.now().isoformat()
+        return stats
     except Exception as e:
         logger.error(f"Ошибка получения статистики: {e}")
         return {
@@ -91,15 +109,14 @@ async def get_statistics():
 @router.get("/search", response_model=List[EmployeeSearchResponse], tags=["employees"])
 async def search_employees_endpoint(
         q: str = Query(..., description="Поисковый запрос"),
-        limit: int = Query(10, ge=1, le=50)
+        limit: int = Query(10, ge=1, le=50),
+        mode: str = Query(SEARCH_MODE_CONTAINS, pattern=f"^({SEARCH_MODE_CONTAINS}|{SEARCH_MODE_PREFIX})$",
+                          description="contains — подстрока, prefix — автодополнение с ранжированием")
 ):
     try:
-        conn = await get_db_connection()
-        try:
-            employees = await search_employees(conn, q, limit)
+        async with db_connection() as conn:
+            employees = await search_employees(conn, q, limit, mode)
             return employees
-        finally:
-            await conn.close()
     except Exception as e:
         logger.error(f"Ошибка поиска сотрудников: {str(e)}")
         raise HTTPException(status_code=500, detail="Ошибка поиска сотрудников")
@@ -108,23 +125,46 @@ async def search_employees_endpoint(
 @router.get("/employees", tags=["employees"])
 async def get_employees_list(
         page: int = Query(1, ge=1),
-        size: int = Query(20, ge=1, le=100)
+        size: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа (keyset-пагинация)"),
+        total: str = Query(TOTAL_EXACT, pattern=f"^({TOTAL_EXACT}|{TOTAL_ESTIMATE}|{TOTAL_NONE})$",
+                           description="exact — точное (кэшируется), estimate — оценка, none — без подсчёта")
 ):
     try:
         offset = (page - 1) * size
-        conn = await get_db_connection()
-        try:
-            data = await get_employees_paginated(conn, size, offset)
+        async with db_connection() as conn:
+            data = await get_employees_paginated(conn, size, offset, cursor, total)
             return data
-        finally:
-            await conn.close()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Ошибка загрузки списка сотрудников: {str(e)}")
         raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
 
 
+@router.get("/audit", tags=["audit"], dependencies=[Depends(get_current_user)])
+async def get_audit_log(
+        size: int = Query(50, ge=1, le=500),
+        cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа"),
+        employee_id: Optional[int] = Query(None),
+        service: Optional[str] = Query(None, max_length=50),
+        status: Optional[str] = Query(None, max_length=20),
+        since: Optional[datetime] = Query(None, description="Начало интервала (включительно)"),
+        until: Optional[datetime] = Query(None, description="Конец интервала (не включительно)")
+):
+    """Журнал операций, новые записи первыми"""
+    try:
+        async with db_connection() as conn:
+            return await get_operation_logs(conn, size, cursor, employee_id, service, status, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка чтения журнала операций: {str(e)}")
+        raise HTTPException(status_code=500, detail="Ошибка загрузки журнала")
+
+
 @router.post("/register", response_model=UserResponse, tags=["registration"])
-async def register_user(user: UserCreateRequest, background_tasks: BackgroundTasks):
+async def register_user(user: UserCreateRequest):
     try:
         from core.utils import generate_login
         from core.utils import generate_password
@@ -137,19 +177,31 @@ async def register_user(user: UserCreateRequest, background_tasks: BackgroundTas
 
         email = f"{login}@company.ru"
 
-        conn = await get_db_connection()
-        try:
-            employee_id = await create_employee_record(
-                conn=conn,
-                last_name=user.lastName,
-                first_name=user.firstName,
-                middle_name=user.middleName,
-                login=login,
-                email=email if user.mailRequired else None,
-                position=user.position,
-            )
-        finally:
-            await conn.close()
+        # Запись сотрудника и задачи провижининга фиксируются одной транзакцией,
+        # выполнение задач берут на себя воркеры (worker.py); шаги воркеров
+        # попадают в ту же трассу через trace_id задачи
+        with start_trace() as trace:
+            async with db_connection(transaction=True) as conn:
+                with span("employee.create"):
+                    employee_id = await create_employee_record(
+                        conn=conn,
+                        last_name=user.lastName,
+                        first_name=user.firstName,
+                        middle_name=user.middleName,
+                        login=login,
+                        email=email if user.mailRequired else None,
+                        position=user.position,
+                    )
+                trace.employee_id = employee_id
+
+                with span("jobs.enqueue"):
+                    jobs = build_provisioning_jobs(user, login, email, employee_id, config.queue.max_attempts)
+                    for kind, payload, max_attempts in jobs:
+                        await enqueue_provisioning_job(
+                            conn, kind, payload, employee_id, max_attempts, trace.trace_id
+                        )
+
+                await trace.save(conn)
 
         response_data = {
             "status": "processing",
@@ -159,17 +211,6 @@ async def register_user(user: UserCreateRequest, background_tasks: BackgroundTas
             "message": "Регистрация пользователя начата"
         }
 
-        if user.adRequired:
-            background_tasks.add_task(create_ad_account, user.lastName, user.firstName, login, user.position,
-                                      employee_id, password)
-
-        if user.mailRequired:
-            background_tasks.add_task(create_mail_account_async, user.lastName, user.firstName, login, user.position,
-                                      email, employee_id, password)
-
-        if user.bitwardenRequired:
-            background_tasks.add_task(create_bitwarden_password, login, password, user.position)
-
         return UserResponse(**response_data)
 
     except Exception as e:
@@ -177,29 +218,63 @@ async def register_user(user: UserCreateRequest, background_tasks: BackgroundTas
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/register/bulk", response_model=BulkRegisterResponse, tags=["registration"])
+async def register_users_bulk(
+        request: Request,
+        format: Optional[str] = Query(None, description="csv или jsonl (по умолчанию по Content-Type)")
+):
+    """
+    Массовая регистрация из CSV (с заголовком) или JSONL с полями UserCreateRequest.
+
+    Файл передаётся телом запроса и обрабатывается потоково; провижининг
+    выполняется воркерами очереди, прогресс — GET /register/bulk/{batch_id}
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = FORMAT_JSONL if ("ndjson" in content_type or "jsonl" in content_type) else FORMAT_CSV
+
+    try:
+        return await ingest_bulk_upload(request.stream(), format)
+    except BulkUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка массовой регистрации: {str(e)}")
+        raise HTTPException(status_code=500, detail="Ошибка массовой регистрации")
+
+
+@router.get("/register/bulk/{batch_id}", tags=["registration"])
+async def get_bulk_register_progress(batch_id: str):
+    """Прогресс массовой регистрации по строкам"""
+    try:
+        batch_uuid = str(uuid.UUID(batch_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Пакет не найден")
+
+    async with db_connection() as conn:
+        progress = await get_onboarding_batch_progress(conn, batch_uuid)
+
+    if not progress:
+        raise HTTPException(status_code=404, detail="Пакет не найден")
+    return progress
+
+
 @router.post("/create-mail-only", response_model=MailResponse, tags=["mail"])
 async def create_mail_only(mail_request: MailCreateRequest, background_tasks: BackgroundTasks):
     try:
-        conn = await get_db_connection()
         employee = None
-        try:
+        async with db_connection() as conn:
             if mail_request.login:
                 employee = await get_employee_by_login(conn, mail_request.login)
             if not employee and mail_request.lastName and mail_request.firstName:
                 gen_login = f"{mail_request.lastName.lower()}.{mail_request.firstName[0].lower()}"
                 employee = await get_employee_by_login(conn, gen_login)
-        finally:
-            await conn.close()
 
         domain = mail_request.domain or "company.ru"
         email = f"{mail_request.login}@{domain}"
 
         if employee:
-            conn = await get_db_connection()
-            try:
+            async with db_connection() as conn:
                 await add_mail_to_employee(conn, employee["id"], email, mail_request.password)
-            finally:
-                await conn.close()
 
         background_tasks.add_task(
             create_mail_account_async,
@@ -227,61 +302,29 @@ async def create_mail_only(mail_request: MailCreateRequest, background_tasks: Ba
 # === ЭНДПОИНТ ПРОВЕРКИ ===
 @router.get("/test-connections", tags=["system"])
 async def test_system_connections():
-    """Реальная проверка подключения ко всем системам"""
-    results = {
-        "database": "unknown",
-        "mail_service": "unknown",
-        "ad_service": "unknown",
-        "timestamp": datetime.now().isoformat()
-    }
-
-    config = load_config()
+    """Состояние подключений ко всем системам (последний снимок фоновой проверки)"""
+    backends = get_health_prober().snapshot()
 
-    # 1. Честная проверка БД
-    try:
-        conn = await get_db_connection()
-        await conn.execute("SELECT 1")
-        await conn.close()
-        results["database"] = "connected"
-    except Exception as e:
-        logger.error(f"DB Check fail: {e}")
-        results["database"] = "error"
-
-    # 2. Честная проверка Active Directory (LDAP)
-    try:
-        # Устанавливаем короткий таймаут, чтобы не вешать API
-        server = Server(config.ad.server, get_info=ALL, connect_timeout=3)
-        # Пытаемся просто подключиться (без логина, чтобы проверить доступность порта)
-        conn_ad = Connection(
-            server,
-            user=config.ad.admin_user,
-            password=config.ad.admin_password,
-            auto_bind=True
-        )
-        results["ad_service"] = "connected"
-        conn_ad.unbind()
-    except Exception as e:
-        logger.error(f"AD Connection fail ({config.ad.server}): {e}")
-        results["ad_service"] = "offline"
+    def state(name: str, ok: str, error: str) -> str:
+        status = backends[name]["status"]
+        return ok if status == STATUS_OK else error if status == STATUS_ERROR else status
 
-    # 3. Проверка Mail.ru API (проверяем доступность хоста biz.mail.ru)
-    try:
-        # Пытаемся разрешить DNS имя или проверить порт 443
-        socket.create_connection(("biz.mail.ru", 443), timeout=3)
-        if config.mail.api_key and config.mail.api_key != "your_api_key":
-            results["mail_service"] = "available"
-        else:
-            results["mail_service"] = "auth_error (check keys)"
-    except Exception:
-        results["mail_service"] = "unreachable"
+    mail_state = state(BACKEND_MAIL, "available", "unreachable")
+    if mail_state == "available" and not backends[BACKEND_MAIL].get("configured"):
+        mail_state = "auth_error (check keys)"
 
-    return results
+    return {
+        "database": state(BACKEND_DATABASE, "connected", "error"),
+        "mail_service": mail_state,
+        "ad_service": state(BACKEND_AD, "connected", "offline"),
+        "backends": backends,
+        "timestamp": datetime.now().isoformat()
+    }
 
 
 @router.get("/settings", tags=["system"])
 async def get_system_settings():
     """Получить текущие настройки"""
-    config = load_config()
     return {
         "mail_domain": "company.ru",
         "ad_domain": config.ad.domain,
@@ -293,46 +336,71 @@ async def get_system_settings():
 @router.get("/employee/{login}", tags=["employees"])
 async def get_employee_details(login: str):
     try:
-        conn = await get_db_connection()
-        try:
+        async with db_connection() as conn:
             employee = await get_employee_by_login(conn, login)
             if not employee:
                 raise HTTPException(status_code=404, detail="Сотрудник не найден")
             return employee
-        finally:
-            await conn.close()
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Ошибка получения: {str(e)}")
         raise HTTPException(status_code=500, detail="Ошибка сервера")
 
+
+@router.get("/employee/{login}/timeline", tags=["employees"])
+async def get_employee_timeline(login: str):
+    """Водопад шагов регистрации сотрудника: смещение и длительность каждого шага"""
+    try:
+        async with db_connection() as conn:
+            employee = await get_employee_by_login(conn, login)
+            if not employee:
+                raise HTTPException(status_code=404, detail="Сотрудник не найден")
+            spans = await get_provisioning_spans(conn, employee["id"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка получения трассы: {str(e)}")
+        raise HTTPException(status_code=500, detail="Ошибка сервера")
+
+    return {
+        "login": login,
+        "employee_id": employee["id"],
+        "traces": build_timeline(spans),
+    }
+
 @router.post("/ad-group-rules", tags=["ad"])
 async def create_ad_group_rule(rule: ADGroupRuleCreate):
-    conn = await get_db_connection()
-    try:
+    if rule.match_type == MATCH_ANY:
+        rule.position = None
+    elif rule.position is None:
+        raise HTTPException(status_code=400, detail="Укажите должность или match_type=any")
+
+    if rule.match_type == MATCH_REGEX:
+        try:
+            compile_pattern(rule.position)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Некорректный шаблон должности: {e}")
+
+    async with db_connection() as conn:
         await conn.execute("""
             INSERT INTO ad_group_rules
-            (position, ad_groups, priority)
-            VALUES ($1, $2, $3)
-        """, rule.position, rule.ad_groups, rule.priority)
+            (position, ad_groups, priority, match_type, merge)
+            VALUES ($1, $2, $3, $4, $5)
+        """, rule.position, rule.ad_groups, rule.priority, rule.match_type, rule.merge)
 
-        return {"success": True}
-    finally:
-        await conn.close()
+    invalidate_group_rules()
+    return {"success": True}
 
 
 @router.get("/ad-group-rules", tags=["ad"])
 async def list_ad_group_rules():
-    conn = await get_db_connection()
-    try:
+    async with db_connection() as conn:
         return await conn.fetch("""
             SELECT * FROM ad_group_rules
             WHERE is_active = TRUE
             ORDER BY priority ASC
         """)
-    finally:
-        await conn.close()
 
 @router.get("/generate-password", tags=["registration"])
 async def generate_password_endpoint():
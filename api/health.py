@@ -1,22 +1,43 @@
 from fastapi import APIRouter, HTTPException
-from services.bitwarden_vault_client import BitwardenVaultClient
+from database.connection import get_pool_stats
+from database.audit_log import get_audit_sink
+from services.health_prober import get_health_prober, BACKEND_BITWARDEN, STATUS_OK
 
 router = APIRouter(tags=["health"])
 
 
 @router.get("/health/bitwarden")
 def bitwarden_health():
-    client = BitwardenVaultClient()
+    """Состояние Bitwarden из последней фоновой проверки"""
+    probe = get_health_prober().backend(BACKEND_BITWARDEN)
 
-    try:
-        status = client.status()
-    except Exception as e:
+    if probe["status"] != STATUS_OK:
         raise HTTPException(
             status_code=503,
-            detail=f"Bitwarden unavailable: {str(e)}",
+            detail=f"Bitwarden unavailable: {probe['error'] or probe['status']}",
         )
 
     return {
         "status": "ok",
-        "vault": status,
+        "vault": probe["vault"],
+        "latency_ms": probe["latency_ms"],
+        "checked_at": probe["checked_at"],
+    }
+
+
+@router.get("/health/db")
+def db_pool_health():
+    """Состояние пула соединений БД: занятые, ожидание, созданные соединения"""
+    return {
+        "status": "ok",
+        "pool": get_pool_stats(),
+    }
+
+
+@router.get("/health/audit")
+def audit_log_health():
+    """Очередь журнала операций: записано, в очереди, переполнения, ошибки"""
+    return {
+        "status": "ok",
+        "audit": get_audit_sink().stats(),
     }
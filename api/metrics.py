@@ -0,0 +1,135 @@
+import logging
+import time
+from typing import Dict
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from core.metrics import REGISTRY, Counter, Gauge, Histogram
+from database.connection import db_connection
+from database.db import get_provisioning_queue_depth
+from services.process_metrics import CONTENT_TYPE
+from services.provisioning_worker import HANDLERS
+
+router = APIRouter(tags=["health"])
+logger = logging.getLogger(__name__)
+
+# Таймаут ожидания соединения для подсчёта очереди при выгрузке
+QUEUE_DEPTH_TIMEOUT = 1.0
+
+# -------------------------
+# HTTP
+# -------------------------
+HTTP_SECONDS = Histogram(
+    "staffflow_http_request_duration_seconds",
+    "Длительность обработки HTTP-запросов по маршрутам",
+    ("method", "route"),
+)
+HTTP_RESPONSES = Counter(
+    "staffflow_http_responses_total",
+    "HTTP-ответы по маршрутам и классу статуса",
+    ("method", "route", "status"),
+)
+
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class RouteMetrics:
+    """Метрики одного маршрута и метода; создаются при старте приложения"""
+    __slots__ = ("seconds", "responses")
+
+    def __init__(self, method: str, route: str):
+        self.seconds = HTTP_SECONDS.labels(method, route)
+        self.responses = [HTTP_RESPONSES.labels(method, route, status) for status in STATUS_CLASSES]
+
+    def observe(self, started: float, status: int):
+        self.seconds.observe(time.perf_counter() - started)
+        self.responses[min(max(status // 100, 1), 5) - 1].inc()
+
+
+# id маршрута -> метод -> метрики (APIRoute не хэшируется). Метрики роутеров
+# API заводятся при старте (instrument_router), остальных маршрутов — при
+# первом запросе; дальше они только обновляются. Запросы мимо маршрутов
+# (статика, 404, 405) учитываются в UNMATCHED
+_routes: Dict[int, Dict[str, RouteMetrics]] = {}
+UNMATCHED = RouteMetrics("*", "unmatched")
+
+
+def instrument_router(router: APIRouter, prefix: str = ""):
+    """Завести метрики всех маршрутов роутера (prefix — как в include_router)"""
+    for route in router.routes:
+        methods = getattr(route, "methods", None) or ()
+        _routes[id(route)] = {method: RouteMetrics(method, prefix + route.path) for method in methods}
+
+
+def _route_metrics(route, method: str) -> RouteMetrics:
+    if method not in (getattr(route, "methods", None) or ()):
+        return UNMATCHED
+    metrics = RouteMetrics(method, route.path)
+    _routes.setdefault(id(route), {})[method] = metrics
+    return metrics
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержка и классы статусов ответов по шаблонам маршрутов"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Маршрут записывается в scope при сопоставлении
+            route = scope.get("route")
+            methods = _routes.get(id(route))
+            metrics = methods.get(scope["method"]) if methods else None
+            (metrics or _route_metrics(route, scope["method"])).observe(started, status)
+
+
+# -------------------------
+# Очередь провижининга
+# -------------------------
+PROVISIONING_JOBS = Gauge(
+    "staffflow_provisioning_jobs",
+    "Незавершённые задачи провижининга по типу и статусу",
+    ("kind", "status"),
+)
+for _kind in HANDLERS:
+    for _status in ("queued", "running"):
+        PROVISIONING_JOBS.labels(_kind, _status)
+
+
+async def _collect_provisioning_jobs():
+    """Очередь провижининга живёт в БД и общая для всех воркеров — считаем при выгрузке"""
+    try:
+        async with db_connection(timeout=QUEUE_DEPTH_TIMEOUT) as conn:
+            rows = await get_provisioning_queue_depth(conn)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось получить размер очереди провижининга: {e}")
+        return
+
+    for series in PROVISIONING_JOBS.children():
+        series.set(0)
+    for row in rows:
+        PROVISIONING_JOBS.labels(row["kind"], row["status"]).set(row["cnt"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики процесса в формате Prometheus"""
+    await _collect_provisioning_jobs()
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,11 +1,14 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class ADGroupRuleCreate(BaseModel):
-    position: Optional[str]
+    position: Optional[str] = Field(None, description="Должность или шаблон; для match_type=any не указывается")
     ad_groups: List[str]
     priority: int = 100
+    match_type: Literal["exact", "prefix", "regex", "any"] = Field(
+        "exact", description="Способ сопоставления должности; any — правило для всех должностей")
+    merge: bool = Field(False, description="Добавлять группы к правилу с более высоким приоритетом")
 
 class UserCreateRequest(BaseModel):
     """Модель для создания пользователя"""
@@ -38,6 +41,16 @@ class UserResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
+class BulkRegisterResponse(BaseModel):
+    """Модель ответа массовой регистрации"""
+    batch_id: str
+    status: str
+    total: int
+    accepted: int
+    rejected: int
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+
 class MailResponse(BaseModel):
     """Модель ответа для создания почты"""
     success: bool
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class CreateLoginRequest(BaseModel):
@@ -14,3 +14,23 @@ class CreateLoginRequest(BaseModel):
 class CreateLoginResponse(BaseModel):
     id: str
     name: str
+
+
+class BulkCreateLoginRequest(BaseModel):
+    items: List[CreateLoginRequest] = Field(..., min_length=1, description="Logins to create")
+
+
+class BulkCreateLoginResult(BaseModel):
+    index: int
+    status: str = Field(..., description="created, existing or failed")
+    id: Optional[str] = None
+    name: str
+    error: Optional[str] = None
+
+
+class BulkCreateLoginResponse(BaseModel):
+    total: int
+    created: int
+    existing: int
+    failed: int
+    items: List[BulkCreateLoginResult]
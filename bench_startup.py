@@ -0,0 +1,109 @@
+"""
+Замер времени старта StaffFlow.
+
+1. Время импорта main (python -X importtime) — медиана по нескольким
+   запускам и самые тяжёлые модули. Дополнительно проверяется, что
+   клиенты бэкендов (aiohttp, ldap3, bcrypt, requests) не загружаются
+   при импорте.
+2. Время до первого ответа — от запуска uvicorn до первого 200 на /health
+   (нужна доступная БД: lifespan создаёт пул и таблицы).
+
+    python bench_startup.py --runs 5 --port 8765
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+LAZY_MODULES = ("aiohttp", "ldap3", "bcrypt", "requests")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(runs: int, top: int):
+    totals = []
+    modules = {}
+    loaded = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            sys.exit(f"❌ Импорт main завершился ошибкой:\n{result.stderr}")
+
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if not cumulative.strip().isdigit():
+                continue
+            name = name.rstrip()
+            module = name.strip()
+            # Только модули проекта и пакеты верхнего уровня
+            if not name.startswith("    ") or module.split(".")[0] in ("api", "services", "database", "config"):
+                modules.setdefault(module, []).append(int(cumulative) / 1000)
+            if module in LAZY_MODULES:
+                loaded.add(module)
+            if module == "main":
+                totals.append(int(cumulative) / 1000)
+
+    print(f"Импорт main: медиана {statistics.median(totals):.0f} мс "
+          f"(мин {min(totals):.0f}, макс {max(totals):.0f}, запусков {runs})")
+    heaviest = sorted(modules.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, times in heaviest[1:top + 1]:
+        print(f"  {statistics.median(times):8.1f} мс  {name}")
+
+    if loaded:
+        print(f"⚠️ При импорте загружены клиенты бэкендов: {', '.join(sorted(loaded))}")
+    else:
+        print(f"✅ Клиенты бэкендов не загружаются при импорте ({', '.join(LAZY_MODULES)})")
+
+
+def measure_first_request(port: int, timeout: float):
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                tail = "\n".join(process.stderr.read().splitlines()[-5:])
+                sys.exit(f"❌ Сервер завершился при старте:\n{tail}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        elapsed = (time.perf_counter() - started) * 1000
+                        print(f"Первый ответ /health: {elapsed:.0f} мс от запуска процесса")
+                        return
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        sys.exit(f"❌ Нет ответа /health за {timeout} с")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени старта StaffFlow")
+    parser.add_argument("--runs", type=int, default=5, help="число запусков для замера импорта")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых тяжёлых модулей показать")
+    parser.add_argument("--port", type=int, default=8765, help="порт для замера первого ответа")
+    parser.add_argument("--timeout", type=float, default=30.0, help="предел ожидания первого ответа, с")
+    parser.add_argument("--skip-server", action="store_true", help="только замер импорта (без БД)")
+    args = parser.parse_args()
+
+    measure_import(args.runs, args.top)
+    if not args.skip_server:
+        measure_first_request(args.port, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
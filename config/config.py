@@ -1,6 +1,9 @@
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import lru_cache
 from typing import Optional
 
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
 
 class DatabaseConfig(BaseSettings):
     host: str = "localhost"
@@ -8,19 +11,34 @@ class DatabaseConfig(BaseSettings):
     name: str = "staffflow"
     user: str = "postgres"
     password: str = "postgres"
+    pool_min_size: int = 5
+    pool_max_size: int = 20
+    acquire_timeout: float = 10.0
+    count_cache_ttl: int = 10
+    stats_cache_ttl: int = 5
 
     model_config = SettingsConfigDict(
         env_prefix="postgres_",
-        extra="ignore"  # Игнорировать лишние переменные окружения
+        extra="ignore",  # Игнорировать лишние переменные окружения
+        frozen=True,
     )
 
 
 class Bitwarden(BaseSettings):
     organization_id: str = "d7821ae8-b00b-4f7a-a8bf-b3d600f618c3"
     collection_id: str = "ee1b460f-ff68-467d-a361-b3d600f618cc"
+    base_url: str = "http://localhost:8087"
+    max_connections: int = 10
+    keepalive_timeout: int = 30
+    connect_timeout: float = 2.0
+    timeout: float = 10.0
+    status_cache_ttl: int = 5
+    bulk_concurrency: int = 4
+    bulk_max_items: int = 200
 
     model_config = SettingsConfigDict(
-        env_prefix='btw_'
+        env_prefix='btw_',
+        frozen=True,
     )
 
 
@@ -30,7 +48,8 @@ class LoggingConfig(BaseSettings):
     format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
     model_config = SettingsConfigDict(
-        env_prefix="log_"
+        env_prefix="log_",
+        frozen=True,
     )
 
 
@@ -41,7 +60,8 @@ class ServerConfig(BaseSettings):
     reload: bool = True
 
     model_config = SettingsConfigDict(
-        env_prefix="server_"
+        env_prefix="server_",
+        frozen=True,
     )
 
 
@@ -51,9 +71,21 @@ class MailConfig(BaseSettings):
     api_url: str = "https://biz.mail.ru/api/v1"
     api_key: Optional[str] = None
     api_secret: Optional[str] = None
+    max_connections: int = 20
+    dns_cache_ttl: int = 300
+    keepalive_timeout: int = 30
+    connect_timeout: float = 5.0
+    timeout: float = 20.0
+    retries: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 10.0
+    token_url: str = "https://o2.mail.ru/token"
+    client_id: str = "J34ZMt9oJv3jnx4KuSf2E5RQTxKmNbR5"
+    token_refresh_margin: int = 300
 
     model_config = SettingsConfigDict(
-        env_prefix="mail_"
+        env_prefix="mail_",
+        frozen=True,
     )
 
 
@@ -63,28 +95,118 @@ class ADConfig(BaseSettings):
     domain: str = "testdomain.local"
     admin_user: str = "admin"
     admin_password: str = "SecurePass123"
+    port: int = 636
+    use_ssl: bool = True
+    connect_timeout: int = 5
+    receive_timeout: int = 15
+    pool_size: int = 4
+    pool_acquire_timeout: float = 10.0
+    pool_idle_timeout: int = 300
+    pool_max_lifetime: int = 1800
+    pool_health_check_interval: int = 60
+    max_pending: int = 32
+    queue_timeout: float = 30.0
+    group_flush_window: float = 0.5
+    group_batch_size: int = 100
+    group_rules_ttl: int = 60
+
+    model_config = SettingsConfigDict(
+        env_prefix="ad_",
+        frozen=True,
+    )
+
+
+class QueueConfig(BaseSettings):
+    """Конфигурация очереди задач провижининга"""
+    poll_interval: float = 1.0
+    lease_seconds: int = 300
+    max_attempts: int = 5
+    retry_base_delay: int = 10
+    retry_max_delay: int = 600
+    ad_concurrency: int = 2
+    mail_concurrency: int = 4
+    bitwarden_concurrency: int = 2
+    # Ключ шифрования паролей в payload задач
+    payload_secret: str = "CHANGE_ME_QUEUE_PAYLOAD_SECRET"
+    # /metrics воркера (worker.py) для Prometheus; 0 — не поднимать
+    metrics_host: str = "0.0.0.0"
+    metrics_port: int = 9101
+
+    model_config = SettingsConfigDict(
+        env_prefix="queue_",
+        frozen=True,
+    )
+
+
+class BulkConfig(BaseSettings):
+    """Конфигурация массовой регистрации"""
+    chunk_size: int = 250
+    max_rows: int = 5000
 
     model_config = SettingsConfigDict(
-        env_prefix="ad_"
+        env_prefix="bulk_",
+        frozen=True,
+    )
+
+
+class HealthConfig(BaseSettings):
+    """Конфигурация фоновой проверки бэкендов"""
+    interval: float = 15.0
+    timeout: float = 3.0
+
+    model_config = SettingsConfigDict(
+        env_prefix="health_",
+        frozen=True,
+    )
+
+
+class AuditConfig(BaseSettings):
+    """Конфигурация отложенной записи журнала операций"""
+    queue_size: int = 10000
+    batch_size: int = 500
+    flush_interval: float = 1.0
+    partitions_ahead: int = 2
+    retention_months: int = 12
+    maintenance_interval: int = 21600
+    flush_retries: int = 5
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 10.0
+
+    model_config = SettingsConfigDict(
+        env_prefix="audit_",
+        frozen=True,
     )
 
 
 class AuthConfig(BaseSettings):
     secret_key: str = "CHANGE_ME_SUPER_SECRET_KEY"
     cookie_name: str = "staffflow_session"
+    session_ttl: int = 43200
+    user_cache_ttl: int = 60
+    user_cache_size: int = 1024
+    bcrypt_rounds: int = 12
+    hash_workers: int = 2
+    hash_max_pending: int = 32
+    login_window: int = 300
+    login_max_failures: int = 5
+    login_ip_max_failures: int = 20
 
-    model_config = SettingsConfigDict(env_prefix="auth_")
+    model_config = SettingsConfigDict(env_prefix="auth_", frozen=True)
 
 
 class Config(BaseSettings):
     """Основная конфигурация приложения"""
-    db: DatabaseConfig = DatabaseConfig()
-    log: LoggingConfig = LoggingConfig()
-    server: ServerConfig = ServerConfig()
-    mail: MailConfig = MailConfig()
-    ad: ADConfig = ADConfig()
-    btw: Bitwarden = Bitwarden()
-    auth: AuthConfig = AuthConfig()
+    db: DatabaseConfig = Field(default_factory=DatabaseConfig)
+    log: LoggingConfig = Field(default_factory=LoggingConfig)
+    server: ServerConfig = Field(default_factory=ServerConfig)
+    mail: MailConfig = Field(default_factory=MailConfig)
+    ad: ADConfig = Field(default_factory=ADConfig)
+    btw: Bitwarden = Field(default_factory=Bitwarden)
+    auth: AuthConfig = Field(default_factory=AuthConfig)
+    queue: QueueConfig = Field(default_factory=QueueConfig)
+    bulk: BulkConfig = Field(default_factory=BulkConfig)
+    audit: AuditConfig = Field(default_factory=AuditConfig)
+    health: HealthConfig = Field(default_factory=HealthConfig)
 
     # Переменные окружения, которые вы видите в ошибке
     postgres_db: Optional[str] = None
@@ -99,23 +221,32 @@ class Config(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
-        extra="ignore"  # Игнорировать лишние поля в .env
+        extra="ignore",  # Игнорировать лишние поля в .env
+        frozen=True,
     )
 
+
+@lru_cache(maxsize=None)
 def load_config() -> Config:
-    """Загрузить конфигурацию"""
+    """
+    Конфигурация процесса.
+
+    Окружение и .env читаются один раз, дальше возвращается тот же
+    неизменяемый объект — модули берут его при импорте или при
+    создании своих клиентов. Изменения .env применяются перезапуском.
+    """
     config = Config()
 
     # Если в корневом уровне есть postgres_ переменные, используем их
-    if config.postgres_db:
-        config.db.name = config.postgres_db
-    if config.postgres_host:
-        config.db.host = config.postgres_host
-    if config.postgres_port:
-        config.db.port = config.postgres_port
-    if config.postgres_user:
-        config.db.user = config.postgres_user
-    if config.postgres_password:
-        config.db.password = config.postgres_password
+    overrides = {
+        "name": config.postgres_db,
+        "host": config.postgres_host,
+        "port": config.postgres_port,
+        "user": config.postgres_user,
+        "password": config.postgres_password,
+    }
+    overrides = {key: value for key, value in overrides.items() if value}
+    if overrides:
+        config = config.model_copy(update={"db": config.db.model_copy(update=overrides)})
 
     return config
@@ -0,0 +1,35 @@
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Простой in-process кэш с временем жизни записей"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if key not in self._data and len(self._data) >= self.maxsize:
+            # Вытесняем самую старую запись
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Удалить запись (или весь кэш, если key не указан)"""
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
@@ -0,0 +1,237 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Границы гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Samples = Iterable[Tuple[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Метрика с набором меток.
+
+    Дочерние метрики (по значениям меток) создаются через labels() один раз
+    и сохраняются вызывающим: на горячем пути только inc()/observe(),
+    без поиска и создания наборов меток. Все метрики обновляются
+    из event loop, поэтому блокировки не нужны.
+    """
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._labels = ""
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _child(self) -> "_Metric":
+        child = object.__new__(type(self))
+        child.name = self.name
+        child.labelnames = ()
+        child._children = {}
+        return child
+
+    def labels(self, *values: str) -> "_Metric":
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            child = self._child()
+            child._labels = _format_labels(self.labelnames, values)
+            self._children[values] = child
+        return child
+
+    def children(self) -> List["_Metric"]:
+        """Созданные дочерние метрики (по всем наборам меток)"""
+        return list(self._children.values())
+
+    def _series(self) -> List["_Metric"]:
+        return list(self._children.values()) if self.labelnames else [self]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for series in self._series():
+            lines.extend(series._render_series())
+        return lines
+
+    def _render_series(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def _child(self) -> "Counter":
+        child = super()._child()
+        child.value = 0.0
+        return child
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def _render_series(self) -> List[str]:
+        return [f"{self.name}{self._labels} {_format_value(self.value)}"]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS,
+            registry=None
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+        self._reset()
+
+    def _reset(self):
+        # Последний элемент — значения больше верхней границы (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _child(self) -> "Histogram":
+        child = super()._child()
+        child.buckets = self.buckets
+        child._reset()
+        return child
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _render_series(self) -> List[str]:
+        labels = self._labels[1:-1] + "," if self._labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{{labels}le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum{self._labels} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{self._labels} {self.count}")
+        return lines
+
+
+class Collected(_Metric):
+    """
+    Метрика, значения которой читаются при выгрузке.
+
+    collect() возвращает пары (значения меток, число) — так в /metrics
+    попадают счётчики и размеры очередей, которые компоненты уже ведут сами,
+    без обновления метрик на горячем пути.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str],
+            collect: Callable[[], Samples],
+            type: str = "gauge",
+            registry=None
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self.type = type
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for values, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# -------------------------
+# Вызовы внешних бэкендов
+# -------------------------
+BACKEND_CALL_SECONDS = Histogram(
+    "staffflow_backend_call_duration_seconds",
+    "Длительность вызовов внешних бэкендов",
+    ("backend",),
+)
+BACKEND_CALL_ERRORS = Counter(
+    "staffflow_backend_call_errors_total",
+    "Неудачные вызовы внешних бэкендов",
+    ("backend",),
+)
+
+
+class CallMetrics:
+    """Задержка и ошибки вызовов одного бэкенда (метки выбраны заранее)"""
+    __slots__ = ("seconds", "errors")
+
+    def __init__(self, backend: str):
+        self.seconds = BACKEND_CALL_SECONDS.labels(backend)
+        self.errors = BACKEND_CALL_ERRORS.labels(backend)
+
+    def observe(self, started: float, failed: bool = False):
+        """started — значение time.perf_counter() перед вызовом"""
+        self.seconds.observe(time.perf_counter() - started)
+        if failed:
+            self.errors.inc()
+
+
+AD_CALLS = CallMetrics("ad")
+MAIL_CALLS = CallMetrics("mail")
+BITWARDEN_CALLS = CallMetrics("bitwarden")
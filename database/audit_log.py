@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from config.config import AuditConfig, load_config
+from database.connection import db_connection
+
+logger = logging.getLogger(__name__)
+
+# (employee_id, operation_type, service, status, message, details, created_at)
+# created_at — время события в UTC или None (время записи по часам БД)
+AuditEvent = Tuple[Optional[int], str, str, str, Optional[str], Optional[str], Optional[datetime]]
+
+
+async def insert_operation_logs(conn: asyncpg.Connection, events: List[AuditEvent]) -> None:
+    """
+    Записать пачку событий в operation_logs одним запросом.
+
+    Сотрудник мог быть удалён, пока событие ждало в очереди, поэтому
+    employee_id сверяется с employees (как ON DELETE SET NULL).
+
+    created_at передаётся как timestamptz и переводится в TIMESTAMP
+    в часовом поясе сессии — как CURRENT_TIMESTAMP в остальных
+    таблицах и как границы партиций (LOCALTIMESTAMP).
+    """
+    columns = list(zip(*events))
+    await conn.execute("""
+        INSERT INTO operation_logs
+        (employee_id, operation_type, service, status, message, details, created_at)
+        SELECT e.id, l.operation_type, l.service, l.status, l.message, l.details::jsonb,
+               COALESCE(l.created_at, CURRENT_TIMESTAMP)::timestamp
+        FROM unnest($1::int[], $2::text[], $3::text[], $4::text[], $5::text[], $6::text[], $7::timestamptz[])
+            AS l(employee_id, operation_type, service, status, message, details, created_at)
+        LEFT JOIN employees e ON e.id = l.employee_id
+        """, *columns)
+
+
+class AuditLogSink:
+    """
+    Отложенная запись operation_logs.
+
+    События копятся в ограниченной очереди и пишутся пачками — по
+    batch_size событий или раз в flush_interval секунд; неудачная запись
+    пачки повторяется до flush_retries раз. Если очередь заполнена,
+    record() возвращает False и вызывающий пишет событие сам.
+    stop() дописывает всё накопленное (вызывается в lifespan).
+
+    Раз в maintenance_interval секунд создаются партиции следующих
+    месяцев и удаляются партиции старше retention_months.
+    """
+
+    def __init__(self, config: AuditConfig):
+        self.config = config
+        self._queue: "asyncio.Queue[AuditEvent]" = asyncio.Queue(maxsize=config.queue_size)
+        self._batch: List[AuditEvent] = []
+        self._task: Optional[asyncio.Task] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "overflow": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audit-log-sink")
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintain(), name="audit-log-partitions")
+
+    def record(
+            self,
+            employee_id: Optional[int],
+            operation_type: str,
+            service: str,
+            status: str,
+            message: Optional[str] = None,
+            details: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Поставить событие в очередь; False, если очередь переполнена"""
+        event = (
+            employee_id, operation_type, service, status, message,
+            json.dumps(details) if details is not None else None,
+            datetime.now(timezone.utc),
+        )
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._stats["overflow"] += 1
+            return False
+        self._stats["enqueued"] += 1
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.config.flush_interval
+            while len(self._batch) < self.config.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._batch = self._batch, []
+            # Запись не прерывается при остановке — stop() дождётся её
+            self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+
+    async def _maintain(self):
+        from database.db import maintain_operation_logs
+        while True:
+            try:
+                async with db_connection() as conn:
+                    await maintain_operation_logs(
+                        conn, self.config.partitions_ahead, self.config.retention_months
+                    )
+            except Exception as e:
+                logger.error(f"❌ Ошибка обслуживания партиций operation_logs: {e}")
+            await asyncio.sleep(self.config.maintenance_interval)
+
+    async def _flush(self, batch: List[AuditEvent]):
+        """Записать пачку; при ошибке повторить с экспоненциальной задержкой"""
+        for attempt in range(self.config.flush_retries + 1):
+            try:
+                async with db_connection() as conn:
+                    await insert_operation_logs(conn, batch)
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+                return
+            except Exception as e:
+                if attempt == self.config.flush_retries:
+                    self._stats["failed"] += len(batch)
+                    logger.error(f"❌ Ошибка записи {len(batch)} событий в operation_logs, "
+                                 f"события потеряны после {attempt + 1} попыток: {e}")
+                    return
+                delay = min(self.config.retry_base_delay * 2 ** attempt, self.config.retry_max_delay)
+                logger.warning(f"⚠️ Ошибка записи {len(batch)} событий в operation_logs ({e}), "
+                               f"повтор через {delay:.1f}с")
+                await asyncio.sleep(delay)
+
+    async def stop(self):
+        """Остановить фоновую запись и дописать накопленные события"""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+
+        for i in range(0, len(pending), self.config.batch_size):
+            await self._flush(pending[i:i + self.config.batch_size])
+
+        if pending:
+            logger.info(f"Журнал операций: дописано {len(pending)} событий при остановке")
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "queued": self._queue.qsize() + len(self._batch),
+            "queue_size": self.config.queue_size,
+        }
+
+
+_sink: Optional[AuditLogSink] = None
+
+
+def get_audit_sink() -> AuditLogSink:
+    """Журнал операций процесса (создаётся при первом обращении)"""
+    global _sink
+    if _sink is None:
+        _sink = AuditLogSink(load_config().audit)
+    return _sink
+
+
+async def start_audit_sink():
+    """Запустить фоновую запись журнала (вызывается в lifespan)"""
+    get_audit_sink().start()
+
+
+async def stop_audit_sink():
+    """Дописать журнал и остановить фоновую запись"""
+    global _sink
+    if _sink is not None:
+        await _sink.stop()
+        _sink = None
@@ -1,43 +1,59 @@
+import asyncio
 import asyncpg
 import logging
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 from config.config import Config, load_config
 from database.auth import create_auth_tables
 
 logger = logging.getLogger(__name__)
 
 _pool: Optional[asyncpg.Pool] = None
-_config: Optional[Config] = None
+
+# Телеметрия пула
+_stats = {
+    "connections_created": 0,
+    "acquired": 0,
+    "acquire_timeouts": 0,
+    "wait_time_total": 0.0,
+    "wait_time_max": 0.0,
+}
 
 
 def get_config() -> Config:
     """Получить конфигурацию"""
-    global _config
-    if _config is None:
-        _config = load_config()
-    return _config
+    return load_config()
 
 
 async def init_db():
     global _pool
     try:
-        config = load_config()
+        config = get_config()
         _pool = await asyncpg.create_pool(
             user=config.db.user,
             password=config.db.password,
             database=config.db.name,
             host=config.db.host,
             port=config.db.port,
-            min_size=5,
-            max_size=20
+            min_size=config.db.pool_min_size,
+            max_size=config.db.pool_max_size,
+            init=_on_connection_created,
         )
         logger.info("✅ Пул соединений БД создан")
 
         # ДОБАВЬТЕ ЭТИ СТРОКИ:
         from database.db import create_tables
         async with _pool.acquire() as conn:
-            await create_tables()
-            await create_auth_tables(conn)
+            # Веб-процесс и воркеры стартуют одновременно, а параллельный DDL
+            # одних и тех же объектов в Postgres падает — схему создаёт
+            # один процесс за раз
+            await conn.execute("SELECT pg_advisory_lock(hashtext('staffflow_schema'))")
+            try:
+                await create_tables(conn)
+                await create_auth_tables(conn)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(hashtext('staffflow_schema'))")
             logger.info("✅ Таблицы базы данных успешно созданы/проверены")
 
     except Exception as e:
@@ -45,8 +61,18 @@ async def init_db():
         raise
 
 
-async def get_db_connection():
-    """Получить соединение с БД из пула"""
+async def _on_connection_created(conn: asyncpg.Connection):
+    """Вызывается пулом для каждого нового физического соединения"""
+    _stats["connections_created"] += 1
+
+
+async def get_db_connection(timeout: Optional[float] = None):
+    """
+    Получить соединение с БД из пула.
+
+    Соединение обязательно вернуть через release_connection (не conn.close(),
+    которое закрывает физическое соединение); удобнее использовать db_connection().
+    """
     global _pool
 
     if _pool is None:
@@ -55,12 +81,23 @@ async def get_db_connection():
     if _pool is None:
         raise RuntimeError("Database pool not initialized")
 
+    started = time.monotonic()
     try:
-        return await _pool.acquire()
+        conn = await _pool.acquire(timeout=timeout or get_config().db.acquire_timeout)
+    except asyncio.TimeoutError:
+        _stats["acquire_timeouts"] += 1
+        logger.error("Таймаут ожидания соединения с БД из пула")
+        raise
     except Exception as e:
         logger.error(f"Ошибка получения соединения с БД: {str(e)}")
         raise
 
+    waited = time.monotonic() - started
+    _stats["acquired"] += 1
+    _stats["wait_time_total"] += waited
+    _stats["wait_time_max"] = max(_stats["wait_time_max"], waited)
+    return conn
+
 
 async def release_connection(conn):
     """Вернуть соединение в пул"""
@@ -68,6 +105,51 @@ async def release_connection(conn):
         await _pool.release(conn)
 
 
+@asynccontextmanager
+async def db_connection(
+        transaction: bool = False,
+        timeout: Optional[float] = None
+) -> AsyncIterator[asyncpg.Connection]:
+    """
+    Соединение из пула на время блока async with; всегда возвращается в пул.
+
+    transaction=True оборачивает блок в транзакцию,
+    timeout — ожидание свободного соединения (по умолчанию postgres_acquire_timeout).
+    """
+    conn = await get_db_connection(timeout)
+    try:
+        if transaction:
+            async with conn.transaction():
+                yield conn
+        else:
+            yield conn
+    finally:
+        await release_connection(conn)
+
+
+def get_pool_stats() -> dict:
+    """Текущее состояние и телеметрия пула соединений"""
+    size = idle = 0
+    if _pool is not None and not _pool._closed:
+        size = _pool.get_size()
+        idle = _pool.get_idle_size()
+
+    acquired = _stats["acquired"]
+    return {
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "min_size": get_config().db.pool_min_size,
+        "max_size": get_config().db.pool_max_size,
+        "connections_created": _stats["connections_created"],
+        "acquired": acquired,
+        "acquire_timeouts": _stats["acquire_timeouts"],
+        "wait_time_total_ms": round(_stats["wait_time_total"] * 1000, 3),
+        "wait_time_avg_ms": round(_stats["wait_time_total"] / acquired * 1000, 3) if acquired else 0.0,
+        "wait_time_max_ms": round(_stats["wait_time_max"] * 1000, 3),
+    }
+
+
 async def close_db():
     """Закрыть пул соединений"""
     global _pool
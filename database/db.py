@@ -1,17 +1,60 @@
 import asyncpg
+import base64
+import json
 import logging
-from typing import Dict, Any, List, Optional
+import re
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+from config.config import load_config
+from core.cache import TTLCache
+from database import queries
+from database.audit_log import get_audit_sink, insert_operation_logs
+
 logger = logging.getLogger(__name__)
 
+# Посимвольная транслитерация для staffflow_search_norm (совпадает с core.utils.generate_login);
+# многосимвольные буквы (ж, ч, ш, щ, ю, я) заменяются отдельно, ь и ъ удаляются
+SEARCH_TRANSLIT_FROM = "абвгдеёзийклмнопрстуфхцыэАБВГДЕЁЗИЙКЛМНОПРСТУФХЦЫЭьъЬЪ"
+SEARCH_TRANSLIT_TO = "abvgdeeziyklmnoprstufhcye" * 2
+
+SEARCH_MODE_CONTAINS = "contains"
+SEARCH_MODE_PREFIX = "prefix"
+
+TOTAL_EXACT = "exact"
+TOTAL_ESTIMATE = "estimate"
+TOTAL_NONE = "none"
+
+# Партиции operation_logs: operation_logs_2026_10 — месяц,
+# operation_logs_until_2026_10 — перенесённая непартиционированная таблица (всё до месяца)
+OPERATION_LOGS_PARTITION_RE = re.compile(r"^operation_logs_(until_)?(\d{4})_(\d{2})$")
+
+OPERATION_LOGS_DDL = """
+    CREATE TABLE IF NOT EXISTS operation_logs (
+        id {id_column},
+        employee_id INTEGER REFERENCES employees(id) ON DELETE SET NULL,
+        operation_type VARCHAR(100) NOT NULL,
+        service VARCHAR(50) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        message TEXT,
+        details JSONB,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+"""
 
-async def create_tables():
-    """Создать необходимые таблицы в БД"""
-    conn = None
+# Кэш точного количества сотрудников (COUNT(*) — полный скан таблицы)
+_employee_count_cache = TTLCache(ttl=load_config().db.count_cache_ttl, maxsize=1)
+
+
+async def create_tables(conn: Optional[asyncpg.Connection] = None):
+    """Создать необходимые таблицы в БД (conn — соединение вызывающего)"""
+    own_conn = conn is None
     try:
-        from database.connection import get_db_connection
-        conn = await get_db_connection()
+        if own_conn:
+            from database.connection import get_db_connection
+            conn = await get_db_connection()
 
         # Таблица сотрудников
         await conn.execute("""
@@ -55,19 +98,8 @@ async def create_tables():
             )
         """)
 
-        # Таблица логов операций
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS operation_logs (
-                id SERIAL PRIMARY KEY,
-                employee_id INTEGER REFERENCES employees(id) ON DELETE SET NULL,
-                operation_type VARCHAR(100) NOT NULL,
-                service VARCHAR(50) NOT NULL,
-                status VARCHAR(20) NOT NULL,
-                message TEXT,
-                details JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Таблица логов операций (помесячные партиции)
+        await create_operation_logs(conn)
 
         # Индексы для быстрого поиска
         await conn.execute("""
@@ -85,6 +117,60 @@ async def create_tables():
             ON employees(email)
         """)
 
+        # Keyset-пагинация списка сотрудников
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_employees_created_at_id
+            ON employees(created_at DESC, id DESC)
+        """)
+
+        # === Нормализованный поиск (регистр, ё/е, кириллица → латиница) ===
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+        await conn.execute(f"""
+            CREATE OR REPLACE FUNCTION staffflow_search_norm(value TEXT) RETURNS TEXT
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $fn$
+                SELECT lower(translate(
+                    replace(replace(replace(replace(replace(replace(
+                    replace(replace(replace(replace(replace(replace(
+                        coalesce(value, ''),
+                        'ж', 'zh'), 'Ж', 'zh'), 'ч', 'ch'), 'Ч', 'ch'),
+                        'ш', 'sh'), 'Ш', 'sh'), 'щ', 'sch'), 'Щ', 'sch'),
+                        'ю', 'yu'), 'Ю', 'yu'), 'я', 'ya'), 'Я', 'ya'),
+                    '{SEARCH_TRANSLIT_FROM}',
+                    '{SEARCH_TRANSLIT_TO}'
+                ))
+            $fn$
+        """)
+
+        await conn.execute("""
+            ALTER TABLE employees
+            ADD COLUMN IF NOT EXISTS search_text TEXT
+            GENERATED ALWAYS AS (
+                staffflow_search_norm(
+                    last_name || ' ' || first_name || ' ' || coalesce(middle_name, '')
+                    || ' ' || login || ' ' || coalesce(email, '')
+                )
+            ) STORED
+        """)
+
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_employees_search_trgm
+            ON employees USING gin (search_text gin_trgm_ops)
+        """)
+
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_employee_mail_accounts_employee
+            ON employee_mail_accounts(employee_id)
+        """)
+
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_employee_ad_accounts_employee
+            ON employee_ad_accounts(employee_id)
+        """)
+
+        # === Дневные счётчики для /api/stats (поддерживаются триггерами) ===
+        await create_statistics_rollups(conn)
+
         # === Таблица правил AD-групп ===
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS ad_group_rules (
@@ -97,19 +183,488 @@ async def create_tables():
             )
         """)
 
+        # Тип сопоставления должности (exact / prefix / regex) и объединение групп
+        await conn.execute("""
+            ALTER TABLE ad_group_rules
+            ADD COLUMN IF NOT EXISTS match_type VARCHAR(10) NOT NULL DEFAULT 'exact',
+            ADD COLUMN IF NOT EXISTS merge BOOLEAN NOT NULL DEFAULT FALSE
+        """)
+
         logger.info("✅ Таблица ad_group_rules создана/проверена")
 
+        # === Очередь задач провижининга (AD / почта / Bitwarden) ===
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS provisioning_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                kind VARCHAR(30) NOT NULL,
+                employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+                payload JSONB NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                last_error TEXT,
+                run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                locked_until TIMESTAMP,
+                locked_by VARCHAR(100),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_provisioning_jobs_claim
+            ON provisioning_jobs(kind, run_after)
+            WHERE status IN ('queued', 'running')
+        """)
+
+        # === Массовая регистрация ===
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS onboarding_batches (
+                id UUID PRIMARY KEY,
+                total_rows INTEGER NOT NULL DEFAULT 0,
+                accepted_rows INTEGER NOT NULL DEFAULT 0,
+                rejected_rows INTEGER NOT NULL DEFAULT 0,
+                status VARCHAR(20) NOT NULL DEFAULT 'loading',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS onboarding_batch_rows (
+                batch_id UUID REFERENCES onboarding_batches(id) ON DELETE CASCADE,
+                row_no INTEGER NOT NULL,
+                login VARCHAR(100),
+                employee_id INTEGER REFERENCES employees(id) ON DELETE SET NULL,
+                status VARCHAR(20) NOT NULL,
+                error TEXT,
+                PRIMARY KEY (batch_id, row_no)
+            )
+        """)
+
+        await conn.execute("""
+            ALTER TABLE provisioning_jobs
+            ADD COLUMN IF NOT EXISTS batch_id UUID
+        """)
+
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_provisioning_jobs_batch
+            ON provisioning_jobs(batch_id, employee_id)
+            WHERE batch_id IS NOT NULL
+        """)
+
+        await conn.execute("""
+            ALTER TABLE provisioning_jobs
+            ADD COLUMN IF NOT EXISTS trace_id UUID
+        """)
+
+        logger.info("✅ Таблица provisioning_jobs создана/проверена")
+
+        # === Трассировка регистрации: шаги с длительностью и результатом ===
+        # error заполняется только для неудачных шагов
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS provisioning_spans (
+                trace_id UUID NOT NULL,
+                employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+                step VARCHAR(40) NOT NULL,
+                started_at TIMESTAMP NOT NULL,
+                duration_ms REAL NOT NULL,
+                error TEXT
+            )
+        """)
+
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_provisioning_spans_employee
+            ON provisioning_spans(employee_id, started_at)
+        """)
+
+        # === Идемпотентность массового создания записей Bitwarden ===
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS bitwarden_batch_items (
+                idempotency_key VARCHAR(200) NOT NULL,
+                item_no INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                username TEXT NOT NULL,
+                bitwarden_item_id VARCHAR(100) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (idempotency_key, item_no)
+            )
+        """)
+
         logger.info("✅ Таблицы БД созданы/проверены")
 
     except Exception as e:
         logger.error(f"❌ Ошибка создания таблиц: {str(e)}")
         raise
     finally:
-        if conn:
+        if own_conn and conn:
             from database.connection import release_connection
             await release_connection(conn)
 
 
+async def create_statistics_rollups(conn: asyncpg.Connection):
+    """
+    Создать таблицу employee_daily_stats и триггеры уровня оператора, которые
+    поддерживают её при вставке/удалении сотрудников и изменении почтовых ящиков.
+
+    При первом создании таблица заполняется по существующим данным.
+    """
+    async with conn.transaction():
+        is_new = await conn.fetchval("SELECT to_regclass('employee_daily_stats') IS NULL")
+
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS employee_daily_stats (
+                day DATE PRIMARY KEY,
+                registered INTEGER NOT NULL DEFAULT 0,
+                mail_created INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+        # Регистрации: триггеры уровня оператора, одна запись на день за весь COPY/INSERT
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION staffflow_stats_employees_insert() RETURNS trigger
+            LANGUAGE plpgsql AS $fn$
+            BEGIN
+                INSERT INTO employee_daily_stats (day, registered)
+                SELECT COALESCE(created_at, CURRENT_TIMESTAMP)::date, COUNT(*)
+                FROM new_rows
+                GROUP BY 1
+                ON CONFLICT (day) DO UPDATE
+                SET registered = employee_daily_stats.registered + EXCLUDED.registered;
+                RETURN NULL;
+            END
+            $fn$
+        """)
+
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION staffflow_stats_employees_delete() RETURNS trigger
+            LANGUAGE plpgsql AS $fn$
+            BEGIN
+                UPDATE employee_daily_stats s
+                SET registered = s.registered - d.cnt
+                FROM (
+                    SELECT COALESCE(created_at, CURRENT_TIMESTAMP)::date AS day, COUNT(*) AS cnt
+                    FROM old_rows
+                    GROUP BY 1
+                ) d
+                WHERE s.day = d.day;
+                RETURN NULL;
+            END
+            $fn$
+        """)
+
+        # Сотрудники с почтой: разница числа сотрудников с ящиком в статусе created
+        # до и после оператора (по затронутым сотрудникам)
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION staffflow_stats_mail() RETURNS trigger
+            LANGUAGE plpgsql AS $fn$
+            DECLARE
+                delta BIGINT;
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    WITH affected AS (
+                        SELECT employee_id FROM new_rows
+                    ),
+                    before_state AS (
+                        SELECT employee_id, status FROM employee_mail_accounts
+                        WHERE employee_id IN (SELECT employee_id FROM affected)
+                          AND id NOT IN (SELECT id FROM new_rows)
+                    )
+                    SELECT
+                        (SELECT COUNT(DISTINCT employee_id) FROM employee_mail_accounts
+                         WHERE status = 'created' AND employee_id IN (SELECT employee_id FROM affected))
+                        - (SELECT COUNT(DISTINCT employee_id) FROM before_state WHERE status = 'created')
+                    INTO delta;
+                ELSIF TG_OP = 'UPDATE' THEN
+                    WITH affected AS (
+                        SELECT employee_id FROM old_rows
+                        UNION SELECT employee_id FROM new_rows
+                    ),
+                    before_state AS (
+                        SELECT employee_id, status FROM employee_mail_accounts
+                        WHERE employee_id IN (SELECT employee_id FROM affected)
+                          AND id NOT IN (SELECT id FROM new_rows)
+                        UNION ALL
+                        SELECT employee_id, status FROM old_rows
+                    )
+                    SELECT
+                        (SELECT COUNT(DISTINCT employee_id) FROM employee_mail_accounts
+                         WHERE status = 'created' AND employee_id IN (SELECT employee_id FROM affected))
+                        - (SELECT COUNT(DISTINCT employee_id) FROM before_state WHERE status = 'created')
+                    INTO delta;
+                ELSE
+                    WITH affected AS (
+                        SELECT employee_id FROM old_rows
+                    ),
+                    before_state AS (
+                        SELECT employee_id, status FROM employee_mail_accounts
+                        WHERE employee_id IN (SELECT employee_id FROM affected)
+                        UNION ALL
+                        SELECT employee_id, status FROM old_rows
+                    )
+                    SELECT
+                        (SELECT COUNT(DISTINCT employee_id) FROM employee_mail_accounts
+                         WHERE status = 'created' AND employee_id IN (SELECT employee_id FROM affected))
+                        - (SELECT COUNT(DISTINCT employee_id) FROM before_state WHERE status = 'created')
+                    INTO delta;
+                END IF;
+
+                IF delta <> 0 THEN
+                    INSERT INTO employee_daily_stats (day, mail_created) VALUES (CURRENT_DATE, delta)
+                    ON CONFLICT (day) DO UPDATE
+                    SET mail_created = employee_daily_stats.mail_created + EXCLUDED.mail_created;
+                END IF;
+
+                RETURN NULL;
+            END
+            $fn$
+        """)
+
+        await conn.execute("""
+            CREATE OR REPLACE TRIGGER trg_employees_stats_insert
+            AFTER INSERT ON employees
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION staffflow_stats_employees_insert()
+        """)
+
+        await conn.execute("""
+            CREATE OR REPLACE TRIGGER trg_employees_stats_delete
+            AFTER DELETE ON employees
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION staffflow_stats_employees_delete()
+        """)
+
+        await conn.execute("""
+            CREATE OR REPLACE TRIGGER trg_employee_mail_accounts_stats_insert
+            AFTER INSERT ON employee_mail_accounts
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION staffflow_stats_mail()
+        """)
+
+        await conn.execute("""
+            CREATE OR REPLACE TRIGGER trg_employee_mail_accounts_stats_update
+            AFTER UPDATE ON employee_mail_accounts
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION staffflow_stats_mail()
+        """)
+
+        await conn.execute("""
+            CREATE OR REPLACE TRIGGER trg_employee_mail_accounts_stats_delete
+            AFTER DELETE ON employee_mail_accounts
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION staffflow_stats_mail()
+        """)
+
+        if is_new:
+            await conn.execute("""
+                INSERT INTO employee_daily_stats (day, registered)
+                SELECT COALESCE(created_at, CURRENT_TIMESTAMP)::date, COUNT(*)
+                FROM employees
+                GROUP BY 1
+            """)
+
+            await conn.execute("""
+                INSERT INTO employee_daily_stats (day, mail_created)
+                SELECT CURRENT_DATE, COUNT(DISTINCT employee_id)
+                FROM employee_mail_accounts
+                WHERE status = 'created'
+                ON CONFLICT (day) DO UPDATE
+                SET mail_created = employee_daily_stats.mail_created + EXCLUDED.mail_created
+            """)
+
+            logger.info("✅ Таблица employee_daily_stats заполнена по текущим данным")
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+async def create_operation_logs(conn: asyncpg.Connection):
+    """
+    Создать operation_logs, партиционированную по месяцам created_at.
+
+    Существующая непартиционированная таблица не копируется: она
+    подключается партицией operation_logs_until_YYYY_MM, покрывающей
+    всё до конца месяца последней записи, и удаляется по retention целиком.
+    """
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext('operation_logs_partitions'))")
+
+        relkind = await conn.fetchval("""
+            SELECT relkind FROM pg_class WHERE oid = to_regclass('operation_logs')
+        """)
+
+        if relkind == "r":
+            upper = await conn.fetchval("""
+                SELECT date_trunc('month', COALESCE(MAX(created_at), LOCALTIMESTAMP)) + interval '1 month'
+                FROM operation_logs
+            """)
+            legacy = f"operation_logs_until_{upper:%Y_%m}"
+
+            await conn.execute("UPDATE operation_logs SET created_at = LOCALTIMESTAMP WHERE created_at IS NULL")
+            await conn.execute(f"ALTER TABLE operation_logs RENAME TO {legacy}")
+            await conn.execute(f"ALTER TABLE {legacy} ALTER COLUMN created_at SET NOT NULL")
+            # Последовательность id остаётся общей со старыми записями
+            await conn.execute(OPERATION_LOGS_DDL.format(
+                id_column="INTEGER NOT NULL DEFAULT nextval('operation_logs_id_seq')"
+            ))
+            await conn.execute("ALTER SEQUENCE operation_logs_id_seq OWNED BY operation_logs.id")
+            await conn.execute(f"""
+                ALTER TABLE operation_logs ATTACH PARTITION {legacy}
+                FOR VALUES FROM (MINVALUE) TO ('{upper:%Y-%m-%d}')
+            """)
+            logger.info(f"✅ operation_logs переведена на партиции, старые записи в {legacy}")
+        else:
+            await conn.execute(OPERATION_LOGS_DDL.format(id_column="SERIAL"))
+
+        # Лента журнала и keyset-пагинация /api/audit
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_operation_logs_created_at_id
+            ON operation_logs(created_at DESC, id DESC)
+        """)
+
+        await conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_operation_logs_employee
+            ON operation_logs(employee_id, created_at DESC, id DESC)
+        """)
+
+        await ensure_operation_logs_partitions(conn, load_config().audit.partitions_ahead)
+
+
+async def _operation_logs_partitions(conn: asyncpg.Connection) -> Dict[str, Tuple[Optional[datetime], datetime]]:
+    """Партиции operation_logs: {имя: (начало или None, конец)}"""
+    rows = await conn.fetch("""
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'operation_logs'::regclass
+    """)
+
+    partitions = {}
+    for row in rows:
+        match = OPERATION_LOGS_PARTITION_RE.match(row["relname"])
+        if not match:
+            continue
+        month = datetime(int(match.group(2)), int(match.group(3)), 1)
+        if match.group(1):
+            partitions[row["relname"]] = (None, month)
+        else:
+            partitions[row["relname"]] = (month, _add_months(month, 1))
+    return partitions
+
+
+async def ensure_operation_logs_partitions(conn: asyncpg.Connection, months_ahead: int) -> List[str]:
+    """Создать партиции текущего и months_ahead следующих месяцев; вернуть созданные"""
+    current = await conn.fetchval("SELECT date_trunc('month', LOCALTIMESTAMP)")
+    partitions = await _operation_logs_partitions(conn)
+    covered_until = max((end for start, end in partitions.values() if start is None), default=None)
+
+    created = []
+    for i in range(months_ahead + 1):
+        start = _add_months(current, i)
+        name = f"operation_logs_{start:%Y_%m}"
+        if name in partitions or (covered_until and start < covered_until):
+            continue
+
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF operation_logs
+            FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{_add_months(start, 1):%Y-%m-%d}')
+        """)
+        created.append(name)
+
+    if created:
+        logger.info(f"✅ Созданы партиции журнала: {', '.join(created)}")
+    return created
+
+
+async def drop_expired_operation_logs_partitions(conn: asyncpg.Connection, retention_months: int) -> List[str]:
+    """Удалить партиции, целиком старше retention_months месяцев; вернуть удалённые"""
+    current = await conn.fetchval("SELECT date_trunc('month', LOCALTIMESTAMP)")
+    cutoff = _add_months(current, -retention_months)
+
+    dropped = []
+    for name, (start, end) in sorted((await _operation_logs_partitions(conn)).items()):
+        if end <= cutoff:
+            await conn.execute(f"DROP TABLE IF EXISTS {name}")
+            dropped.append(name)
+
+    if dropped:
+        logger.info(f"🗑 Удалены партиции журнала старше {retention_months} мес.: {', '.join(dropped)}")
+    return dropped
+
+
+async def maintain_operation_logs(conn: asyncpg.Connection, months_ahead: int, retention_months: int) -> Dict[str, List[str]]:
+    """Создать будущие и удалить устаревшие партиции operation_logs"""
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext('operation_logs_partitions'))")
+        return {
+            "created": await ensure_operation_logs_partitions(conn, months_ahead),
+            "dropped": await drop_expired_operation_logs_partitions(conn, retention_months),
+        }
+
+
+async def get_operation_logs(
+        conn: asyncpg.Connection,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        employee_id: Optional[int] = None,
+        service: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Записи журнала операций, новые первыми.
+
+    Фильтры по времени отсекают лишние месячные партиции; следующая
+    страница запрашивается по next_cursor (keyset по (created_at, id)).
+    """
+    conditions = []
+    args: List[Any] = []
+
+    def add(condition: str, *values):
+        for value in values:
+            args.append(value)
+            condition = condition.replace("?", f"${len(args)}", 1)
+        conditions.append(condition)
+
+    if employee_id is not None:
+        add("employee_id = ?", employee_id)
+    if service:
+        add("service = ?", service)
+    if status:
+        add("status = ?", status)
+    if since:
+        add("created_at >= ?", since)
+    if until:
+        add("created_at < ?", until)
+    if cursor:
+        # Тот же формат курсора, что у списка сотрудников
+        add("(created_at, id) < (?, ?)", *decode_employee_cursor(cursor))
+
+    args.append(limit)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = await conn.fetch(f"""
+        SELECT id, employee_id, operation_type, service, status, message, details, created_at
+        FROM operation_logs
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ${len(args)}
+    """, *args)
+
+    items = []
+    for row in rows:
+        item = dict(row)
+        item["details"] = json.loads(item["details"]) if item["details"] is not None else None
+        items.append(item)
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_employee_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
 async def create_employee_record(
         conn: asyncpg.Connection,
         last_name: str,
@@ -127,14 +682,10 @@ async def create_employee_record(
             VALUES ($1, $2, $3, $4, $5, $6) RETURNING id
         """, last_name, first_name, middle_name, login, email, position)
 
-        logger.info(f"Сотрудник {login} добавлен в БД (ID: {employee_id})")
+        await write_operation_log(conn, employee_id, "create_employee", "database", "success",
+                                  "Сотрудник создан в БД")
 
-        # Логируем операцию
-        await conn.execute("""
-            INSERT INTO operation_logs 
-            (employee_id, operation_type, service, status, message)
-            VALUES ($1, $2, $3, $4, $5)
-        """, employee_id, "create_employee", "database", "success", "Сотрудник создан в БД")
+        logger.info(f"Сотрудник {login} добавлен в БД (ID: {employee_id})")
 
         return employee_id
 
@@ -146,50 +697,56 @@ async def create_employee_record(
         raise
 
 
+async def write_operation_log(
+        conn: asyncpg.Connection,
+        employee_id: Optional[int],
+        operation_type: str,
+        service: str,
+        status: str,
+        message: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Записать событие в operation_logs.
+
+    Если запущен журнал операций (database.audit_log), событие уходит
+    в его очередь и пишется пачкой в фоне; иначе или при переполнении
+    очереди — сразу, через переданное соединение. Внутри транзакции
+    событие пишется сразу в ней же: при откате записи о несостоявшейся
+    операции в журнале не останется.
+    """
+    sink = get_audit_sink()
+    if not conn.is_in_transaction() and sink.running and sink.record(employee_id, operation_type, service, status, message, details):
+        return
+
+    await insert_operation_logs(conn, [(
+        employee_id, operation_type, service, status, message,
+        json.dumps(details) if details is not None else None,
+        None,
+    )])
+
+
 async def search_employees(
         conn: asyncpg.Connection,
         query: str,
-        limit: int = 10
+        limit: int = 10,
+        mode: str = SEARCH_MODE_CONTAINS
 ) -> List[Dict[str, Any]]:
-    """Поиск сотрудников по имени, фамилии или логину"""
+    """
+    Поиск сотрудников по ФИО, логину или email.
+
+    Запрос и данные нормализуются staffflow_search_norm, поэтому
+    "ivanov" находит "Иванов", а "семён" — "Семен". Поиск идёт по
+    триграммному индексу search_text. Режим prefix — автодополнение:
+    совпадения с началом слова, ранжированные по word_similarity.
+    """
     try:
-        search_pattern = f"%{query}%"
-
-        rows = await conn.fetch("""
-            SELECT 
-                e.id,
-                e.last_name,
-                e.first_name,
-                e.middle_name,
-                e.login,
-                e.email,
-                e.position,
-                e.created_at,
-                CASE WHEN em.email IS NOT NULL THEN true ELSE false END as has_mail
-            FROM employees e
-            LEFT JOIN employee_mail_accounts em ON e.id = em.employee_id
-            WHERE 
-                e.last_name ILIKE $1 OR
-                e.first_name ILIKE $1 OR
-                e.login ILIKE $1 OR
-                e.email ILIKE $1
-            ORDER BY e.last_name, e.first_name
-            LIMIT $2
-        """, search_pattern, limit)
-
-        employees = []
-        for row in rows:
-            employees.append({
-                "id": row["id"],
-                "lastName": row["last_name"],
-                "firstName": row["first_name"],
-                "middleName": row["middle_name"],
-                "login": row["login"],
-                "email": row["email"],
-                "position": row["position"],
-                "has_mail": row["has_mail"],
-                "created_at": row["created_at"]
-            })
+        # Экранируем спецсимволы LIKE
+        term = query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+        stmt = queries.SEARCH_EMPLOYEES_PREFIX if mode == SEARCH_MODE_PREFIX else queries.SEARCH_EMPLOYEES_CONTAINS
+        rows = await queries.fetch(conn, stmt, term, limit)
+        employees = [row.to_dict() for row in rows]
 
         logger.info(f"Найдено {len(employees)} сотрудников по запросу '{query}'")
         return employees
@@ -199,56 +756,80 @@ async def search_employees(
         raise
 
 
+def encode_employee_cursor(created_at: datetime, employee_id: int) -> str:
+    """Курсор keyset-пагинации по (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), employee_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_employee_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разобрать курсор; ValueError, если курсор некорректен"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, employee_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(employee_id)
+    except Exception:
+        raise ValueError("Некорректный курсор")
+
+
+async def count_employees(conn: asyncpg.Connection, mode: str = TOTAL_EXACT) -> Optional[int]:
+    """
+    Количество сотрудников.
+
+    exact — точный COUNT(*), кэшируется на postgres_count_cache_ttl секунд;
+    estimate — оценка планировщика из pg_class (без скана таблицы);
+    none — не считать.
+    """
+    if mode == TOTAL_NONE:
+        return None
+
+    if mode == TOTAL_ESTIMATE:
+        estimate = await queries.fetchval(conn, queries.ESTIMATE_EMPLOYEES)
+        # -1 — таблица ещё ни разу не анализировалась
+        if estimate is not None and estimate >= 0:
+            return estimate
+
+    total = _employee_count_cache.get("employees")
+    if total is None:
+        total = await queries.fetchval(conn, queries.COUNT_EMPLOYEES)
+        _employee_count_cache.set("employees", total)
+    return total
+
+
 async def get_employees_paginated(
         conn: asyncpg.Connection,
         limit: int = 20,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        total_mode: str = TOTAL_EXACT
 ) -> Dict[str, Any]:
-    """Получить список сотрудников с пагинацией для таблицы"""
+    """
+    Получить список сотрудников с пагинацией для таблицы.
+
+    Если передан cursor (next_cursor из предыдущего ответа), используется
+    keyset-пагинация по индексу (created_at, id) и offset игнорируется.
+    """
     try:
-        # Получаем общее количество
-        total_count = await conn.fetchval("SELECT COUNT(*) FROM employees")
-
-        # Получаем данные
-        rows = await conn.fetch("""
-            SELECT 
-                e.id,
-                e.last_name,
-                e.first_name,
-                e.middle_name,
-                e.login,
-                e.email,
-                e.position,
-                e.created_at,
-                CASE WHEN em.status = 'created' THEN true ELSE false END as mail_active,
-                CASE WHEN ad.status = 'created' THEN true ELSE false END as ad_active
-            FROM employees e
-            LEFT JOIN employee_mail_accounts em ON e.id = em.employee_id
-            LEFT JOIN employee_ad_accounts ad ON e.id = ad.employee_id
-            ORDER BY e.created_at DESC
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
-
-        items = []
-        for row in rows:
-            items.append({
-                "id": row["id"],
-                "fullName": f"{row['last_name']} {row['first_name']} {row['middle_name'] or ''}".strip(),
-                "login": row["login"],
-                "email": row["email"],
-                "position": row["position"],
-                "status": {
-                    "mail": row["mail_active"],
-                    "ad": row["ad_active"]
-                },
-                "created_at": row["created_at"]
-            })
+        total_count = await count_employees(conn, total_mode)
+
+        if cursor:
+            cursor_created_at, cursor_id = decode_employee_cursor(cursor)
+            rows = await queries.fetch(conn, queries.LIST_EMPLOYEES_KEYSET, limit, cursor_created_at, cursor_id)
+        else:
+            rows = await queries.fetch(conn, queries.LIST_EMPLOYEES_OFFSET, limit, offset)
+
+        items = [row.to_dict() for row in rows]
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_employee_cursor(rows[-1]["created_at"], rows[-1]["id"])
 
         return {
             "items": items,
             "total": total_count,
             "page": (offset // limit) + 1,
-            "size": limit
+            "size": limit,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         logger.error(f"Ошибка получения списка сотрудников: {str(e)}")
@@ -258,34 +839,9 @@ async def get_employees_paginated(
 async def get_employee_by_login(conn: asyncpg.Connection, login: str) -> Optional[Dict[str, Any]]:
     """Получить сотрудника по логину"""
     try:
-        row = await conn.fetchrow("""
-            SELECT 
-                e.id,
-                e.last_name,
-                e.first_name,
-                e.middle_name,
-                e.login,
-                e.email,
-                e.position,
-                e.created_at,
-                CASE WHEN em.email IS NOT NULL THEN true ELSE false END as has_mail
-            FROM employees e
-            LEFT JOIN employee_mail_accounts em ON e.id = em.employee_id
-            WHERE e.login = $1
-        """, login)
-
+        row = await queries.fetchrow(conn, queries.GET_EMPLOYEE_BY_LOGIN, login)
         if row:
-            return {
-                "id": row["id"],
-                "lastName": row["last_name"],
-                "firstName": row["first_name"],
-                "middleName": row["middle_name"],
-                "login": row["login"],
-                "email": row["email"],
-                "position": row["position"],
-                "has_mail": row["has_mail"],
-                "created_at": row["created_at"]
-            }
+            return row.to_dict()
 
         return None
 
@@ -302,28 +858,30 @@ async def add_mail_to_employee(
         mail_user_id: Optional[str] = None,
         status: str = "created"
 ) -> int:
-    """Добавить почтовый аккаунт к сотруднику"""
+    """
+    Добавить почтовый аккаунт к сотруднику.
+
+    Вставка аккаунта и обновление email сотрудника выполняются
+    одним атомарным запросом.
+    """
     try:
         mail_account_id = await conn.fetchval("""
-            INSERT INTO employee_mail_accounts 
-            (employee_id, email, mail_password, mail_user_id, status)
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING id
+            WITH account AS (
+                INSERT INTO employee_mail_accounts
+                (employee_id, email, mail_password, mail_user_id, status)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING id
+            ), employee AS (
+                -- Обновляем email в основной таблице сотрудников
+                UPDATE employees
+                SET email = $2, updated_at = CURRENT_TIMESTAMP
+                WHERE id = $1
+            )
+            SELECT id FROM account
         """, employee_id, email, mail_password, mail_user_id, status)
 
-        # Обновляем email в основной таблице сотрудников
-        await conn.execute("""
-            UPDATE employees 
-            SET email = $1, updated_at = CURRENT_TIMESTAMP
-            WHERE id = $2
-        """, email, employee_id)
-
-        # Логируем операцию
-        await conn.execute("""
-            INSERT INTO operation_logs 
-            (employee_id, operation_type, service, status, message)
-            VALUES ($1, $2, $3, $4, $5)
-        """, employee_id, "add_mail", "mail.ru", "success", f"Почтовый ящик {email} создан")
+        await write_operation_log(conn, employee_id, "add_mail", "mail.ru", "success",
+                                  f"Почтовый ящик {email} создан")
 
         logger.info(f"Почтовый аккаунт {email} добавлен к сотруднику ID: {employee_id}")
         return mail_account_id
@@ -345,21 +903,16 @@ async def update_employee_mail_status(
     """Обновить статус почтового аккаунта сотрудника"""
     try:
         await conn.execute("""
-            UPDATE employee_mail_accounts 
-            SET status = $1, 
+            UPDATE employee_mail_accounts
+            SET status = $1,
                 error_message = $2,
                 updated_at = CURRENT_TIMESTAMP
             WHERE employee_id = $3
         """, status, error_message, employee_id)
 
-        # Логируем операцию
         log_status = "error" if status == "error" else "success"
-        await conn.execute("""
-            INSERT INTO operation_logs 
-            (employee_id, operation_type, service, status, message)
-            VALUES ($1, $2, $3, $4, $5)
-        """, employee_id, "update_mail_status", "mail.ru", log_status,
-                           f"Статус почты обновлен: {status}")
+        await write_operation_log(conn, employee_id, "update_mail_status", "mail.ru", log_status,
+                                  f"Статус почты обновлен: {status}")
 
         logger.info(f"Статус почты сотрудника ID:{employee_id} обновлен на '{status}'")
 
@@ -369,35 +922,10 @@ async def update_employee_mail_status(
 
 
 async def get_employee_statistics(conn: asyncpg.Connection) -> Dict[str, Any]:
-    """Получить статистику по сотрудникам"""
+    """Получить статистику по сотрудникам (одно чтение из employee_daily_stats)"""
     try:
-        # Общее количество сотрудников
-        total = await conn.fetchval("SELECT COUNT(*) FROM employees")
-
-        # Сотрудники с почтой
-        with_mail = await conn.fetchval("""
-            SELECT COUNT(DISTINCT employee_id) FROM employee_mail_accounts 
-            WHERE status = 'created'
-        """)
-
-        # Сегодняшние регистрации
-        today = await conn.fetchval("""
-            SELECT COUNT(*) FROM employees 
-            WHERE DATE(created_at) = CURRENT_DATE
-        """)
-
-        # Регистрации за неделю
-        week = await conn.fetchval("""
-            SELECT COUNT(*) FROM employees 
-            WHERE created_at >= CURRENT_DATE - INTERVAL '7 days'
-        """)
-
-        return {
-            "total": total or 0,
-            "with_mail": with_mail or 0,
-            "today": today or 0,
-            "week": week or 0
-        }
+        row = await queries.fetchrow(conn, queries.EMPLOYEE_STATISTICS)
+        return dict(row)
 
     except Exception as e:
         logger.error(f"Ошибка получения статистики: {str(e)}")
@@ -419,13 +947,8 @@ async def add_ad_account_to_employee(
             VALUES ($1, $2, $3, $4) RETURNING id
             """, employee_id, ad_login, ad_ou, status)
 
-        # Логируем операцию
-        await conn.execute("""
-            INSERT INTO operation_logs
-            (employee_id, operation_type, service, status, message)
-            VALUES ($1, $2, $3, $4, $5)
-            """, employee_id, "create_ad_account", "active_directory", "success",
-                           f"AD аккаунт {ad_login} создан")
+        await write_operation_log(conn, employee_id, "create_ad_account", "active_directory", "success",
+                                  f"AD аккаунт {ad_login} создан")
 
         return ad_account_id
     except Exception as e:
@@ -446,9 +969,8 @@ async def update_ad_account_status(
         """, status, employee_id)
 
 async def create_ad_group_rules_table():
-    from database.connection import get_db_connection
-    conn = await get_db_connection()
-    try:
+    from database.connection import db_connection
+    async with db_connection() as conn:
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS ad_group_rules (
                 id SERIAL PRIMARY KEY,
@@ -459,5 +981,385 @@ async def create_ad_group_rules_table():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
-    finally:
-        await conn.close()
\ No newline at end of file
+
+
+# === Очередь задач провижининга ===
+
+async def enqueue_provisioning_job(
+        conn: asyncpg.Connection,
+        kind: str,
+        payload: Dict[str, Any],
+        employee_id: Optional[int] = None,
+        max_attempts: int = 5,
+        trace_id: Optional[uuid.UUID] = None
+) -> int:
+    """Поставить задачу провижининга в очередь (trace_id — трасса регистрации)"""
+    return await conn.fetchval("""
+        INSERT INTO provisioning_jobs (kind, employee_id, payload, max_attempts, trace_id)
+        VALUES ($1, $2, $3::jsonb, $4, $5)
+        RETURNING id
+        """, kind, employee_id, json.dumps(payload), max_attempts, trace_id)
+
+
+async def claim_provisioning_job(
+        conn: asyncpg.Connection,
+        kind: str,
+        worker_id: str,
+        lease_seconds: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Захватить следующую готовую задачу указанного типа.
+
+    Задачи, захваченные другими воркерами, пропускаются (SKIP LOCKED);
+    задачи с истекшей арендой (воркер упал) захватываются повторно.
+    queued_for — сколько секунд задача ждала в очереди с момента готовности.
+    """
+    row = await conn.fetchrow("""
+        UPDATE provisioning_jobs j
+        SET status = 'running',
+            attempts = j.attempts + 1,
+            locked_by = $2,
+            locked_until = CURRENT_TIMESTAMP + make_interval(secs => $3),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE j.id = (
+            SELECT id FROM provisioning_jobs
+            WHERE kind = $1
+              AND (
+                (status = 'queued' AND run_after <= CURRENT_TIMESTAMP)
+                OR (status = 'running' AND locked_until < CURRENT_TIMESTAMP)
+              )
+            ORDER BY run_after, id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING j.id, j.kind, j.employee_id, j.payload, j.attempts, j.max_attempts, j.trace_id,
+            GREATEST(EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - j.run_after), 0)::float8 AS queued_for
+        """, kind, worker_id, lease_seconds)
+
+    if not row:
+        return None
+
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+async def save_provisioning_spans(
+        conn: asyncpg.Connection,
+        spans: List[Tuple[uuid.UUID, Optional[int], str, datetime, float, Optional[str]]]
+) -> None:
+    """Записать шаги трассы одним запросом: (trace_id, employee_id, step, started_at, duration_ms, error)"""
+    if not spans:
+        return
+    await conn.execute("""
+        INSERT INTO provisioning_spans (trace_id, employee_id, step, started_at, duration_ms, error)
+        SELECT * FROM unnest($1::uuid[], $2::int[], $3::text[], $4::timestamp[], $5::real[], $6::text[])
+        """, *zip(*spans))
+
+
+async def get_provisioning_spans(conn: asyncpg.Connection, employee_id: int) -> List[Dict[str, Any]]:
+    """Шаги всех трасс сотрудника в порядке начала"""
+    rows = await conn.fetch("""
+        SELECT trace_id, step, started_at, duration_ms, error
+        FROM provisioning_spans
+        WHERE employee_id = $1
+        ORDER BY started_at
+        """, employee_id)
+    return [dict(row) for row in rows]
+
+
+async def get_provisioning_queue_depth(conn: asyncpg.Connection) -> List[Dict[str, Any]]:
+    """Число незавершённых задач провижининга по типу и статусу (по частичному индексу)"""
+    rows = await conn.fetch("""
+        SELECT kind, status, COUNT(*) AS cnt
+        FROM provisioning_jobs
+        WHERE status IN ('queued', 'running')
+        GROUP BY kind, status
+        """)
+    return [dict(row) for row in rows]
+
+
+async def complete_provisioning_job(conn: asyncpg.Connection, job_id: int) -> None:
+    """Отметить задачу выполненной (пароль из payload удаляется)"""
+    await conn.execute("""
+        UPDATE provisioning_jobs
+        SET status = 'done',
+            payload = payload - '{password,custom_password,password_sealed,custom_password_sealed}'::text[],
+            last_error = NULL,
+            locked_by = NULL,
+            locked_until = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1
+        """, job_id)
+
+
+async def fail_provisioning_job(
+        conn: asyncpg.Connection,
+        job_id: int,
+        error: str,
+        retry_delay: Optional[int]
+) -> None:
+    """
+    Зафиксировать ошибку задачи.
+
+    Если retry_delay передан, задача возвращается в очередь с задержкой,
+    иначе помечается как окончательно неуспешная.
+    """
+    if retry_delay is None:
+        await conn.execute("""
+            UPDATE provisioning_jobs
+            SET status = 'failed',
+                payload = payload - '{password,custom_password,password_sealed,custom_password_sealed}'::text[],
+                last_error = $2,
+                locked_by = NULL,
+                locked_until = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = $1
+            """, job_id, error)
+    else:
+        await conn.execute("""
+            UPDATE provisioning_jobs
+            SET status = 'queued',
+                last_error = $2,
+                run_after = CURRENT_TIMESTAMP + make_interval(secs => $3),
+                locked_by = NULL,
+                locked_until = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = $1
+            """, job_id, error, retry_delay)
+
+
+# === Массовая регистрация ===
+
+async def create_onboarding_batch(conn: asyncpg.Connection, batch_id: str) -> None:
+    """Создать запись пакета массовой регистрации"""
+    await conn.execute("""
+        INSERT INTO onboarding_batches (id) VALUES ($1)
+        """, batch_id)
+
+
+async def finish_onboarding_batch(
+        conn: asyncpg.Connection,
+        batch_id: str,
+        total: int,
+        accepted: int,
+        rejected: int,
+        status: str = "loaded"
+) -> None:
+    """Зафиксировать итоги загрузки пакета"""
+    await conn.execute("""
+        UPDATE onboarding_batches
+        SET total_rows = $2,
+            accepted_rows = $3,
+            rejected_rows = $4,
+            status = $5,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1
+        """, batch_id, total, accepted, rejected, status)
+
+
+async def find_taken_logins(conn: asyncpg.Connection, base_logins: List[str]) -> set:
+    """Найти занятые логины вида base, base2, base3... для набора базовых логинов"""
+    if not base_logins:
+        return set()
+
+    rows = await conn.fetch("""
+        SELECT login FROM employees
+        WHERE login = ANY($1::text[])
+           OR login LIKE ANY($2::text[])
+        """, base_logins, [f"{base}%" for base in base_logins])
+    return {row["login"] for row in rows}
+
+
+async def bulk_insert_employees(
+        conn: asyncpg.Connection,
+        batch_id: str,
+        rows: List[Dict[str, Any]],
+        rejected: List[Dict[str, Any]],
+        job_builder
+) -> Dict[int, int]:
+    """
+    Загрузить пачку сотрудников через COPY.
+
+    rows — валидные строки (row_no, last_name, first_name, middle_name,
+    login, email, position + исходная модель в "user"), rejected — строки,
+    не прошедшие валидацию. job_builder(row, employee_id) возвращает
+    список (kind, payload, max_attempts) задач провижининга.
+
+    Должна вызываться внутри транзакции. Возвращает {row_no: employee_id}
+    для вставленных строк; строки с конфликтом логина/email отклоняются.
+    """
+    await conn.execute("""
+        CREATE TEMP TABLE bulk_employees (
+            row_no INTEGER,
+            last_name VARCHAR(100),
+            first_name VARCHAR(100),
+            middle_name VARCHAR(100),
+            login VARCHAR(100),
+            email VARCHAR(255),
+            position VARCHAR(200)
+        ) ON COMMIT DROP
+        """)
+
+    await conn.copy_records_to_table(
+        "bulk_employees",
+        records=[
+            (r["row_no"], r["last_name"], r["first_name"], r["middle_name"],
+             r["login"], r["email"], r["position"])
+            for r in rows
+        ],
+        columns=["row_no", "last_name", "first_name", "middle_name", "login", "email", "position"],
+    )
+
+    inserted = await conn.fetch("""
+        WITH ins AS (
+            INSERT INTO employees
+            (last_name, first_name, middle_name, login, email, position)
+            SELECT last_name, first_name, middle_name, login, email, position
+            FROM bulk_employees
+            ORDER BY row_no
+            ON CONFLICT DO NOTHING
+            RETURNING id, login
+        )
+        SELECT b.row_no, ins.id
+        FROM ins JOIN bulk_employees b ON b.login = ins.login
+        """)
+    employee_ids = {row["row_no"]: row["id"] for row in inserted}
+
+    batch_rows = [
+        (batch_id, r["row_no"], r.get("login"), None, "rejected", r["error"])
+        for r in rejected
+    ]
+    log_rows = []
+    job_rows = []
+    for r in rows:
+        employee_id = employee_ids.get(r["row_no"])
+        if employee_id is None:
+            batch_rows.append((batch_id, r["row_no"], r["login"], None, "rejected",
+                               f"Логин или email {r['login']} уже занят"))
+            continue
+
+        batch_rows.append((batch_id, r["row_no"], r["login"], employee_id, "accepted", None))
+        log_rows.append((employee_id, "create_employee", "database", "success", "Сотрудник создан в БД"))
+        trace_id = uuid.uuid4()
+        for kind, payload, max_attempts in job_builder(r, employee_id):
+            job_rows.append((kind, employee_id, json.dumps(payload), max_attempts, batch_id, trace_id))
+
+    await conn.copy_records_to_table(
+        "onboarding_batch_rows",
+        records=batch_rows,
+        columns=["batch_id", "row_no", "login", "employee_id", "status", "error"],
+    )
+
+    if log_rows:
+        await conn.copy_records_to_table(
+            "operation_logs",
+            records=log_rows,
+            columns=["employee_id", "operation_type", "service", "status", "message"],
+        )
+
+    if job_rows:
+        await conn.copy_records_to_table(
+            "provisioning_jobs",
+            records=job_rows,
+            columns=["kind", "employee_id", "payload", "max_attempts", "batch_id", "trace_id"],
+        )
+
+    return employee_ids
+
+
+async def get_onboarding_batch_progress(
+        conn: asyncpg.Connection,
+        batch_id: str
+) -> Optional[Dict[str, Any]]:
+    """Получить прогресс пакета: итоги и статусы задач по каждой строке"""
+    batch = await conn.fetchrow("""
+        SELECT id, total_rows, accepted_rows, rejected_rows, status, created_at
+        FROM onboarding_batches
+        WHERE id = $1
+        """, batch_id)
+
+    if not batch:
+        return None
+
+    rows = await conn.fetch("""
+        SELECT
+            r.row_no,
+            r.login,
+            r.employee_id,
+            r.status,
+            r.error,
+            COALESCE(j.jobs, '{}'::jsonb) AS jobs
+        FROM onboarding_batch_rows r
+        LEFT JOIN LATERAL (
+            SELECT jsonb_object_agg(pj.kind, pj.status) AS jobs
+            FROM provisioning_jobs pj
+            WHERE pj.batch_id = r.batch_id AND pj.employee_id = r.employee_id
+        ) j ON TRUE
+        WHERE r.batch_id = $1
+        ORDER BY r.row_no
+        """, batch_id)
+
+    job_counts = await conn.fetch("""
+        SELECT kind, status, COUNT(*) AS cnt
+        FROM provisioning_jobs
+        WHERE batch_id = $1
+        GROUP BY kind, status
+        """, batch_id)
+
+    jobs: Dict[str, Dict[str, int]] = {}
+    for row in job_counts:
+        jobs.setdefault(row["kind"], {})[row["status"]] = row["cnt"]
+
+    return {
+        "batch_id": str(batch["id"]),
+        "status": batch["status"],
+        "total": batch["total_rows"],
+        "accepted": batch["accepted_rows"],
+        "rejected": batch["rejected_rows"],
+        "created_at": batch["created_at"],
+        "jobs": jobs,
+        "rows": [
+            {
+                "row": row["row_no"],
+                "login": row["login"],
+                "employee_id": row["employee_id"],
+                "status": row["status"],
+                "error": row["error"],
+                "jobs": json.loads(row["jobs"]),
+            }
+            for row in rows
+        ],
+    }
+
+
+# === Массовое создание записей Bitwarden ===
+
+async def get_bitwarden_batch_items(
+        conn: asyncpg.Connection,
+        idempotency_key: str
+) -> Dict[int, Dict[str, Any]]:
+    """Уже созданные записи пакета: {item_no: {name, username, bitwarden_item_id}}"""
+    rows = await conn.fetch("""
+        SELECT item_no, name, username, bitwarden_item_id
+        FROM bitwarden_batch_items
+        WHERE idempotency_key = $1
+        """, idempotency_key)
+    return {row["item_no"]: dict(row) for row in rows}
+
+
+async def save_bitwarden_batch_item(
+        conn: asyncpg.Connection,
+        idempotency_key: str,
+        item_no: int,
+        name: str,
+        username: str,
+        bitwarden_item_id: str
+) -> None:
+    """Запомнить созданную запись пакета (пароль не сохраняется)"""
+    await conn.execute("""
+        INSERT INTO bitwarden_batch_items
+        (idempotency_key, item_no, name, username, bitwarden_item_id)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (idempotency_key, item_no) DO NOTHING
+        """, idempotency_key, item_no, name, username, bitwarden_item_id)
@@ -0,0 +1,144 @@
+import asyncpg
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+
+class EmployeeRecord(asyncpg.Record):
+    """Строка сотрудника; ключи уже в формате ответа API (lastName, has_mail, ...)"""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self)
+
+
+class EmployeeListRecord(asyncpg.Record):
+    """Строка таблицы сотрудников (fullName собирается в SQL)"""
+
+    def to_dict(self) -> Dict[str, Any]:
+        item = dict(self)
+        item["status"] = {"mail": item.pop("mail_active"), "ad": item.pop("ad_active")}
+        return item
+
+
+@dataclass(frozen=True)
+class Statement:
+    """Запрос реестра и класс строк его результата"""
+    sql: str
+    record_class: Type[asyncpg.Record] = asyncpg.Record
+
+
+# Проекция полей сотрудника в формат API — переименование выполняет Postgres
+_EMPLOYEE_COLUMNS = """
+    e.id,
+    e.last_name AS "lastName",
+    e.first_name AS "firstName",
+    e.middle_name AS "middleName",
+    e.login,
+    e.email,
+    e.position,
+    EXISTS (
+        SELECT 1 FROM employee_mail_accounts em WHERE em.employee_id = e.id
+    ) AS has_mail,
+    e.created_at
+"""
+
+_EMPLOYEE_LIST_COLUMNS = """
+    e.id,
+    concat_ws(' ', e.last_name, e.first_name, NULLIF(e.middle_name, '')) AS "fullName",
+    e.login,
+    e.email,
+    e.position,
+    EXISTS (
+        SELECT 1 FROM employee_mail_accounts em
+        WHERE em.employee_id = e.id AND em.status = 'created'
+    ) AS mail_active,
+    EXISTS (
+        SELECT 1 FROM employee_ad_accounts ad
+        WHERE ad.employee_id = e.id AND ad.status = 'created'
+    ) AS ad_active,
+    e.created_at
+"""
+
+SEARCH_EMPLOYEES_CONTAINS = Statement(f"""
+    SELECT {_EMPLOYEE_COLUMNS}
+    FROM employees e
+    WHERE e.search_text LIKE '%' || staffflow_search_norm($1) || '%'
+    ORDER BY e.last_name, e.first_name
+    LIMIT $2
+""", EmployeeRecord)
+
+SEARCH_EMPLOYEES_PREFIX = Statement(f"""
+    WITH q AS (SELECT staffflow_search_norm($1) AS term)
+    SELECT {_EMPLOYEE_COLUMNS}
+    FROM employees e, q
+    WHERE
+        e.search_text LIKE q.term || '%' OR
+        e.search_text LIKE '% ' || q.term || '%'
+    ORDER BY
+        e.search_text LIKE q.term || '%' DESC,
+        word_similarity(q.term, e.search_text) DESC,
+        e.last_name, e.first_name
+    LIMIT $2
+""", EmployeeRecord)
+
+LIST_EMPLOYEES_OFFSET = Statement(f"""
+    SELECT {_EMPLOYEE_LIST_COLUMNS}
+    FROM employees e
+    ORDER BY e.created_at DESC, e.id DESC
+    LIMIT $1 OFFSET $2
+""", EmployeeListRecord)
+
+LIST_EMPLOYEES_KEYSET = Statement(f"""
+    SELECT {_EMPLOYEE_LIST_COLUMNS}
+    FROM employees e
+    WHERE (e.created_at, e.id) < ($2, $3)
+    ORDER BY e.created_at DESC, e.id DESC
+    LIMIT $1
+""", EmployeeListRecord)
+
+GET_EMPLOYEE_BY_LOGIN = Statement(f"""
+    SELECT {_EMPLOYEE_COLUMNS}
+    FROM employees e
+    WHERE e.login = $1
+""", EmployeeRecord)
+
+COUNT_EMPLOYEES = Statement("""
+    SELECT COUNT(*) FROM employees
+""")
+
+ESTIMATE_EMPLOYEES = Statement("""
+    SELECT reltuples::bigint FROM pg_class WHERE oid = 'employees'::regclass
+""")
+
+EMPLOYEE_STATISTICS = Statement("""
+    SELECT
+        COALESCE(SUM(registered), 0) AS total,
+        COALESCE(SUM(mail_created), 0) AS with_mail,
+        COALESCE(SUM(registered) FILTER (WHERE day = CURRENT_DATE), 0) AS today,
+        COALESCE(SUM(registered) FILTER (WHERE day >= CURRENT_DATE - 7), 0) AS week
+    FROM employee_daily_stats
+""")
+
+
+# Запросы выполняются обычными fetch*/fetchval: asyncpg держит кэш
+# подготовленных операторов на каждом физическом соединении
+# (statement_cache_size), поэтому запрос реестра готовится один раз
+# на соединение и переживает возврат соединения в пул. Сохранённые
+# PreparedStatement для этого не годятся — пул аннулирует их при release.
+
+
+async def fetch(conn: asyncpg.Connection, stmt: Statement, *args) -> List[asyncpg.Record]:
+    """Выполнить запрос реестра и вернуть строки его record_class"""
+    return await conn.fetch(stmt.sql, *args, record_class=stmt.record_class)
+
+
+async def fetchrow(conn: asyncpg.Connection, stmt: Statement, *args) -> Optional[asyncpg.Record]:
+    """Выполнить запрос реестра и вернуть первую строку"""
+    return await conn.fetchrow(stmt.sql, *args, record_class=stmt.record_class)
+
+
+async def fetchval(conn: asyncpg.Connection, stmt: Statement, *args) -> Any:
+    """Выполнить запрос реестра и вернуть значение первой колонки"""
+    return await conn.fetchval(stmt.sql, *args)
@@ -2,14 +2,16 @@ from services.bitwarden_vault_client import (
     BitwardenVaultClient,
     BitwardenVaultLocked,
     BitwardenVaultError,
+    get_vault_client,
 )
 
 
-def get_bitwarden_client() -> BitwardenVaultClient:
-    client = BitwardenVaultClient()
+async def get_bitwarden_client() -> BitwardenVaultClient:
+    client = get_vault_client()
 
     try:
-        client.assert_unlocked()
+        # Состояние vault берётся из кэша клиента, без запроса к bw serve
+        await client.assert_unlocked()
     except BitwardenVaultLocked:
         # Fail fast — vault есть, но заблокирован
         raise
@@ -1,9 +1,12 @@
-from database.connection import get_db_connection, release_connection
+from database.connection import db_connection
 
 
 async def get_db():
-    conn = await get_db_connection()
-    try:
+    async with db_connection() as conn:
+        yield conn
+
+
+async def get_db_transaction():
+    """Соединение с открытой транзакцией на время запроса"""
+    async with db_connection(transaction=True) as conn:
         yield conn
-    finally:
-        await release_connection(conn)
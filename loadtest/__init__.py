@@ -0,0 +1,11 @@
+"""
+Нагрузочный прогон онбординга с локальными заглушками бэкендов.
+
+Поднимает приложение и воркер провижининга в одном процессе против
+одноразового Postgres, заглушки Mail.ru и `bw serve` (HTTP) и LDAP
+в памяти, затем нагружает /api/register, /api/search и /api/employees
+на заданных уровнях параллелизма. Результат — JSON (см. runner.Report).
+
+    python -m loadtest --concurrency 1,8,32 --requests 200 --output result.json
+    python -m loadtest --baseline result.json --max-regression 0.2
+"""
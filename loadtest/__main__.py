@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from loadtest.faults import Fault  # noqa: E402
+from loadtest.report import compare  # noqa: E402
+from loadtest.runner import SCENARIOS, LoadTest  # noqa: E402
+
+
+def _levels(value: str):
+    levels = [int(level) for level in value.split(",") if level.strip()]
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("ожидается список положительных чисел через запятую")
+    return levels
+
+
+def _scenarios(value: str):
+    scenarios = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+    return scenarios
+
+
+def _add_fault(parser: argparse.ArgumentParser, name: str, title: str, latency: float):
+    parser.add_argument(f"--{name}-latency", type=float, default=latency, help=f"задержка {title}, с")
+    parser.add_argument(f"--{name}-jitter", type=float, default=latency / 2, help=f"разброс задержки {title}, с")
+    parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help=f"доля ошибок {title} (0..1)")
+
+
+def _fault(args: argparse.Namespace, name: str) -> Fault:
+    return Fault(
+        latency=getattr(args, f"{name}_latency"),
+        jitter=getattr(args, f"{name}_jitter"),
+        error_rate=getattr(args, f"{name}_error_rate"),
+    )
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    test = LoadTest(
+        concurrency=args.concurrency,
+        requests=args.requests,
+        scenarios=args.scenarios,
+        ldap_fault=_fault(args, "ldap"),
+        mail_fault=_fault(args, "mail"),
+        bitwarden_fault=_fault(args, "bw"),
+        postgres_dsn=args.postgres_dsn,
+        drain_timeout=args.drain_timeout,
+        repeat=args.repeat,
+    )
+    try:
+        await test.start()
+        return await test.run()
+    finally:
+        await test.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон StaffFlow с заглушками AD, Mail.ru и Bitwarden")
+    parser.add_argument("--concurrency", type=_levels, default=[1, 8, 32], help="уровни параллелизма, например 1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="запросов на сценарий и уровень")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="повторов каждого сценария; в отчёт и сравнение идут медианы")
+    parser.add_argument("--scenarios", type=_scenarios, default=list(SCENARIOS),
+                        help=f"сценарии через запятую ({', '.join(SCENARIOS)})")
+    parser.add_argument("--postgres-dsn", default=os.environ.get("LOADTEST_POSTGRES_DSN"),
+                        help="сервер для временной базы; без него — initdb/pg_ctl или docker")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="предел ожидания разбора очереди провижининга, с")
+    _add_fault(parser, "ldap", "AD", 0.02)
+    _add_fault(parser, "mail", "Mail.ru", 0.1)
+    _add_fault(parser, "bw", "bw serve", 0.05)
+    parser.add_argument("--output", help="записать отчёт JSON в файл (по умолчанию — stdout)")
+    parser.add_argument("--baseline", help="отчёт JSON прошлого прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="допустимое ухудшение относительно baseline (доля)")
+    parser.add_argument("--min-latency-delta", type=float, default=5.0,
+                        help="рост задержки меньше этого, мс, не считается регрессией")
+    args = parser.parse_args()
+
+    # Логи приложения — только предупреждения, ход прогона — в stderr
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logging.getLogger("loadtest").setLevel(logging.INFO)
+    report = asyncio.run(_run(args))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression, args.min_latency_delta)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"✅ Отчёт записан в {args.output}")
+    else:
+        print(text)
+
+    if regressions:
+        print("❌ Регрессии относительно baseline:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Fault:
+    """Задержка (секунды, с равномерным разбросом ±jitter) и доля ошибок заглушки"""
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+
+    def delay(self) -> float:
+        return max(self.latency + random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def failed(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    async def apply(self) -> bool:
+        """Выдержать задержку; True — этот вызов должен завершиться ошибкой"""
+        delay = self.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self.failed()
+
+    def apply_sync(self) -> bool:
+        """То же для синхронного кода (потоки AD-шлюза)"""
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+        return self.failed()
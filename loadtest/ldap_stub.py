@@ -0,0 +1,137 @@
+import threading
+from typing import Dict, List, Optional
+
+from loadtest.faults import Fault
+
+SUCCESS = {"result": 0, "description": "success", "message": ""}
+BUSY = {"result": 51, "description": "busy", "message": "injected error"}
+ALREADY_EXISTS = {"result": 68, "description": "entryAlreadyExists", "message": ""}
+NO_SUCH_OBJECT = {"result": 32, "description": "noSuchObject", "message": ""}
+
+
+class FakeDirectory:
+    """
+    Каталог в памяти, общий для всех соединений заглушки.
+
+    Группы создаются при первом добавлении участника; каждая операция
+    выдерживает задержку fault и с вероятностью fault.error_rate
+    отвечает busy (как перегруженный контроллер домена).
+    """
+
+    def __init__(self, fault: Fault):
+        self.fault = fault
+        self.entries: Dict[str, dict] = {}
+        self.members: Dict[str, set] = {}
+        self.operations = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def execute(self, operation) -> dict:
+        failed = self.fault.apply_sync()
+        with self._lock:
+            self.operations += 1
+            if failed:
+                self.errors += 1
+                return BUSY
+            return operation()
+
+    def connection(self) -> "FakeLDAPConnection":
+        """Фабрика соединений для LDAPConnectionPool"""
+        return FakeLDAPConnection(self)
+
+
+class _Extend:
+    def __init__(self, conn: "FakeLDAPConnection"):
+        self.microsoft = self
+        self.standard = self
+        self._conn = conn
+
+    def modify_password(self, user_dn: str, new_password: str, old_password: Optional[str] = None) -> bool:
+        directory = self._conn.directory
+        return self._conn._run(lambda: SUCCESS if user_dn in directory.entries else NO_SUCH_OBJECT)
+
+    def who_am_i(self) -> Optional[str]:
+        if self._conn._run(lambda: SUCCESS):
+            return "u:LOADTEST\\admin"
+        return None
+
+
+class _Attribute:
+    def __init__(self, value):
+        self.value = value
+
+
+class _Entry:
+    """Запись результата поиска: entry["sAMAccountName"].value, как в ldap3"""
+
+    def __init__(self, dn: str, attributes: dict):
+        self.entry_dn = dn
+        self._attributes = attributes
+
+    def __getitem__(self, name: str) -> _Attribute:
+        return _Attribute(self._attributes.get(name))
+
+
+class FakeLDAPConnection:
+    """Подмножество ldap3.Connection, которое использует приложение"""
+
+    def __init__(self, directory: FakeDirectory):
+        self.directory = directory
+        self.result: dict = SUCCESS
+        self.entries: List[_Entry] = []
+        self.bound = True
+        self.closed = False
+        self.extend = _Extend(self)
+
+    def _run(self, operation) -> bool:
+        self.result = self.directory.execute(operation)
+        return self.result["description"] == "success"
+
+    def add(self, dn: str, object_class=None, attributes: Optional[dict] = None) -> bool:
+        entries = self.directory.entries
+
+        def add():
+            if dn in entries:
+                return ALREADY_EXISTS
+            entries[dn] = dict(attributes or {})
+            return SUCCESS
+
+        return self._run(add)
+
+    def modify(self, dn: str, changes: dict) -> bool:
+        directory = self.directory
+
+        def modify():
+            members: List[str] = []
+            for attribute, operations in changes.items():
+                for _, values in operations:
+                    if attribute == "member":
+                        members.extend(values)
+            if members:
+                directory.members.setdefault(dn, set()).update(members)
+                return SUCCESS
+            return SUCCESS if dn in directory.entries else NO_SUCH_OBJECT
+
+        return self._run(modify)
+
+    def delete(self, dn: str) -> bool:
+        return self._run(lambda: SUCCESS if self.directory.entries.pop(dn, None) is not None else NO_SUCH_OBJECT)
+
+    def search(self, search_base: str, search_filter: str, search_scope=None, attributes=None) -> bool:
+        """Поиск по базовому DN (проверка существующей учётной записи и RootDSE)"""
+        entries = self.directory.entries
+        self.entries = []
+
+        def search():
+            if search_base in entries:
+                self.entries = [_Entry(search_base, entries[search_base])]
+            return SUCCESS
+
+        return self._run(search)
+
+    def rebind(self, user=None, password=None) -> bool:
+        return self._run(lambda: SUCCESS)
+
+    def unbind(self):
+        self.bound = False
+        self.closed = True
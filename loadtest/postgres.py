@@ -0,0 +1,140 @@
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+DOCKER_IMAGE = "postgres:17-alpine"
+START_TIMEOUT = 60.0
+
+
+@dataclass
+class PostgresTarget:
+    host: str
+    port: int
+    user: str
+    password: str
+    name: str
+
+    def env(self) -> dict:
+        """Переменные окружения для DatabaseConfig (префикс postgres_)"""
+        return {
+            "POSTGRES_HOST": self.host,
+            "POSTGRES_PORT": str(self.port),
+            "POSTGRES_USER": self.user,
+            "POSTGRES_PASSWORD": self.password,
+            "POSTGRES_NAME": self.name,
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(host: str, port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Postgres не поднялся на {host}:{port} за {timeout:.0f} с")
+
+
+class ThrowawayPostgres:
+    """
+    Одноразовая база для прогона, удаляется в stop().
+
+    Источник выбирается по порядку:
+    - dsn — на существующем сервере создаётся база staffflow_lt_<id>;
+    - initdb/pg_ctl из PATH — кластер во временном каталоге на свободном порту;
+    - docker — контейнер postgres:17-alpine с --rm.
+    """
+
+    def __init__(self, dsn: Optional[str] = None):
+        self.dsn = dsn
+        self.target: Optional[PostgresTarget] = None
+        self._admin_dsn: Optional[str] = None
+        self._datadir: Optional[str] = None
+        self._container: Optional[str] = None
+
+    async def start(self) -> PostgresTarget:
+        if self.dsn:
+            self.target = await self._create_database(self.dsn)
+        elif shutil.which("initdb") and shutil.which("pg_ctl"):
+            self.target = self._start_cluster()
+        elif shutil.which("docker"):
+            self.target = self._start_container()
+        else:
+            raise RuntimeError("Нет Postgres: укажите --postgres-dsn, установите initdb/pg_ctl или docker")
+        logger.info(f"✅ Postgres для прогона: {self.target.host}:{self.target.port}/{self.target.name}")
+        return self.target
+
+    async def stop(self):
+        if self._admin_dsn and self.target:
+            import asyncpg
+            conn = await asyncpg.connect(self._admin_dsn)
+            try:
+                await conn.execute(f'DROP DATABASE IF EXISTS "{self.target.name}" WITH (FORCE)')
+            finally:
+                await conn.close()
+        if self._datadir:
+            subprocess.run(["pg_ctl", "-D", self._datadir, "-m", "immediate", "stop"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            shutil.rmtree(self._datadir, ignore_errors=True)
+        if self._container:
+            subprocess.run(["docker", "rm", "-f", self._container],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def _create_database(self, dsn: str) -> PostgresTarget:
+        import asyncpg
+        url = urlparse(dsn)
+        name = f"staffflow_lt_{uuid.uuid4().hex[:8]}"
+        conn = await asyncpg.connect(dsn)
+        try:
+            await conn.execute(f'CREATE DATABASE "{name}"')
+        finally:
+            await conn.close()
+        self._admin_dsn = dsn
+        return PostgresTarget(url.hostname or "localhost", url.port or 5432,
+                              url.username or "postgres", url.password or "", name)
+
+    def _start_cluster(self) -> PostgresTarget:
+        self._datadir = tempfile.mkdtemp(prefix="staffflow-lt-pg-")
+        port = free_port()
+        subprocess.run(["initdb", "-D", self._datadir, "-U", "postgres", "--auth=trust"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([
+            "pg_ctl", "-D", self._datadir, "-l", os.path.join(self._datadir, "server.log"), "-w",
+            "-o", f"-p {port} -k {self._datadir} -c listen_addresses=127.0.0.1 -c fsync=off", "start",
+        ], check=True, stdout=subprocess.DEVNULL)
+        return PostgresTarget("127.0.0.1", port, "postgres", "", "postgres")
+
+    def _start_container(self) -> PostgresTarget:
+        port = free_port()
+        self._container = f"staffflow-lt-{uuid.uuid4().hex[:8]}"
+        subprocess.run([
+            "docker", "run", "-d", "--rm", "--name", self._container,
+            "-e", "POSTGRES_PASSWORD=postgres", "-p", f"127.0.0.1:{port}:5432",
+            DOCKER_IMAGE, "-c", "fsync=off",
+        ], check=True, stdout=subprocess.DEVNULL)
+        _wait_for_port("127.0.0.1", port, START_TIMEOUT)
+        # Порт открывается до окончания инициализации — ждём готовности сервера
+        deadline = time.monotonic() + START_TIMEOUT
+        while subprocess.run(["docker", "exec", self._container, "pg_isready", "-h", "127.0.0.1", "-U", "postgres"],
+                             stdout=subprocess.DEVNULL).returncode != 0:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Postgres в контейнере не готов")
+            time.sleep(0.5)
+        return PostgresTarget("127.0.0.1", port, "postgres", "postgres", "postgres")
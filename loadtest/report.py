@@ -0,0 +1,111 @@
+import math
+import statistics
+from typing import Any, Dict, List
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль по ближайшему рангу; values отсортированы"""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Итог одного сценария на одном уровне параллелизма (latencies — секунды)"""
+    values = sorted(latencies)
+    requests = len(values)
+    ms = [v * 1000 for v in values]
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+            "max": round(ms[-1], 2) if ms else 0.0,
+            "mean": round(sum(ms) / requests, 2) if requests else 0.0,
+        },
+    }
+
+
+def median_of(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Медиана каждого числового поля по повторам (вложенные словари — так же).
+
+    Флаги (drained) должны быть истинны во всех повторах.
+    """
+    merged: Dict[str, Any] = {}
+    for key, value in results[0].items():
+        values = [r[key] for r in results]
+        if isinstance(value, dict):
+            merged[key] = median_of(values)
+        elif isinstance(value, bool):
+            merged[key] = all(values)
+        elif isinstance(value, (int, float)):
+            merged[key] = statistics.median(values)
+        else:
+            merged[key] = value
+    return merged
+
+
+def compare(
+        report: Dict[str, Any],
+        baseline: Dict[str, Any],
+        max_regression: float,
+        min_latency_delta: float = 5.0
+) -> List[str]:
+    """
+    Регрессии относительно baseline (прошлый JSON-отчёт).
+
+    Сравниваются только совпадающие сценарии и уровни параллелизма:
+    p50 и p95 не должны вырасти, а rps и скорость провижининга — упасть
+    больше чем на max_regression (доля); доля ошибок не должна вырасти
+    больше чем на max_regression в абсолютном выражении.
+
+    Рост задержки меньше min_latency_delta мс не считается регрессией
+    (шум на быстрых запросах), p99 только выводится: при сотнях запросов
+    это одно-два самых медленных и от прогона к прогону он скачет.
+    """
+    regressions = []
+
+    # Объём данных в базе зависит от числа запросов и повторов — иначе
+    # поиск и список сотрудников сравнивались бы на разных таблицах
+    for key in ("requests_per_level", "repeat"):
+        if key in baseline and baseline[key] != report.get(key):
+            regressions.append(f"параметры несопоставимы: {key} {baseline[key]} → {report.get(key)}")
+    if regressions:
+        return regressions
+
+    def worse(name: str, current: float, previous: float, higher_is_better: bool, min_delta: float = 0.0):
+        if not previous or abs(current - previous) < min_delta:
+            return
+        change = (current - previous) / previous
+        if higher_is_better:
+            change = -change
+        if change > max_regression:
+            regressions.append(f"{name}: {previous} → {current} ({change:+.0%})")
+
+    for scenario, levels in report.get("scenarios", {}).items():
+        for level, result in levels.items():
+            previous = baseline.get("scenarios", {}).get(scenario, {}).get(level)
+            if previous is None:
+                continue
+            prefix = f"{scenario}@{level}"
+            for p in ("p50", "p95"):
+                worse(f"{prefix} {p}", result["latency_ms"][p], previous["latency_ms"][p],
+                      higher_is_better=False, min_delta=min_latency_delta)
+            worse(f"{prefix} rps", result["rps"], previous["rps"], higher_is_better=True)
+            if result["error_rate"] - previous["error_rate"] > max_regression:
+                regressions.append(f"{prefix} error_rate: {previous['error_rate']} → {result['error_rate']}")
+
+    for level, result in report.get("provisioning", {}).items():
+        previous = baseline.get("provisioning", {}).get(level)
+        if previous is None:
+            continue
+        worse(f"provisioning@{level} per_second", result["per_second"], previous["per_second"], higher_is_better=True)
+
+    return regressions
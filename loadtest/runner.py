@@ -0,0 +1,289 @@
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import time
+import uuid
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from loadtest.faults import Fault
+from loadtest.ldap_stub import FakeDirectory
+from loadtest.postgres import ThrowawayPostgres, free_port
+from loadtest.report import median_of, summarize
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("register", "search", "employees")
+
+DEFAULT_GROUP = "CN=Staff,OU=Groups,DC=testdomain,DC=local"
+DRAIN_POLL_INTERVAL = 0.2
+
+
+class _MemoryTokenStorage:
+    """Токены Mail.ru в памяти — прогон не трогает файл токенов"""
+
+    def __init__(self):
+        self.tokens: Dict = {}
+
+    def save(self, tokens: Dict):
+        self.tokens = dict(tokens)
+
+    def load(self) -> Optional[Dict]:
+        return self.tokens
+
+
+class LoadTest:
+    """
+    Прогон: заглушки и Postgres → приложение и воркер в этом процессе →
+    сценарии на каждом уровне параллелизма → отчёт.
+
+    Конфигурация приложения кэшируется при первом load_config(), поэтому
+    переменные окружения выставляются до импорта модулей приложения.
+    """
+
+    def __init__(
+        self,
+        concurrency: List[int],
+        requests: int,
+        scenarios: List[str],
+        ldap_fault: Fault,
+        mail_fault: Fault,
+        bitwarden_fault: Fault,
+        postgres_dsn: Optional[str] = None,
+        drain_timeout: float = 120.0,
+        repeat: int = 3,
+    ):
+        self.concurrency = concurrency
+        self.requests = requests
+        self.repeat = repeat
+        self.scenarios = scenarios
+        self.faults = {"ldap": ldap_fault, "mail": mail_fault, "bitwarden": bitwarden_fault}
+        self.drain_timeout = drain_timeout
+        self.run_id = uuid.uuid4().hex[:6]
+
+        from loadtest.stubs import BitwardenStub, MailStub
+        self.directory = FakeDirectory(ldap_fault)
+        self.mail = MailStub(mail_fault)
+        self.bitwarden = BitwardenStub(bitwarden_fault)
+        self.postgres = ThrowawayPostgres(postgres_dsn)
+
+        self._registrations = itertools.count(1)
+        self._server = None
+        self._server_task: Optional[asyncio.Task] = None
+        self._worker = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self.base_url = ""
+
+    # ---------- окружение ----------
+
+    def _configure(self, db_env: Dict[str, str]):
+        os.environ.update(db_env)
+        os.environ.update({
+            "MAIL_API_URL": self.mail.api_url,
+            "MAIL_TOKEN_URL": self.mail.token_url,
+            "MAIL_RETRY_BASE_DELAY": "0.05",
+            "BTW_BASE_URL": self.bitwarden.url,
+        })
+        # Настройки прогона, которые можно переопределить снаружи
+        for key, value in {
+            "LOG_LEVEL": "WARNING",
+            "QUEUE_POLL_INTERVAL": "0.05",
+            "QUEUE_RETRY_BASE_DELAY": "1",
+            "QUEUE_RETRY_MAX_DELAY": "5",
+        }.items():
+            os.environ.setdefault(key, value)
+
+    def _install_backends(self):
+        from config.config import load_config
+        from services import ad_pool
+        from services.mail_service import token_manager
+
+        ad_pool._pool = ad_pool.LDAPConnectionPool(load_config().ad, factory=self.directory.connection)
+
+        token_manager.storage = _MemoryTokenStorage()
+        # Без expires_at токен считается истёкшим — первый вызов обновит его у заглушки
+        token_manager.tokens = {"refresh_token": "loadtest"}
+
+    async def start(self):
+        await self.mail.start()
+        await self.bitwarden.start()
+        target = await self.postgres.start()
+        self._configure(target.env())
+        self._install_backends()
+
+        import uvicorn
+        from main import app
+        from services.provisioning_worker import ProvisioningWorker
+
+        port = free_port()
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", access_log=False,
+        ))
+        self._server_task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._server_task.done():
+                self._server_task.result()
+                raise RuntimeError("Сервер приложения остановился при запуске")
+            await asyncio.sleep(0.05)
+
+        self._worker = ProvisioningWorker(worker_id=f"loadtest-{self.run_id}")
+        self._worker_task = asyncio.create_task(self._worker.run())
+        logger.info(f"🚀 Приложение и воркер запущены: {self.base_url}")
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.stop()
+            await self._worker_task
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._server_task
+        await self.mail.stop()
+        await self.bitwarden.stop()
+        await self.postgres.stop()
+
+    # ---------- сценарии ----------
+
+    async def _register(self, session: aiohttp.ClientSession, n: int) -> bool:
+        number = next(self._registrations)
+        async with session.post(f"{self.base_url}/api/register", json={
+            "lastName": f"Loadtest{self.run_id}x{number}",
+            "firstName": "Ivan",
+            "middleName": "Petrovich",
+            "position": "Engineer",
+            "password": f"Lt-{uuid.uuid4().hex[:12]}!",
+        }) as response:
+            await response.read()
+            return response.status == 200
+
+    async def _search(self, session: aiohttp.ClientSession, n: int) -> bool:
+        mode = "prefix" if n % 2 else "contains"
+        async with session.get(f"{self.base_url}/api/search", params={
+            "q": f"loadtest{self.run_id}", "limit": "10", "mode": mode,
+        }) as response:
+            await response.read()
+            return response.status == 200
+
+    async def _employees(self, session: aiohttp.ClientSession, n: int) -> bool:
+        async with session.get(f"{self.base_url}/api/employees", params={
+            "page": str(n % 5 + 1), "size": "20",
+        }) as response:
+            await response.read()
+            return response.status == 200
+
+    async def _drive(
+        self,
+        call: Callable[[aiohttp.ClientSession, int], Awaitable[bool]],
+        concurrency: int,
+    ) -> Dict[str, Any]:
+        """requests запросов сценария, не больше concurrency одновременно"""
+        latencies: List[float] = []
+        errors = 0
+        numbers = iter(range(self.requests))
+
+        async def client(session: aiohttp.ClientSession):
+            nonlocal errors
+            for n in numbers:
+                started = time.perf_counter()
+                try:
+                    ok = await call(session, n)
+                except aiohttp.ClientError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                if not ok:
+                    errors += 1
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(client(session) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        return summarize(latencies, errors, elapsed)
+
+    async def _job_counts(self) -> Dict[str, int]:
+        from database.connection import db_connection
+        async with db_connection() as conn:
+            rows = await conn.fetch("SELECT status, COUNT(*) AS n FROM provisioning_jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+    async def _drain(self, started: float, registrations: int, before: Dict[str, int]) -> Dict[str, Any]:
+        """Дождаться, пока воркер разберёт очередь, и посчитать скорость провижининга"""
+        deadline = started + self.drain_timeout
+        drained = False
+        while time.perf_counter() < deadline:
+            counts = await self._job_counts()
+            if not counts.get("queued") and not counts.get("running"):
+                drained = True
+                break
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        elapsed = time.perf_counter() - started
+        counts = await self._job_counts()
+        return {
+            "registrations": registrations,
+            "drained": drained,
+            "seconds": round(elapsed, 3),
+            "per_second": round(registrations / elapsed, 2) if drained and elapsed > 0 else 0.0,
+            "jobs_done": counts.get("done", 0) - before.get("done", 0),
+            "jobs_failed": counts.get("failed", 0) - before.get("failed", 0),
+        }
+
+    async def _seed(self):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{self.base_url}/api/ad-group-rules", json={
+                "match_type": "any", "ad_groups": [DEFAULT_GROUP],
+            }) as response:
+                response.raise_for_status()
+
+    async def run(self) -> Dict[str, Any]:
+        calls = {"register": self._register, "search": self._search, "employees": self._employees}
+        report: Dict[str, Any] = {
+            "run_id": self.run_id,
+            "started_at": datetime.now().isoformat(),
+            "requests_per_level": self.requests,
+            "repeat": self.repeat,
+            "concurrency": self.concurrency,
+            "faults": {name: asdict(fault) for name, fault in self.faults.items()},
+            "scenarios": {scenario: {} for scenario in self.scenarios},
+            "provisioning": {},
+        }
+
+        await self._seed()
+        for concurrency in self.concurrency:
+            level = str(concurrency)
+            for scenario in self.scenarios:
+                # Каждый сценарий повторяется repeat раз, в отчёт идут медианы:
+                # одиночный прогон длиной в секунду слишком шумный для сравнения
+                results, provisioning = [], []
+                for _ in range(self.repeat):
+                    if scenario == "register":
+                        before = await self._job_counts()
+                        started = time.perf_counter()
+                        result = await self._drive(calls[scenario], concurrency)
+                        accepted = result["requests"] - result["errors"]
+                        provisioning.append(await self._drain(started, accepted, before))
+                    else:
+                        result = await self._drive(calls[scenario], concurrency)
+                    results.append(result)
+
+                result = report["scenarios"][scenario][level] = median_of(results)
+                if provisioning:
+                    report["provisioning"][level] = median_of(provisioning)
+                print(
+                    f"{scenario}@{concurrency}: {result['rps']} rps, "
+                    f"p50 {result['latency_ms']['p50']} / p95 {result['latency_ms']['p95']} / "
+                    f"p99 {result['latency_ms']['p99']} мс, ошибок {result['errors']} "
+                    f"(медиана {self.repeat} повторов)",
+                    file=sys.stderr,
+                )
+
+        report["backends"] = {
+            "ldap": {"operations": self.directory.operations, "errors": self.directory.errors},
+            "mail": self.mail.stats(),
+            "bitwarden": self.bitwarden.stats(),
+        }
+        return report
@@ -0,0 +1,110 @@
+import itertools
+import uuid
+from typing import Optional
+
+from aiohttp import web
+
+from loadtest.faults import Fault
+
+
+class HTTPStub:
+    """Заглушка HTTP-бэкенда на 127.0.0.1 (порт выбирается свободный)"""
+
+    def __init__(self, fault: Fault):
+        self.fault = fault
+        self.requests = 0
+        self.errors = 0
+        self.port: Optional[int] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def routes(self, app: web.Application):
+        raise NotImplementedError
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        self.routes(app)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _faulty(self) -> bool:
+        self.requests += 1
+        failed = await self.fault.apply()
+        if failed:
+            self.errors += 1
+        return failed
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors}
+
+
+class MailStub(HTTPStub):
+    """
+    Mail.ru: POST /api/v1/domains/{id}/users и POST /token (o2.mail.ru).
+
+    Внедрённые ошибки отвечают 503 — клиент повторяет их, как настоящие.
+    """
+
+    def __init__(self, fault: Fault):
+        super().__init__(fault)
+        self.token_refreshes = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api/v1"
+
+    @property
+    def token_url(self) -> str:
+        return f"{self.url}/token"
+
+    def routes(self, app: web.Application):
+        app.router.add_post("/api/v1/domains/{domain_id}/users", self.create_user)
+        app.router.add_post("/token", self.token)
+
+    async def create_user(self, request: web.Request) -> web.Response:
+        if await self._faulty():
+            return web.json_response({"error": "injected error"}, status=503)
+        if not request.query.get("access_token"):
+            return web.json_response({"error": "access_token required"}, status=401)
+        data = await request.json()
+        return web.json_response({"id": next(self._ids), "username": data.get("username")}, status=201)
+
+    async def token(self, request: web.Request) -> web.Response:
+        self.token_refreshes += 1
+        return web.json_response({
+            "access_token": uuid.uuid4().hex,
+            "refresh_token": uuid.uuid4().hex,
+            "expires_in": 3600,
+        })
+
+    def stats(self) -> dict:
+        return {**super().stats(), "token_refreshes": self.token_refreshes}
+
+
+class BitwardenStub(HTTPStub):
+    """`bw serve`: GET /status (vault разблокирован) и POST /object/item"""
+
+    def routes(self, app: web.Application):
+        app.router.add_get("/status", self.status)
+        app.router.add_post("/object/item", self.create_item)
+
+    async def status(self, request: web.Request) -> web.Response:
+        return web.json_response({"success": True, "data": {"template": {"status": "unlocked"}}})
+
+    async def create_item(self, request: web.Request) -> web.Response:
+        if await self._faulty():
+            return web.json_response({"success": False, "message": "injected error"}, status=500)
+        data = await request.json()
+        return web.json_response({"success": True, "data": {"id": str(uuid.uuid4()), "name": data.get("name")}})
@@ -1,4 +1,3 @@
-import uvicorn
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -6,10 +5,16 @@ import os
 import logging
 from contextlib import asynccontextmanager
 
-import datetime
+from datetime import datetime
 from config.config import load_config, Config
 from api.endpoints import router as api_router
 from database.connection import init_db, close_db
+from database.audit_log import start_audit_sink, stop_audit_sink
+from services.ad_gateway import close_ad_gateway
+from services.mail_service import close_mail_session, token_manager
+from services.bitwarden_vault_client import close_vault_client
+from services.password_hasher import close_password_hasher
+from services.health_prober import start_health_prober, stop_health_prober
 import collections
 if not hasattr(collections, 'MutableMapping'):
     import collections.abc
@@ -19,11 +24,7 @@ from api.bitwarden import router as bitwarden_router
 # from api.onboarding import router as onboarding_router
 from fastapi import APIRouter, Depends, HTTPException
 from api.auth import router as auth_router
-
-from services.bitwarden_vault_client import (
-    BitwardenVaultLocked,
-    BitwardenVaultError,
-)
+from api.metrics import router as metrics_router, MetricsMiddleware, instrument_router
 
 
 router = APIRouter(
@@ -52,11 +53,23 @@ async def lifespan(app: FastAPI):
     # Инициализация БД
     await init_db()
     logger.info("✅ Database initialized")
+    await start_audit_sink()
+
+    # Сессия Mail.ru открывается при первом вызове API
+    token_manager.start_background_refresh()
+    start_health_prober()
 
     yield
 
     # Очистка при завершении
     logger.info("🛑 Shutting down StaffFlow application...")
+    await stop_health_prober()
+    close_ad_gateway()
+    close_password_hasher()
+    await token_manager.stop_background_refresh()
+    await close_mail_session()
+    await close_vault_client()
+    await stop_audit_sink()
     await close_db()
 
 
@@ -76,6 +89,13 @@ app.include_router(api_router, prefix="/api")
 app.include_router(health_router)
 app.include_router(bitwarden_router)
 app.include_router(auth_router)
+app.include_router(metrics_router)
+
+# Метрики HTTP: маршруты API заводятся заранее, остальные — при первом запросе
+instrument_router(api_router, prefix="/api")
+instrument_router(auth_router)
+instrument_router(bitwarden_router)
+app.add_middleware(MetricsMiddleware)
 
 
 # Настройка статических файлов
@@ -110,6 +130,8 @@ async def health_check():
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host=config.server.host,
@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar, TYPE_CHECKING
+
+from config.config import ADConfig, load_config
+from core.exception import ADServiceError
+from core.metrics import AD_CALLS
+
+if TYPE_CHECKING:
+    from ldap3 import Connection
+    from services.ad_pool import LDAPConnectionPool
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ADGateway:
+    """
+    Асинхронный шлюз к Active Directory.
+
+    ldap3 работает синхронно, поэтому каждая операция выполняется в отдельном
+    пуле потоков размером с пул AD-соединений и не блокирует event loop.
+    Число операций в работе и в очереди ограничено max_pending: если шлюз
+    перегружен дольше queue_timeout, вызывающий получает ADServiceError.
+    """
+
+    def __init__(self, config: ADConfig, pool: Optional["LDAPConnectionPool"] = None):
+        # ldap3 загружается вместе с пулом при первой операции с AD
+        from services.ad_pool import get_ad_pool
+
+        self.config = config
+        self.pool = pool or get_ad_pool()
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.pool_size,
+            thread_name_prefix="ad-gateway",
+        )
+        self._slots = asyncio.Semaphore(config.max_pending)
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Операции в работе и в очереди"""
+        return self._pending
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Выполнить fn(conn, *args) с соединением из пула в потоке шлюза.
+
+        fn выполняется в копии контекста вызывающего (contextvars),
+        как в asyncio.to_thread — так в потоке видна текущая трасса.
+        """
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.config.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ADServiceError("AD-шлюз перегружен, повторите позже")
+
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            result = await loop.run_in_executor(self._executor, context.run, self._call, fn, args)
+        except Exception:
+            AD_CALLS.observe(started, failed=True)
+            raise
+        else:
+            AD_CALLS.observe(started)
+            return result
+        finally:
+            self._pending -= 1
+            self._slots.release()
+
+    def _call(self, fn: Callable[..., T], args: tuple) -> T:
+        with self.pool.connection() as conn:
+            return fn(conn, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _who_am_i(conn: "Connection") -> str:
+    result = conn.extend.standard.who_am_i()
+    if not result:
+        raise ADServiceError(str(conn.result))
+    return result
+
+
+_gateway: Optional[ADGateway] = None
+
+
+def get_ad_gateway() -> ADGateway:
+    """AD-шлюз процесса (создаётся при первом обращении)"""
+    global _gateway
+    if _gateway is None:
+        _gateway = ADGateway(load_config().ad)
+    return _gateway
+
+
+def get_ad_gateway_pending() -> int:
+    """Операции AD в работе и в очереди (0, если шлюз ещё не создан)"""
+    return _gateway.pending if _gateway is not None else 0
+
+
+async def check_ad_connection() -> str:
+    """Проверить доступность AD (bind + WhoAmI) без блокировки event loop"""
+    return await get_ad_gateway().run(_who_am_i)
+
+
+def close_ad_gateway():
+    """Остановить AD-шлюз и закрыть пул соединений"""
+    global _gateway
+    if _gateway is not None:
+        from services.ad_pool import close_ad_pool
+
+        _gateway.close()
+        _gateway = None
+        close_ad_pool()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from ldap3 import Connection, MODIFY_ADD
+
+from config.config import ADConfig, load_config
+from services.ad_gateway import get_ad_gateway
+
+logger = logging.getLogger(__name__)
+
+# Пользователь уже состоит в группе — не ошибка
+_ALREADY_MEMBER = {"attributeOrValueExists", "entryAlreadyExists"}
+
+
+def _add_members(conn: Connection, group_dn: str, members: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Добавить участников в группу одним MODIFY_ADD.
+
+    Если групповая операция отклонена, участники добавляются по одному,
+    чтобы вернуть ошибку конкретному пользователю.
+    """
+    conn.modify(group_dn, {"member": [(MODIFY_ADD, members)]})
+    if conn.result["description"] == "success":
+        return {member: None for member in members}
+
+    if len(members) == 1 and conn.result["description"] in _ALREADY_MEMBER:
+        return {members[0]: None}
+
+    errors: Dict[str, Optional[str]] = {}
+    for member in members:
+        conn.modify(group_dn, {"member": [(MODIFY_ADD, [member])]})
+        description = conn.result["description"]
+        if description == "success" or description in _ALREADY_MEMBER:
+            errors[member] = None
+        else:
+            errors[member] = f"{description}: {conn.result.get('message', '')}".strip(": ")
+    return errors
+
+
+class GroupMembershipBatcher:
+    """
+    Агрегатор добавлений в AD-группы.
+
+    Добавления копятся по DN группы в течение group_flush_window секунд
+    (или до group_batch_size участников) и отправляются одним
+    многозначным MODIFY_ADD на группу. Каждый вызывающий получает
+    результат по своему пользователю.
+    """
+
+    def __init__(self, config: ADConfig):
+        self.config = config
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+
+    async def add_member(self, group_dn: str, user_dn: str) -> Optional[str]:
+        """Добавить пользователя в группу. Возвращает текст ошибки или None"""
+        future = asyncio.get_running_loop().create_future()
+        members = self._pending.setdefault(group_dn, [])
+        members.append((user_dn, future))
+
+        if len(members) >= self.config.group_batch_size:
+            task = asyncio.create_task(self._flush_group(group_dn))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+        return await future
+
+    async def add_to_groups(self, user_dn: str, groups: List[str]) -> Dict[str, str]:
+        """Добавить пользователя во все группы. Возвращает {group_dn: ошибка} для неудачных"""
+        results = await asyncio.gather(*(self.add_member(group_dn, user_dn) for group_dn in groups))
+        return {group_dn: error for group_dn, error in zip(groups, results) if error}
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.config.group_flush_window)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Отправить все накопленные добавления"""
+        await asyncio.gather(*(self._flush_group(group_dn) for group_dn in list(self._pending)))
+
+    async def _flush_group(self, group_dn: str):
+        batch = self._pending.pop(group_dn, None)
+        if not batch:
+            return
+
+        members = list(dict.fromkeys(user_dn for user_dn, _ in batch))
+        try:
+            errors = await get_ad_gateway().run(_add_members, group_dn, members)
+        except Exception as e:
+            logger.error(f"❌ Ошибка добавления {len(members)} участников в {group_dn}: {e}")
+            errors = {member: str(e) for member in members}
+        else:
+            logger.info(f"✅ {len(members)} участников добавлено в {group_dn} одним запросом")
+
+        for user_dn, future in batch:
+            if not future.done():
+                future.set_result(errors.get(user_dn))
+
+
+_batcher: Optional[GroupMembershipBatcher] = None
+
+
+def get_group_batcher() -> GroupMembershipBatcher:
+    """Агрегатор добавлений в группы процесса"""
+    global _batcher
+    if _batcher is None:
+        _batcher = GroupMembershipBatcher(load_config().ad)
+    return _batcher
@@ -1,32 +1,185 @@
+import asyncio
 import logging
-from database.connection import get_db_connection
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from config.config import load_config
+from database.connection import db_connection
 
 logger = logging.getLogger(__name__)
+config = load_config()
 
+MATCH_EXACT = "exact"
+MATCH_PREFIX = "prefix"
+MATCH_REGEX = "regex"
+# Правило для всех должностей; position не используется
+MATCH_ANY = "any"
 
-async def resolve_groups(position: str) -> list[str]:
-    conn = None
-    try:
-        conn = await get_db_connection()
+# Предел кэша результатов по должностям
+RESOLVE_CACHE_SIZE = 4096
+
+# При равном приоритете более конкретное правило идёт первым
+_SPECIFICITY = {MATCH_EXACT: 0, MATCH_PREFIX: 1, MATCH_REGEX: 2, MATCH_ANY: 3}
+
+
+@dataclass(frozen=True)
+class GroupRule:
+    id: int
+    position: Optional[str]
+    match_type: str
+    ad_groups: Tuple[str, ...]
+    priority: int
+    merge: bool
+
+    def sort_key(self) -> tuple:
+        # Среди префиксов длинный конкретнее короткого
+        length = -len(self.position) if self.match_type == MATCH_PREFIX else 0
+        return self.priority, _SPECIFICITY[self.match_type], length, self.id
+
+
+def normalize_position(position: Optional[str]) -> str:
+    return " ".join((position or "").split()).casefold()
+
+
+def compile_pattern(pattern: str) -> Pattern:
+    """Скомпилировать regex-шаблон должности; re.error, если шаблон некорректен"""
+    return re.compile(pattern, re.IGNORECASE)
+
+
+@dataclass
+class GroupRuleMatcher:
+    """
+    Скомпилированные правила ad_group_rules.
+
+    exact — словарь по нормализованной должности, prefix — словарь
+    по префиксу (проверяются все префиксы должности), regex — список
+    скомпилированных шаблонов, any — правила для всех должностей.
+    Правила exact/prefix/regex без position не подходят никому.
+
+    Подходящие правила упорядочиваются по priority (меньше — важнее).
+    Группы берутся из первого правила без merge и из всех правил с merge.
+    """
+    exact: Dict[str, List[GroupRule]] = field(default_factory=dict)
+    prefix: Dict[str, List[GroupRule]] = field(default_factory=dict)
+    regex: List[Tuple[Pattern, GroupRule]] = field(default_factory=list)
+    default: List[GroupRule] = field(default_factory=list)
+    _cache: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def compile(cls, rules: List[GroupRule]) -> "GroupRuleMatcher":
+        matcher = cls()
+        for rule in rules:
+            if rule.match_type == MATCH_ANY:
+                matcher.default.append(rule)
+            elif rule.position is None:
+                continue
+            elif rule.match_type == MATCH_PREFIX:
+                matcher.prefix.setdefault(normalize_position(rule.position), []).append(rule)
+            elif rule.match_type == MATCH_REGEX:
+                try:
+                    matcher.regex.append((compile_pattern(rule.position), rule))
+                except re.error as e:
+                    logger.warning(f"⚠️ Правило AD-групп {rule.id} пропущено, некорректный шаблон: {e}")
+            else:
+                matcher.exact.setdefault(normalize_position(rule.position), []).append(rule)
+        return matcher
+
+    def match(self, position: str) -> List[GroupRule]:
+        key = normalize_position(position)
+        rules = list(self.exact.get(key, ()))
+        for i in range(len(key) + 1):
+            rules.extend(self.prefix.get(key[:i], ()))
+        rules.extend(rule for pattern, rule in self.regex if pattern.fullmatch(position or ""))
+        rules.extend(self.default)
+        return sorted(rules, key=GroupRule.sort_key)
+
+    def resolve(self, position: str) -> Tuple[str, ...]:
+        key = normalize_position(position)
+        groups = self._cache.get(key)
+        if groups is not None:
+            return groups
+
+        merged: Dict[str, None] = {}
+        base_taken = False
+        for rule in self.match(position):
+            if rule.merge:
+                merged.update(dict.fromkeys(rule.ad_groups))
+            elif not base_taken:
+                merged.update(dict.fromkeys(rule.ad_groups))
+                base_taken = True
+
+        groups = tuple(merged)
+        if len(self._cache) >= RESOLVE_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = groups
+        return groups
+
+
+_matcher: Optional[GroupRuleMatcher] = None
+_loaded_at = 0.0
+_reload_lock = asyncio.Lock()
+
+
+async def _load_matcher() -> GroupRuleMatcher:
+    async with db_connection() as conn:
         rows = await conn.fetch("""
-            SELECT ad_groups
+            SELECT id, position, match_type, ad_groups, priority, merge
             FROM ad_group_rules
             WHERE is_active = TRUE
-              AND position = $1
-            ORDER BY priority
-            LIMIT 1
-        """, position)
+        """)
+
+    rules = [
+        GroupRule(
+            id=row["id"],
+            position=row["position"],
+            match_type=row["match_type"],
+            ad_groups=tuple(row["ad_groups"]),
+            priority=row["priority"] if row["priority"] is not None else 100,
+            merge=row["merge"],
+        )
+        for row in rows
+    ]
+    logger.info(f"Загружено правил AD-групп: {len(rules)}")
+    return GroupRuleMatcher.compile(rules)
+
+
+async def get_group_matcher() -> GroupRuleMatcher:
+    """
+    Скомпилированные правила процесса.
 
-        if not rows:
+    Перечитываются после invalidate_group_rules() или по истечении
+    ad_group_rules_ttl секунд (так изменения доходят до воркеров).
+    """
+    global _matcher, _loaded_at
+    ttl = config.ad.group_rules_ttl
+    if _matcher is not None and time.monotonic() - _loaded_at < ttl:
+        return _matcher
+
+    async with _reload_lock:
+        if _matcher is None or time.monotonic() - _loaded_at >= ttl:
+            _matcher = await _load_matcher()
+            _loaded_at = time.monotonic()
+    return _matcher
+
+
+def invalidate_group_rules():
+    """Сбросить скомпилированные правила (после изменения ad_group_rules)"""
+    global _matcher
+    _matcher = None
+
+
+async def resolve_groups(position: str) -> list[str]:
+    try:
+        groups = (await get_group_matcher()).resolve(position)
+
+        if not groups:
             logger.warning(f"⚠️ Нет AD-групп для должности: {position}")
             return []
 
-        return rows[0]["ad_groups"]
+        return list(groups)
 
     except Exception as e:
         logger.error(f"❌ Ошибка resolve_groups: {e}")
         return []
-
-    finally:
-        if conn:
-            await conn.close()
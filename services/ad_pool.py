@@ -0,0 +1,241 @@
+import logging
+import ssl
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, Optional
+
+from ldap3 import Server, Connection, Tls, BASE
+from ldap3.core.exceptions import LDAPException
+
+from config.config import ADConfig, load_config
+from core.exception import ADServiceError
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used", "last_checked")
+
+    def __init__(self, conn: Connection):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+
+
+class LDAPConnectionPool:
+    """
+    Пул привязанных (bind) LDAPS-соединений с контроллером домена.
+
+    Соединения создаются по требованию до pool_size, простаивающие дольше
+    pool_idle_timeout закрываются, старше pool_max_lifetime — перепривязываются.
+    Перед выдачей долго не использовавшегося соединения выполняется проверка
+    (чтение RootDSE). Потокобезопасен: ldap3 работает синхронно.
+    """
+
+    def __init__(
+        self,
+        config: ADConfig,
+        factory: Optional[Callable[[], Connection]] = None,
+    ):
+        self.config = config
+        self._factory = factory or self._create_connection
+        self._server: Optional[Server] = None
+        self._idle: Deque[_PooledConnection] = deque()
+        self._cond = threading.Condition()
+        self._size = 0
+        self._closed = False
+
+    @property
+    def admin_dn(self) -> str:
+        return f"{self.config.admin_user}@{self.config.domain}"
+
+    def _create_connection(self) -> Connection:
+        if self._server is None:
+            self._server = Server(
+                self.config.server,   # ТОЛЬКО FQDN
+                port=self.config.port,
+                use_ssl=self.config.use_ssl,
+                connect_timeout=self.config.connect_timeout,
+                tls=Tls(
+                    validate=ssl.CERT_NONE,
+                    version=ssl.PROTOCOL_TLSv1_2
+                )
+            )
+
+        return Connection(
+            self._server,
+            user=self.admin_dn,
+            password=self.config.admin_password,
+            auto_bind=True,
+            receive_timeout=self.config.receive_timeout,
+        )
+
+    # -------------------------
+    # Borrow / return
+    # -------------------------
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Взять соединение из пула на время блока with"""
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield pooled.conn
+        except LDAPException:
+            # Ошибка транспорта/протокола — соединение в пул не возвращаем
+            broken = True
+            raise
+        finally:
+            self._release(pooled, broken)
+
+    def _acquire(self) -> _PooledConnection:
+        deadline = time.monotonic() + self.config.pool_acquire_timeout
+
+        while True:
+            pooled = None
+            create = False
+            expired = []
+
+            with self._cond:
+                if self._closed:
+                    raise ADServiceError("Пул AD-соединений закрыт")
+
+                expired = self._evict_idle()
+                if self._idle:
+                    pooled = self._idle.pop()
+                elif self._size < self.config.pool_size:
+                    self._size += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ADServiceError("Нет свободных AD-соединений в пуле")
+                    self._cond.wait(remaining)
+
+            for item in expired:
+                self._unbind(item)
+
+            if create:
+                try:
+                    return _PooledConnection(self._factory())
+                except Exception:
+                    self._discard()
+                    raise
+
+            if pooled is not None:
+                checked = self._prepare(pooled)
+                if checked is not None:
+                    return checked
+
+    def _release(self, pooled: _PooledConnection, broken: bool = False):
+        if broken or pooled.conn.closed or not pooled.conn.bound:
+            self._unbind(pooled)
+            self._discard()
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.append(pooled)
+                self._cond.notify()
+
+        if closed:
+            self._unbind(pooled)
+            self._discard()
+
+    def _discard(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _evict_idle(self) -> list:
+        """Убрать простаивающие соединения (вызывается под блокировкой)"""
+        now = time.monotonic()
+        expired = []
+        while self._idle and now - self._idle[0].last_used > self.config.pool_idle_timeout:
+            expired.append(self._idle.popleft())
+            self._size -= 1
+        return expired
+
+    def _prepare(self, pooled: _PooledConnection) -> Optional[_PooledConnection]:
+        """Проверить соединение перед выдачей; None — соединение выброшено"""
+        now = time.monotonic()
+        try:
+            if pooled.conn.closed or not pooled.conn.bound:
+                raise LDAPException("connection is not bound")
+
+            if now - pooled.created_at > self.config.pool_max_lifetime:
+                if not pooled.conn.rebind(user=self.admin_dn, password=self.config.admin_password):
+                    raise LDAPException(f"rebind failed: {pooled.conn.result}")
+                pooled.created_at = now
+                pooled.last_checked = now
+
+            elif now - pooled.last_checked > self.config.pool_health_check_interval:
+                if not pooled.conn.search("", "(objectClass=*)", search_scope=BASE, attributes=["1.1"]):
+                    raise LDAPException(f"health check failed: {pooled.conn.result}")
+                pooled.last_checked = now
+
+            return pooled
+        except Exception as e:
+            logger.warning(f"⚠️ AD-соединение из пула неработоспособно, пересоздаём: {e}")
+            self._unbind(pooled)
+            self._discard()
+            return None
+
+    @staticmethod
+    def _unbind(pooled: _PooledConnection):
+        try:
+            pooled.conn.unbind()
+        except Exception:
+            pass
+
+    def close(self):
+        """Закрыть все простаивающие соединения и запретить выдачу новых"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for pooled in idle:
+            self._unbind(pooled)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.config.pool_size,
+            }
+
+
+_pool: Optional[LDAPConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_ad_pool() -> LDAPConnectionPool:
+    """Пул AD-соединений процесса (создаётся при первом обращении)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LDAPConnectionPool(load_config().ad)
+    return _pool
+
+
+def close_ad_pool():
+    """Закрыть пул AD-соединений"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+            logger.info("Пул AD-соединений закрыт")
@@ -1,17 +1,80 @@
 import logging
-import ssl
-from ldap3 import Server, Connection, MODIFY_REPLACE, MODIFY_ADD, Tls
+from ldap3 import BASE, Connection, MODIFY_REPLACE
 
 from config.config import load_config
 from core.ad_utils import build_dc
-from database.connection import get_db_connection
+from database.connection import db_connection
 from database.db import add_ad_account_to_employee, update_ad_account_status
 from services.ad_group_resolver import resolve_groups
+from services.ad_gateway import get_ad_gateway
+from services.ad_group_batcher import get_group_batcher
+from services.provisioning_trace import span
 
 logger = logging.getLogger(__name__)
 config = load_config()
 
 
+def _is_same_account(ad_conn: Connection, user_dn: str, login: str) -> bool:
+    """Существующая запись user_dn принадлежит этому сотруднику (тот же sAMAccountName)"""
+    ad_conn.search(user_dn, "(objectClass=user)", search_scope=BASE, attributes=["sAMAccountName"])
+    if ad_conn.result["description"] != "success" or not ad_conn.entries:
+        return False
+    return str(ad_conn.entries[0]["sAMAccountName"].value).lower() == login.lower()
+
+
+def _provision_user(
+    ad_conn: Connection,
+    user_dn: str,
+    attributes: dict,
+    password: str
+):
+    """Синхронная часть: создание, пароль и активация (поток AD-шлюза)"""
+    user_dn_created = False
+    try:
+        # 1️⃣ Создаём пользователя (disabled)
+        with span("ad.add"):
+            ad_conn.add(user_dn, attributes=attributes)
+
+            if ad_conn.result["description"] == "entryAlreadyExists":
+                # Повтор задачи после сбоя на следующих шагах: учётная запись
+                # уже наша, если совпадает sAMAccountName — продолжаем с неё
+                if not _is_same_account(ad_conn, user_dn, attributes["sAMAccountName"]):
+                    raise Exception(f"В AD уже есть другая учётная запись {user_dn}")
+                logger.info(f"ℹ️ Учётная запись {user_dn} уже создана, продолжаем")
+            elif ad_conn.result["description"] != "success":
+                raise Exception(ad_conn.result)
+            else:
+                user_dn_created = True
+
+        # 2️⃣ Пароль (LDAPS)
+        with span("ad.set_password"):
+            ad_conn.extend.microsoft.modify_password(user_dn, password)
+
+            if ad_conn.result["description"] != "success":
+                raise Exception(ad_conn.result)
+
+        # 3️⃣ Активируем
+        with span("ad.enable"):
+            ad_conn.modify(
+                user_dn,
+                {
+                    "userAccountControl": [(MODIFY_REPLACE, [512])],
+                    "pwdLastSet": [(MODIFY_REPLACE, [0])]
+                }
+            )
+
+            if ad_conn.result["description"] != "success":
+                raise Exception(ad_conn.result)
+
+    except Exception:
+        if user_dn_created:
+            try:
+                ad_conn.delete(user_dn)
+            except Exception:
+                pass
+        raise
+
+
 async def create_ad_account(
     last_name: str,
     first_name: str,
@@ -20,37 +83,19 @@ async def create_ad_account(
     employee_id: int,
     password: str
 ):
-    ad_conn = None
-    db_conn = None
     user_dn = None
 
     try:
-        admin_dn = f"{config.ad.admin_user}@{config.ad.domain}"
         dc = build_dc(config.ad.domain)
-
-        server = Server(
-            config.ad.server,   # ТОЛЬКО FQDN
-            port=636,
-            use_ssl=True,
-            tls=Tls(
-                validate=ssl.CERT_NONE,
-                version=ssl.PROTOCOL_TLSv1_2
-            )
-        )
-
-        ad_conn = Connection(
-            server,
-            user=admin_dn,
-            password=config.ad.admin_password,
-            auto_bind=True
-        )
-
         user_dn = f"CN={last_name} {first_name},OU=Employees,{dc}"
 
-        # 1️⃣ Создаём пользователя (disabled)
-        ad_conn.add(
+        with span("ad.resolve_groups"):
+            groups = await resolve_groups(position)
+
+        await get_ad_gateway().run(
+            _provision_user,
             user_dn,
-            attributes={
+            {
                 "objectClass": ["top", "person", "organizationalPerson", "user"],
                 "cn": f"{last_name} {first_name}",
                 "sn": last_name,
@@ -60,67 +105,36 @@ async def create_ad_account(
                 "userPrincipalName": f"{login}@{config.ad.domain}",
                 "title": position,
                 "userAccountControl": 514,
-            }
-        )
-
-        if ad_conn.result["description"] != "success":
-            raise Exception(ad_conn.result)
-
-        logger.warning(f"AD PASSWORD (DEBUG ONLY): {password}")
-        # 2️⃣ Пароль (LDAPS)
-        ad_conn.extend.microsoft.modify_password(user_dn, password)
-
-        if ad_conn.result["description"] != "success":
-            raise Exception(ad_conn.result)
-
-        # 3️⃣ Активируем
-        ad_conn.modify(
-            user_dn,
-            {
-                "userAccountControl": [(MODIFY_REPLACE, [512])],
-                "pwdLastSet": [(MODIFY_REPLACE, [0])]
-            }
+            },
+            password,
         )
 
-        if ad_conn.result["description"] != "success":
-            raise Exception(ad_conn.result)
-
-        # 4️⃣ Группы
-        groups = await resolve_groups(position)
-        for group_dn in groups:
-            ad_conn.modify(group_dn, {
-                "member": [(MODIFY_ADD, [user_dn])]
-            })
+        # 4️⃣ Группы (добавления агрегируются по группам между пользователями)
+        with span("ad.groups") as groups_span:
+            failed_groups = await get_group_batcher().add_to_groups(user_dn, groups)
+            if failed_groups:
+                groups_span.fail(f"Не добавлен в группы: {len(failed_groups)} из {len(groups)}")
+        for group_dn, error in failed_groups.items():
+            logger.warning(f"⚠️ {login} не добавлен в группу {group_dn}: {error}")
 
         # 5️⃣ DB
-        db_conn = await get_db_connection()
-        await add_ad_account_to_employee(
-            db_conn,
-            employee_id,
-            login,
-            user_dn,
-            "created"
-        )
+        with span("ad.save"):
+            async with db_connection() as db_conn:
+                await add_ad_account_to_employee(
+                    db_conn,
+                    employee_id,
+                    login,
+                    user_dn,
+                    "created"
+                )
 
         logger.info(f"✅ AD пользователь создан и активирован: {user_dn}")
 
     except Exception as e:
         logger.error(f"❌ AD error: {e}")
 
-        if ad_conn and user_dn:
-            try:
-                ad_conn.delete(user_dn)
-            except Exception:
-                pass
-
         if employee_id:
-            db_conn = await get_db_connection()
-            await update_ad_account_status(db_conn, employee_id, "error")
+            async with db_connection() as db_conn:
+                await update_ad_account_status(db_conn, employee_id, "error")
 
         raise
-
-    finally:
-        if db_conn:
-            await db_conn.close()
-        if ad_conn:
-            ad_conn.unbind()
@@ -1,25 +1,36 @@
-import bcrypt
 import asyncpg
 
+from services.password_hasher import get_password_hasher
+from services.session_service import invalidate_user
+
 
 class AuthService:
     def __init__(self, conn: asyncpg.Connection):
         self.conn = conn
+        self.hasher = get_password_hasher()
 
-    def hash_password(self, password: str) -> str:
-        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    async def hash_password(self, password: str) -> str:
+        return await self.hasher.hash(password)
 
-    def verify_password(self, password: str, hash_: str) -> bool:
-        return bcrypt.checkpw(password.encode(), hash_.encode())
+    async def verify_password(self, password: str, hash_: str) -> bool:
+        return await self.hasher.verify(password, hash_)
 
     async def create_user(self, username: str, password: str):
-        pwd_hash = self.hash_password(password)
+        pwd_hash = await self.hash_password(password)
         await self.conn.execute(
             "INSERT INTO users (username, password_hash) VALUES ($1, $2)",
             username,
             pwd_hash
         )
 
+    async def deactivate_user(self, user_id: int):
+        await self.conn.execute(
+            "UPDATE users SET is_active=false WHERE id=$1",
+            user_id
+        )
+        # Открытые сессии перестают проходить проверку сразу, а не по истечении TTL кэша
+        invalidate_user(user_id)
+
     async def authenticate(self, username: str, password: str):
         row = await self.conn.fetchrow(
             "SELECT * FROM users WHERE username=$1 AND is_active=true",
@@ -28,7 +39,15 @@ class AuthService:
         if not row:
             return None
 
-        if not self.verify_password(password, row["password_hash"]):
+        if not await self.verify_password(password, row["password_hash"]):
             return None
 
+        # Стоимость bcrypt изменилась — перехэшируем, пока пароль известен
+        if self.hasher.needs_rehash(row["password_hash"]):
+            await self.conn.execute(
+                "UPDATE users SET password_hash=$2 WHERE id=$1",
+                row["id"],
+                await self.hash_password(password)
+            )
+
         return dict(row)
@@ -1,16 +1,33 @@
+import asyncio
 import logging
-import secrets
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from config.config import load_config
+from database.connection import db_connection
+from database.db import get_bitwarden_batch_items, save_bitwarden_batch_item
+from services.bitwarden_vault_client import BitwardenVaultClient, get_vault_client
+from services.provisioning_trace import span
 
 logger = logging.getLogger(__name__)
 
+# Статусы элементов массового создания
+ITEM_CREATED = "created"
+ITEM_EXISTING = "existing"
+ITEM_FAILED = "failed"
+
+
+class BatchInProgressError(Exception):
+    """Пакет с этим ключом идемпотентности ещё выполняется"""
+    pass
 
-def create_bitwarden_password(login: str, password: str, position: str):
+
+async def create_bitwarden_password(login: str, password: str, position: str) -> Dict[str, Any]:
     """
     Создать запись с паролем в BitWarden
 
     Args:
         login: Логин пользователя
+        password: Пароль пользователя
         position: Должность
 
     Returns:
@@ -19,19 +36,19 @@ def create_bitwarden_password(login: str, password: str, position: str):
     try:
         logger.info(f"Создание пароля BitWarden для {login}")
 
-        # Генерация пароля
-
-        # Здесь должна быть интеграция с BitWarden API
-
-        # Демо-реализация
-        import time
-        time.sleep(0.5)
+        with span("bitwarden.create_login"):
+            item = await get_vault_client().create_login(
+                name=login,
+                username=login,
+                password=password,
+                notes=position,
+            )
 
         logger.info(f"✅ Пароль BitWarden для {login} создан")
         return {
             "success": True,
             "login": login,
-            "password": password,
+            "item_id": item["id"],
             "folder": position,
             "message": "BitWarden password created"
         }
@@ -41,4 +58,92 @@ def create_bitwarden_password(login: str, password: str, position: str):
         return {
             "success": False,
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+async def create_bitwarden_logins(
+        client: BitwardenVaultClient,
+        items: List[Dict[str, Any]],
+        idempotency_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Создать пачку записей Bitwarden, не более btw_bulk_concurrency одновременно.
+
+    Если передан idempotency_key, созданные записи запоминаются в
+    bitwarden_batch_items: при повторе пакета с тем же ключом они
+    возвращаются со статусом existing, а повторяются только неудачные.
+    Повтор, пришедший до завершения первого пакета, получает
+    BatchInProgressError, а не ждёт его.
+    """
+    if not idempotency_key:
+        return await _create_logins(client, items, None, {})
+
+    # Пакет с одним ключом выполняется только один раз одновременно во всех
+    # процессах и репликах: advisory-блокировка держится на соединении до
+    # конца пакета, повтор не ждёт её и не занимает второе соединение
+    async with db_connection() as lock_conn:
+        locked = await lock_conn.fetchval(
+            "SELECT pg_try_advisory_lock(hashtext('bitwarden_batch:' || $1))", idempotency_key
+        )
+        if not locked:
+            raise BatchInProgressError("Пакет с этим Idempotency-Key ещё выполняется, повторите позже")
+        try:
+            done = await get_bitwarden_batch_items(lock_conn, idempotency_key)
+            return await _create_logins(client, items, idempotency_key, done)
+        finally:
+            await lock_conn.execute("SELECT pg_advisory_unlock(hashtext('bitwarden_batch:' || $1))", idempotency_key)
+
+
+async def _create_logins(
+        client: BitwardenVaultClient,
+        items: List[Dict[str, Any]],
+        idempotency_key: Optional[str],
+        done: Dict[int, Dict[str, Any]]
+) -> Dict[str, Any]:
+    slots = asyncio.Semaphore(load_config().btw.bulk_concurrency)
+
+    async def create_one(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        result = {"index": index, "name": item["name"]}
+
+        previous = done.get(index)
+        if previous is not None:
+            if (previous["name"], previous["username"]) != (item["name"], item["username"]):
+                return {**result, "status": ITEM_FAILED,
+                        "error": "Ключ идемпотентности уже использован для другой записи"}
+            return {**result, "status": ITEM_EXISTING, "id": previous["bitwarden_item_id"]}
+
+        try:
+            async with slots:
+                created = await client.create_login(
+                    name=item["name"],
+                    username=item["username"],
+                    password=item["password"],
+                    notes=item.get("notes"),
+                )
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания записи BitWarden {item['name']}: {str(e)}")
+            return {**result, "status": ITEM_FAILED, "error": str(e)}
+
+        result = {**result, "status": ITEM_CREATED, "id": created["id"]}
+        if idempotency_key:
+            try:
+                async with db_connection() as conn:
+                    await save_bitwarden_batch_item(
+                        conn, idempotency_key, index, item["name"], item["username"], created["id"]
+                    )
+            except Exception as e:
+                # Запись в Bitwarden уже есть — сообщаем об этом, а не о неудаче,
+                # иначе повтор пакета создаст дубликат
+                logger.error(f"❌ Запись BitWarden {item['name']} создана, но не сохранена: {str(e)}")
+                result["error"] = f"Запись создана, но не сохранена для повтора пакета: {e}"
+        return result
+
+    results = await asyncio.gather(*(create_one(i, item) for i, item in enumerate(items)))
+
+    return {
+        "total": len(results),
+        "created": sum(r["status"] == ITEM_CREATED for r in results),
+        "existing": sum(r["status"] == ITEM_EXISTING for r in results),
+        "failed": sum(r["status"] == ITEM_FAILED for r in results),
+        "items": results,
+    }
@@ -1,5 +1,19 @@
-import requests
-from typing import Optional
+import asyncio
+import logging
+import time
+from typing import Optional, TYPE_CHECKING
+
+from config.config import Bitwarden, load_config
+from core.cache import TTLCache
+from core.metrics import BITWARDEN_CALLS
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+VAULT_UNLOCKED = "unlocked"
+VAULT_LOCKED = "locked"
 
 
 class BitwardenVaultError(Exception):
@@ -13,58 +27,97 @@ class BitwardenVaultLocked(BitwardenVaultError):
 
 
 class BitwardenVaultClient:
-    def __init__(
-        self,
-        base_url: str = "http://localhost:8087",
-        timeout: int = 100,
-        organization_id: str = "d7821ae8-b00b-4f7a-a8bf-b3d600f618c3",
-        collection_id: str = "ee1b460f-ff68-467d-a361-b3d600f618cc"
-    ):
-        self.base_url = base_url.rstrip("/")
-        self.timeout = timeout
-        self.organization_id = organization_id
-        self.collection_id = collection_id
+    """
+    Асинхронный клиент `bw serve`.
+
+    Все запросы идут через одну keep-alive сессию aiohttp. Состояние
+    блокировки vault кэшируется на status_cache_ttl секунд и обновляется
+    по ответам create_login, поэтому создание записи — один HTTP-запрос.
+    """
+
+    def __init__(self, config: Optional[Bitwarden] = None):
+        self.config = config or load_config().btw
+        self.base_url = self.config.base_url.rstrip("/")
+        self.organization_id = self.config.organization_id
+        self.collection_id = self.config.collection_id
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._state = TTLCache(ttl=self.config.status_cache_ttl, maxsize=1)
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            # aiohttp импортируется при первом запросе, а не при старте
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.config.max_connections,
+                    keepalive_timeout=self.config.keepalive_timeout,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=self.config.timeout,
+                    connect=self.config.connect_timeout,
+                ),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        import aiohttp
+
+        started = time.perf_counter()
+        try:
+            async with self._get_session().request(method, f"{self.base_url}{path}", **kwargs) as r:
+                r.raise_for_status()
+                data = await r.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            BITWARDEN_CALLS.observe(started, failed=True)
+            raise BitwardenVaultError(f"Bitwarden недоступен: {e!r}")
+
+        BITWARDEN_CALLS.observe(started, failed=not data.get("success"))
+        return data
 
     # -------------------------
     # Health / status
     # -------------------------
-    def status(self) -> dict:
-        r = requests.get(
-            f"{self.base_url}/status",
-            timeout=self.timeout,
-        )
-
-        r.raise_for_status()
-        data = r.json()
+    async def status(self) -> dict:
+        data = await self._request("GET", "/status")
 
         if not data.get("success"):
             raise BitwardenVaultError(data.get("message"))
 
-        return data["data"]
+        status = data["data"]
+        self._state.set("vault", (status.get("template") or {}).get("status"))
+        return status
 
-    def assert_unlocked(self) -> None:
-        status = self.status()
+    async def assert_unlocked(self) -> None:
+        state = self._state.get("vault")
+        if state is None:
+            await self.status()
+            state = self._state.get("vault")
 
-        if status.get("template").get('status') != "unlocked":
+        if state != VAULT_UNLOCKED:
             raise BitwardenVaultLocked("Bitwarden vault is locked")
 
     # -------------------------
     # Create login (cipher)
     # -------------------------
-    def create_login(
+    async def create_login(
         self,
-        organization_id: str,
-        collection_id: str,
         name: str,
         username: str,
         password: str,
         notes: Optional[str] = None,
+        organization_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
     ) -> dict:
-        self.assert_unlocked()
+        await self.assert_unlocked()
 
         payload = {
-            "organizationId": organization_id,
-            "collectionIds": [collection_id],
+            "organizationId": organization_id or self.organization_id,
+            "collectionIds": [collection_id or self.collection_id],
             "folderId": None,
             "type": 1,  # Login
             "name": name,
@@ -79,21 +132,34 @@ class BitwardenVaultClient:
             "reprompt": 0,
         }
 
-        r = requests.post(
-            f"{self.base_url}/object/item",
-            json=payload,
-            timeout=self.timeout,
-        )
-
-        r.raise_for_status()
-        data = r.json()
+        data = await self._request("POST", "/object/item", json=payload)
 
         if not data.get("success"):
             message = data.get("message", "Unknown Bitwarden error")
 
             if "locked" in message.lower():
+                self._state.set("vault", VAULT_LOCKED)
                 raise BitwardenVaultLocked(message)
 
             raise BitwardenVaultError(message)
 
         return data["data"]
+
+
+_client: Optional[BitwardenVaultClient] = None
+
+
+def get_vault_client() -> BitwardenVaultClient:
+    """Клиент Bitwarden процесса (создаётся при первом обращении)"""
+    global _client
+    if _client is None:
+        _client = BitwardenVaultClient()
+    return _client
+
+
+async def close_vault_client():
+    """Закрыть сессию клиента Bitwarden (вызывается в lifespan)"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
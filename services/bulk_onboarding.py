@@ -0,0 +1,187 @@
+import codecs
+import csv
+import json
+import logging
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from api.models import UserCreateRequest
+from config.config import load_config
+from core.utils import generate_login
+from database.connection import db_connection
+from database.db import (
+    create_onboarding_batch,
+    finish_onboarding_batch,
+    find_taken_logins,
+    bulk_insert_employees,
+)
+from services.provisioning_worker import build_provisioning_jobs
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+
+
+class BulkUploadError(Exception):
+    """Некорректный файл массовой регистрации"""
+    pass
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Разбить поток байтов на строки (UTF-8, BOM допускается)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail.strip():
+        yield tail.rstrip("\r")
+
+
+async def _iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Dict[str, Any]]:
+    """Построчно разобрать CSV (с заголовком) или JSONL"""
+    header: Optional[List[str]] = None
+
+    async for line in _iter_lines(chunks):
+        if not line.strip():
+            continue
+
+        if fmt == FORMAT_JSONL:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = {"__error__": f"Некорректный JSON: {e}"}
+            if not isinstance(record, dict):
+                record = {"__error__": "Строка должна быть JSON-объектом"}
+            yield record
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        # Пустые ячейки не передаём в модель, чтобы сработали значения по умолчанию
+        yield {key: value for key, value in zip(header, values) if value != ""}
+
+
+def _allocate_login(base: str, taken: set) -> str:
+    """Подобрать свободный логин: base, base2, base3..."""
+    login = base
+    n = 1
+    while login in taken:
+        n += 1
+        login = f"{base}{n}"
+    taken.add(login)
+    return login
+
+
+async def _load_chunk(
+        batch_id: str,
+        chunk: List[Dict[str, Any]],
+        taken: set,
+        max_attempts: int
+) -> Dict[str, int]:
+    """Провалидировать пачку строк, выделить логины и загрузить её одной транзакцией"""
+    valid = []
+    rejected = []
+
+    for row_no, record in chunk:
+        if "__error__" in record:
+            rejected.append({"row_no": row_no, "error": record["__error__"]})
+            continue
+        try:
+            user = UserCreateRequest.model_validate(record)
+        except ValidationError as e:
+            rejected.append({"row_no": row_no, "error": "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            )})
+            continue
+        valid.append((row_no, user, generate_login(user.lastName, user.firstName, user.middleName)))
+
+    async with db_connection() as conn:
+        taken |= await find_taken_logins(conn, list({base for _, _, base in valid}))
+
+        rows = []
+        for row_no, user, base in valid:
+            login = _allocate_login(base, taken)
+            email = f"{login}@company.ru"
+            rows.append({
+                "row_no": row_no,
+                "last_name": user.lastName,
+                "first_name": user.firstName,
+                "middle_name": user.middleName,
+                "login": login,
+                "email": email if user.mailRequired else None,
+                "position": user.position,
+                "user": user,
+                "mail": email,
+            })
+
+        def job_builder(row, employee_id):
+            return build_provisioning_jobs(row["user"], row["login"], row["mail"], employee_id, max_attempts)
+
+        async with conn.transaction():
+            inserted = await bulk_insert_employees(conn, batch_id, rows, rejected, job_builder)
+
+    return {"accepted": len(inserted), "rejected": len(chunk) - len(inserted)}
+
+
+async def ingest_bulk_upload(chunks: AsyncIterator[bytes], fmt: str) -> Dict[str, Any]:
+    """
+    Потоково загрузить файл массовой регистрации.
+
+    Строки валидируются и загружаются пачками по bulk.chunk_size через COPY,
+    задачи провижининга ставятся в очередь и выполняются воркерами
+    с ограничением параллелизма по каждому бэкенду.
+    """
+    if fmt not in (FORMAT_CSV, FORMAT_JSONL):
+        raise BulkUploadError(f"Неподдерживаемый формат: {fmt}")
+
+    config = load_config()
+    batch_id = str(uuid.uuid4())
+
+    async with db_connection() as conn:
+        await create_onboarding_batch(conn, batch_id)
+
+    total = accepted = rejected = 0
+    taken: set = set()
+    chunk = []
+    try:
+        async for record in _iter_records(chunks, fmt):
+            total += 1
+            if total > config.bulk.max_rows:
+                raise BulkUploadError(f"Превышен лимит строк в файле: {config.bulk.max_rows}")
+            chunk.append((total, record))
+
+            if len(chunk) >= config.bulk.chunk_size:
+                result = await _load_chunk(batch_id, chunk, taken, config.queue.max_attempts)
+                accepted += result["accepted"]
+                rejected += result["rejected"]
+                chunk = []
+
+        if chunk:
+            result = await _load_chunk(batch_id, chunk, taken, config.queue.max_attempts)
+            accepted += result["accepted"]
+            rejected += result["rejected"]
+    except Exception:
+        async with db_connection() as conn:
+            await finish_onboarding_batch(conn, batch_id, total, accepted, rejected, "aborted")
+        raise
+
+    async with db_connection() as conn:
+        await finish_onboarding_batch(conn, batch_id, total, accepted, rejected)
+
+    logger.info(f"✅ Пакет {batch_id} загружен: {accepted} принято, {rejected} отклонено")
+    return {
+        "batch_id": batch_id,
+        "status": "loaded",
+        "total": total,
+        "accepted": accepted,
+        "rejected": rejected,
+    }
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from config.config import HealthConfig, load_config
+from database.connection import db_connection
+from services.ad_gateway import check_ad_connection
+from services.bitwarden_vault_client import get_vault_client
+
+logger = logging.getLogger(__name__)
+config = load_config()
+
+BACKEND_DATABASE = "database"
+BACKEND_AD = "ad"
+BACKEND_MAIL = "mail"
+BACKEND_BITWARDEN = "bitwarden"
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_UNKNOWN = "unknown"
+
+Probe = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+async def _probe_database() -> None:
+    async with db_connection() as conn:
+        await conn.execute("SELECT 1")
+
+
+async def _probe_ad() -> Dict[str, Any]:
+    return {"identity": await check_ad_connection()}
+
+
+async def _probe_mail() -> Dict[str, Any]:
+    mail = config.mail
+    url = urlparse(mail.api_url)
+    _, writer = await asyncio.open_connection(url.hostname, url.port or 443)
+    writer.close()
+    await writer.wait_closed()
+    return {"configured": bool(mail.api_key) and mail.api_key != "your_api_key"}
+
+
+async def _probe_bitwarden() -> Dict[str, Any]:
+    return {"vault": await get_vault_client().status()}
+
+
+class HealthProber:
+    """
+    Фоновая проверка бэкендов.
+
+    Раз в interval секунд все бэкенды проверяются параллельно, каждый
+    с дедлайном timeout. Эндпоинты здоровья читают последний снимок
+    (статус, задержка, ошибка) и сами к бэкендам не обращаются.
+    """
+
+    def __init__(self, config: HealthConfig, probes: Optional[Dict[str, Probe]] = None):
+        self.config = config
+        self.probes = probes or {
+            BACKEND_DATABASE: _probe_database,
+            BACKEND_AD: _probe_ad,
+            BACKEND_MAIL: _probe_mail,
+            BACKEND_BITWARDEN: _probe_bitwarden,
+        }
+        self._snapshot: Dict[str, Dict[str, Any]] = {
+            name: {"status": STATUS_UNKNOWN, "latency_ms": None, "error": None, "checked_at": None}
+            for name in self.probes
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="health-prober")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.config.interval)
+
+    async def probe_all(self):
+        await asyncio.gather(*(self._probe(name, probe) for name, probe in self.probes.items()))
+
+    async def _probe(self, name: str, probe: Probe):
+        started = time.monotonic()
+        result: Dict[str, Any] = {"status": STATUS_OK, "error": None}
+        try:
+            details = await asyncio.wait_for(probe(), timeout=self.config.timeout)
+            if details:
+                result.update(details)
+        except asyncio.TimeoutError:
+            result.update(status=STATUS_ERROR, error=f"Нет ответа за {self.config.timeout} с")
+        except Exception as e:
+            result.update(status=STATUS_ERROR, error=str(e) or e.__class__.__name__)
+
+        result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        result["checked_at"] = datetime.now().isoformat()
+        if result["status"] != self._snapshot[name]["status"]:
+            log = logger.info if result["status"] == STATUS_OK else logger.warning
+            log(f"Бэкенд {name}: {result['status']} {result['error'] or ''}".rstrip())
+        self._snapshot[name] = result
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Последние результаты проверок по каждому бэкенду"""
+        return dict(self._snapshot)
+
+    def backend(self, name: str) -> Dict[str, Any]:
+        return self._snapshot[name]
+
+
+_prober: Optional[HealthProber] = None
+
+
+def get_health_prober() -> HealthProber:
+    """Проверка бэкендов процесса (создаётся при первом обращении)"""
+    global _prober
+    if _prober is None:
+        _prober = HealthProber(config.health)
+    return _prober
+
+
+def start_health_prober():
+    """Запустить фоновую проверку бэкендов (вызывается в lifespan)"""
+    get_health_prober().start()
+
+
+async def stop_health_prober():
+    """Остановить фоновую проверку бэкендов"""
+    global _prober
+    if _prober is not None:
+        await _prober.stop()
+        _prober = None
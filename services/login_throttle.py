@@ -0,0 +1,61 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from config.config import AuthConfig, load_config
+
+
+class LoginThrottle:
+    """
+    Ограничение неудачных попыток входа в скользящем окне login_window.
+
+    Счётчики ведутся отдельно по имени пользователя и по IP: перебор
+    паролей к одной учётной записи и перебор учёток с одного адреса
+    блокируются до проверки bcrypt, не расходуя CPU на хэширование.
+    """
+
+    def __init__(self, config: AuthConfig, maxsize: int = 10000):
+        self.config = config
+        self.maxsize = maxsize
+        self._failures: Dict[str, Deque[float]] = {}
+
+    def _attempts(self, key: str, now: float) -> Deque[float]:
+        attempts = self._failures.get(key)
+        if attempts is None:
+            return deque()
+        while attempts and attempts[0] <= now - self.config.login_window:
+            attempts.popleft()
+        if not attempts:
+            self._failures.pop(key, None)
+        return attempts
+
+    def _retry_after(self, key: str, limit: int, now: float) -> Optional[int]:
+        attempts = self._attempts(key, now)
+        if len(attempts) < limit:
+            return None
+        return max(1, int(attempts[0] + self.config.login_window - now) + 1)
+
+    def check(self, username: str, ip: Optional[str]) -> Optional[int]:
+        """Через сколько секунд можно повторить вход, или None, если можно сейчас"""
+        now = time.monotonic()
+        delays = [self._retry_after(f"user:{username.lower()}", self.config.login_max_failures, now)]
+        if ip:
+            delays.append(self._retry_after(f"ip:{ip}", self.config.login_ip_max_failures, now))
+        delays = [d for d in delays if d is not None]
+        return max(delays) if delays else None
+
+    def record_failure(self, username: str, ip: Optional[str]):
+        now = time.monotonic()
+        keys = [f"user:{username.lower()}"] + ([f"ip:{ip}"] if ip else [])
+        for key in keys:
+            if key not in self._failures and len(self._failures) >= self.maxsize:
+                # Вытесняем самый старый ключ
+                self._failures.pop(next(iter(self._failures)))
+            self._failures.setdefault(key, deque()).append(now)
+
+    def reset(self, username: str):
+        """Сбросить счётчик пользователя после успешного входа"""
+        self._failures.pop(f"user:{username.lower()}", None)
+
+
+login_throttle = LoginThrottle(load_config().auth)
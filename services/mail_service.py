@@ -1,21 +1,34 @@
-import aiohttp
 import logging
+import random
 import secrets
 import string
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Optional, TYPE_CHECKING
 import asyncio
 from datetime import datetime
 
 from config.config import Config, load_config
 from database.db import add_mail_to_employee, update_employee_mail_status
-from database.connection import get_db_connection
+from database.connection import db_connection
 from services.token_manager import TokenManager
 from core.exception import MailServiceError
+from core.metrics import MAIL_CALLS
+from services.provisioning_trace import span
+
+if TYPE_CHECKING:
+    import aiohttp
 
 logger = logging.getLogger(__name__)
 config: Config = load_config()
 token_manager = TokenManager()
 
+# Общая сессия на всё время жизни приложения (см. main.lifespan)
+_session: Optional["aiohttp.ClientSession"] = None
+
+# Создание ящика неидемпотентно: повторяются только ответы, при которых
+# запрос заведомо не выполнен (ограничение частоты и недоступность)
+RETRY_STATUSES = {429, 503}
+
 
 async def create_mail_account_async(
         last_name: str,
@@ -59,28 +72,31 @@ async def create_mail_account_async(
         }
 
         # Получение токена доступа
-        access_token = token_manager.get_access_token()
+        with span("mail.token"):
+            access_token = await token_manager.get_access_token()
 
         # Вызов API Mail.ru (демо-версия)
-        mail_response = await call_mail_api(access_token, user_data)
+        with span("mail.create") as create_span:
+            mail_response = await call_mail_api(access_token, user_data)
+            if not mail_response.get("success"):
+                create_span.fail(mail_response.get("error", "Unknown error"))
         if mail_response.get("success"):
             # Сохранение информации в базу данных
             if employee_id:
-                conn = await get_db_connection()
                 try:
-                    await add_mail_to_employee(
-                        conn=conn,
-                        employee_id=employee_id,
-                        email=email,
-                        mail_password=password,
-                        mail_user_id=mail_response.get('response_json').get('id'),
-                        status="created"
-                    )
+                    with span("mail.save"):
+                        async with db_connection() as conn:
+                            await add_mail_to_employee(
+                                conn=conn,
+                                employee_id=employee_id,
+                                email=email,
+                                mail_password=password,
+                                mail_user_id=_mail_user_id(mail_response),
+                                status="created"
+                            )
                     logger.info(f"✅ Почтовый ящик для {login} успешно создан и сохранен в БД")
                 except Exception as db_error:
                     logger.error(f"Ошибка сохранения в БД: {db_error}")
-                finally:
-                    await conn.close()
             else:
                 # Если нет employee_id, создаем запись в логе
                 logger.info(f"✅ Почтовый ящик для {login} создан, но нет связи с БД")
@@ -99,9 +115,8 @@ async def create_mail_account_async(
             # Обновляем статус в БД при ошибке
             if employee_id:
                 try:
-                    conn = await get_db_connection()
-                    await update_employee_mail_status(conn, employee_id, "error", error_msg)
-                    await conn.close()
+                    async with db_connection() as conn:
+                        await update_employee_mail_status(conn, employee_id, "error", error_msg)
                 except Exception:
                     pass
 
@@ -114,19 +129,75 @@ async def create_mail_account_async(
         # Обновляем статус в БД при ошибке
         if employee_id:
             try:
-                conn = await get_db_connection()
-                await update_employee_mail_status(conn, employee_id, "error", str(e))
-                await conn.close()
+                async with db_connection() as conn:
+                    await update_employee_mail_status(conn, employee_id, "error", str(e))
             except Exception:
                 pass
 
         raise MailServiceError(f"Failed to create mail account: {str(e)}")
 
 
+async def open_mail_session() -> "aiohttp.ClientSession":
+    """Открыть общую keep-alive сессию для Mail.ru API (при первом вызове API)"""
+    global _session
+    if _session is None or _session.closed:
+        # aiohttp импортируется при первом обращении к API, а не при старте
+        import aiohttp
+        connector = aiohttp.TCPConnector(
+            limit=config.mail.max_connections,
+            ttl_dns_cache=config.mail.dns_cache_ttl,
+            keepalive_timeout=config.mail.keepalive_timeout,
+            ssl=False,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=config.mail.timeout,
+                connect=config.mail.connect_timeout,
+            ),
+        )
+    return _session
+
+
+async def close_mail_session():
+    """Закрыть общую сессию Mail.ru API"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Задержка перед повтором: Retry-After или экспонента с полным джиттером"""
+    if retry_after:
+        try:
+            return min(float(retry_after), config.mail.retry_max_delay)
+        except ValueError:
+            pass
+    return random.uniform(0, min(config.mail.retry_base_delay * 2 ** attempt, config.mail.retry_max_delay))
+
+
+def _mail_user_id(mail_response: Dict[str, Any]) -> Optional[str]:
+    """id ящика из ответа API (число) в формате колонки mail_user_id"""
+    user_id = mail_response.get("response_json", {}).get("id")
+    return str(user_id) if user_id is not None else None
+
+
+def _already_exists(error_text: str) -> bool:
+    text = error_text.lower().replace("_", " ")
+    return "already exist" in text
+
+
 async def call_mail_api(access_token: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Вызов API Mail.ru для создания пользователя
 
+    Ответы 429 и 503, а также ошибки установки соединения повторяются
+    до mail.retries раз с джиттером. Обрыв или таймаут после отправки
+    запроса не повторяется: ящик мог быть создан. Ответ «пользователь
+    уже существует» считается успехом — это ящик из прошлой попытки
+    (логин уникален в employees).
+
     Args:
         access_token: Токен доступа
         user_data: Данные пользователя
@@ -134,52 +205,62 @@ async def call_mail_api(access_token: str, user_data: Dict[str, Any]) -> Dict[st
     Returns:
         Ответ от API Mail.ru
     """
-    try:
+    import aiohttp
 
-        logger.info(f"Вызов Mail.ru API для пользователя: {user_data['username']}")
+    logger.info(f"Вызов Mail.ru API для пользователя: {user_data['username']}")
+    session = await open_mail_session()
 
-        async with aiohttp.ClientSession() as session:
+    for attempt in range(config.mail.retries + 1):
+        last_attempt = attempt == config.mail.retries
+        started = time.perf_counter()
+        try:
             async with session.post(
                 f"{config.mail.api_url}/domains/{config.mail.domain_id}/users",
                 params={"access_token": access_token},
                 json=user_data,
-                ssl=False
             ) as response:
                 if response.status == 201:
                     logger.info("Вызов Mail.ru API: статус код 201")
                     response_json = await response.json()
+                    MAIL_CALLS.observe(started)
                     return {"success": True, "response_json": response_json}
-                else:
-                    error_text = await response.text()
-                    return {"success": False, "error": error_text}
-
-        # Для тестирования можно раскомментировать для имитации ошибки:
-        # if secrets.randbelow(10) < 2:  # 20% chance of error
-        #     return {
-        #         "success": False,
-        #         "error": "Domain quota exceeded"
-        #     }
-
-        # return {
-        #     "success": True,
-        #     "user_id": f"mail_user_{secrets.token_hex(8)}",
-        #     "domain_id": config.mail.domain_id,
-        #     "email": user_data['email'],
-        #     "mail_user_id": f"MU{secrets.token_hex(10)}"
-        # }
-
-    except aiohttp.ClientError as e:
-        logger.error(f"Сетевая ошибка при вызове Mail.ru API: {str(e)}")
-        return {
-            "success": False,
-            "error": f"Network error: {str(e)}"
-        }
-    except Exception as e:
-        logger.error(f"Ошибка при вызове Mail.ru API: {str(e)}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+
+                error_text = await response.text()
+                if response.status in (400, 409) and _already_exists(error_text):
+                    logger.warning(f"⚠️ Почтовый ящик {user_data['username']} уже существует, считаем созданным")
+                    MAIL_CALLS.observe(started)
+                    return {"success": True, "response_json": {}, "already_exists": True}
+
+                MAIL_CALLS.observe(started, failed=True)
+                if response.status in RETRY_STATUSES and not last_attempt:
+                    delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+                    logger.warning(f"⚠️ Mail.ru API ответил {response.status}, повтор через {delay:.1f}с")
+                    await asyncio.sleep(delay)
+                    continue
+
+                return {"success": False, "error": error_text}
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            MAIL_CALLS.observe(started, failed=True)
+            connect_error = isinstance(e, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError))
+            if connect_error and not last_attempt:
+                delay = _retry_delay(attempt)
+                logger.warning(f"⚠️ Сетевая ошибка Mail.ru API ({e!r}), повтор через {delay:.1f}с")
+                await asyncio.sleep(delay)
+                continue
+
+            logger.error(f"Сетевая ошибка при вызове Mail.ru API: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Network error: {str(e)}"
+            }
+        except Exception as e:
+            MAIL_CALLS.observe(started, failed=True)
+            logger.error(f"Ошибка при вызове Mail.ru API: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
 
 
 # Синхронная версия для обратной совместимости
@@ -6,7 +6,7 @@ class OnboardingService:
     def __init__(self, bitwarden: BitwardenVaultClient):
         self.bitwarden = bitwarden
 
-    def onboard_employee(
+    async def onboard_employee(
         self,
         employee_email: str,
         system_name: str,
@@ -15,7 +15,7 @@ class OnboardingService:
     ) -> dict:
         password = generate_password()
 
-        item = self.bitwarden.create_login(
+        item = await self.bitwarden.create_login(
             organization_id=organization_id,
             collection_id=collection_id,
             name=f"{system_name} — {employee_email}",
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from config.config import AuthConfig, load_config
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """
+    bcrypt вне event loop.
+
+    hashpw/checkpw отпускают GIL, поэтому выполняются в отдельном пуле
+    потоков из hash_workers потоков. Число операций в работе и в очереди
+    ограничено hash_max_pending — лишние логины ждут слота, а не занимают CPU.
+    """
+
+    def __init__(self, config: AuthConfig):
+        self.config = config
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.hash_workers,
+            thread_name_prefix="password-hasher",
+        )
+        self._slots = asyncio.Semaphore(config.hash_max_pending)
+
+    async def _run(self, fn, *args):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def hash(self, password: str) -> str:
+        """Хэш пароля с текущей стоимостью bcrypt_rounds"""
+        import bcrypt
+
+        salt = bcrypt.gensalt(rounds=self.config.bcrypt_rounds)
+        hashed = await self._run(bcrypt.hashpw, password.encode(), salt)
+        return hashed.decode()
+
+    async def verify(self, password: str, hash_: str) -> bool:
+        import bcrypt
+
+        try:
+            return await self._run(bcrypt.checkpw, password.encode(), hash_.encode())
+        except ValueError:
+            logger.warning("Некорректный bcrypt-хэш в таблице users")
+            return False
+
+    def needs_rehash(self, hash_: str) -> bool:
+        """Хэш создан с другой стоимостью, чем bcrypt_rounds ("$2b$12$...")"""
+        try:
+            return int(hash_.split("$")[2]) != self.config.bcrypt_rounds
+        except (IndexError, ValueError):
+            return True
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Хэшер паролей процесса (создаётся при первом обращении)"""
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(load_config().auth)
+    return _hasher
+
+
+def close_password_hasher():
+    """Остановить пул потоков хэшера"""
+    global _hasher
+    if _hasher is not None:
+        _hasher.close()
+        _hasher = None
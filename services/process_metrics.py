@@ -0,0 +1,107 @@
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from core.metrics import REGISTRY, Collected
+from database.audit_log import get_audit_sink
+from database.connection import get_pool_stats
+from services.ad_gateway import get_ad_gateway_pending
+from services.mail_service import token_manager
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Метрики, общие для процессов приложения и воркера: метрики вызовов
+# бэкендов заводятся в core.metrics, здесь — то, что читается при выгрузке
+
+# -------------------------
+# Пул соединений БД
+# -------------------------
+def _pool_connections():
+    stats = get_pool_stats()
+    return [(("idle",), stats["idle"]), (("in_use",), stats["in_use"])]
+
+
+def _pool_stat(key: str, scale: float = 1.0):
+    return lambda: [((), get_pool_stats()[key] * scale)]
+
+
+Collected("staffflow_db_pool_connections", "Соединения пула БД по состоянию", ("state",), _pool_connections)
+Collected("staffflow_db_pool_max_size", "Максимальный размер пула БД", (), _pool_stat("max_size"))
+Collected(
+    "staffflow_db_pool_acquired_total", "Выдачи соединений из пула БД", (),
+    _pool_stat("acquired"), type="counter",
+)
+Collected(
+    "staffflow_db_pool_acquire_timeouts_total", "Таймауты ожидания соединения из пула БД", (),
+    _pool_stat("acquire_timeouts"), type="counter",
+)
+Collected(
+    "staffflow_db_pool_acquire_wait_seconds_total", "Суммарное ожидание соединений из пула БД", (),
+    _pool_stat("wait_time_total_ms", 0.001), type="counter",
+)
+Collected(
+    "staffflow_db_pool_connections_created_total", "Созданные соединения пула БД", (),
+    _pool_stat("connections_created"), type="counter",
+)
+
+# -------------------------
+# Фоновые очереди
+# -------------------------
+Collected(
+    "staffflow_background_queue_depth",
+    "События и операции, ожидающие фоновой обработки в процессе",
+    ("queue",),
+    lambda: [
+        (("audit_log",), get_audit_sink().stats()["queued"]),
+        (("ad_gateway",), get_ad_gateway_pending()),
+    ],
+)
+
+# -------------------------
+# Токены Mail.ru
+# -------------------------
+Collected(
+    "staffflow_mail_token_refresh_total",
+    "Обновления OAuth-токена Mail.ru по результату",
+    ("result",),
+    lambda: [(("ok",), token_manager.refresh_count), (("error",), token_manager.refresh_failures)],
+    type="counter",
+)
+
+
+# -------------------------
+# Отдельный листенер /metrics
+# -------------------------
+_runner: Optional[web.AppRunner] = None
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(body=REGISTRY.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def start_metrics_server(host: str, port: int):
+    """
+    Поднять /metrics для процесса без HTTP-сервера (воркер провижининга).
+
+    port = 0 — листенер не запускается.
+    """
+    global _runner
+    if not port or _runner is not None:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    _runner = runner
+    logger.info(f"📈 Метрики доступны на http://{host}:{port}/metrics")
+
+
+async def stop_metrics_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
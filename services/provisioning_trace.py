@@ -0,0 +1,130 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from database.db import save_provisioning_spans
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+
+# Текст ошибки шага обрезается — полный текст есть в operation_logs
+ERROR_MAX_LENGTH = 300
+
+
+class Span:
+    """Шаг регистрации: начало, длительность и ошибка (None — успех)"""
+    __slots__ = ("step", "started_at", "duration_ms", "error")
+
+    def __init__(self, step: str, started_at: datetime, duration_ms: float = 0.0, error: Optional[str] = None):
+        self.step = step
+        self.started_at = started_at
+        self.duration_ms = duration_ms
+        self.error = error
+
+    def fail(self, error: Any):
+        """Отметить шаг неудачным (для шагов, которые возвращают ошибку, а не бросают её)"""
+        self.error = (str(error) or "error")[:ERROR_MAX_LENGTH]
+
+
+class Trace:
+    """
+    Трасса одной регистрации.
+
+    trace_id создаётся при регистрации и передаётся задачам провижининга,
+    поэтому шаги API и воркеров собираются в одну трассу. Шаги копятся
+    в памяти и записываются одним запросом (save).
+    """
+
+    def __init__(self, trace_id: Optional[uuid.UUID] = None, employee_id: Optional[int] = None):
+        self.trace_id = trace_id or uuid.uuid4()
+        self.employee_id = employee_id
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, step: str) -> Iterator[Span]:
+        span = Span(step, datetime.now())
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            if span.error is None:
+                span.fail(str(e) or e.__class__.__name__)
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            self.spans.append(span)
+
+    def add(self, step: str, duration: float, error: Optional[str] = None):
+        """Добавить шаг, закончившийся сейчас и длившийся duration секунд"""
+        self.spans.append(Span(step, datetime.now() - timedelta(seconds=duration), duration * 1000, error))
+
+    async def save(self, conn):
+        await save_provisioning_spans(conn, [
+            (self.trace_id, self.employee_id, s.step, s.started_at, s.duration_ms, s.error)
+            for s in self.spans
+        ])
+        self.spans.clear()
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("provisioning_trace", default=None)
+
+
+@contextmanager
+def start_trace(trace_id: Optional[uuid.UUID] = None, employee_id: Optional[int] = None) -> Iterator[Trace]:
+    """Сделать трассу текущей для span() в этом контексте (и в потоках AD-шлюза)"""
+    trace = Trace(trace_id, employee_id)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(step: str) -> Iterator[Span]:
+    """Записать шаг в текущую трассу; вне трассы только выполняет блок"""
+    trace = _current.get()
+    if trace is None:
+        yield Span(step, datetime.now())
+        return
+    with trace.span(step) as current:
+        yield current
+
+
+def build_timeline(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Водопад по трассам: шаги со смещением от начала трассы.
+
+    rows — шаги из get_provisioning_spans (по возрастанию started_at).
+    """
+    traces: Dict[uuid.UUID, List[Dict[str, Any]]] = {}
+    for row in rows:
+        traces.setdefault(row["trace_id"], []).append(row)
+
+    timeline = []
+    for trace_id, spans in traces.items():
+        started_at = spans[0]["started_at"]
+        finished_at = max(s["started_at"] + timedelta(milliseconds=s["duration_ms"]) for s in spans)
+        timeline.append({
+            "trace_id": str(trace_id),
+            "started_at": started_at.isoformat(),
+            "duration_ms": round((finished_at - started_at).total_seconds() * 1000, 1),
+            "spans": [
+                {
+                    "step": s["step"],
+                    "started_at": s["started_at"].isoformat(),
+                    "offset_ms": round((s["started_at"] - started_at).total_seconds() * 1000, 1),
+                    "duration_ms": round(s["duration_ms"], 1),
+                    "outcome": OUTCOME_OK if s["error"] is None else OUTCOME_ERROR,
+                    "error": s["error"],
+                }
+                for s in spans
+            ],
+        })
+    return timeline
@@ -0,0 +1,230 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import socket
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from config.config import QueueConfig, load_config
+from database.connection import db_connection
+from database.db import (
+    claim_provisioning_job,
+    complete_provisioning_job,
+    fail_provisioning_job,
+)
+from services.provisioning_trace import span, start_trace
+
+logger = logging.getLogger(__name__)
+
+# Типы задач провижининга
+JOB_AD = "ad"
+JOB_MAIL = "mail"
+JOB_BITWARDEN = "bitwarden"
+
+# Поля payload с паролем. В очереди (а значит, в WAL и бэкапах) они
+# хранятся только зашифрованными, под ключом "<поле>_sealed"
+SECRET_FIELDS = ("password", "custom_password")
+SEALED_SUFFIX = "_sealed"
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+_cipher: Optional[Fernet] = None
+
+
+def _get_cipher() -> Fernet:
+    global _cipher
+    if _cipher is None:
+        key = hashlib.sha256(load_config().queue.payload_secret.encode()).digest()
+        _cipher = Fernet(base64.urlsafe_b64encode(key))
+    return _cipher
+
+
+def seal_secrets(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Зашифровать пароли payload перед постановкой задачи в очередь"""
+    sealed = dict(payload)
+    for field in SECRET_FIELDS:
+        value = sealed.pop(field, None)
+        if value is not None:
+            sealed[field + SEALED_SUFFIX] = _get_cipher().encrypt(value.encode()).decode()
+    return sealed
+
+
+def open_secrets(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Расшифровать пароли payload в обработчике задачи"""
+    opened = dict(payload)
+    for field in SECRET_FIELDS:
+        token = opened.pop(field + SEALED_SUFFIX, None)
+        if token is None:
+            continue
+        try:
+            opened[field] = _get_cipher().decrypt(token.encode()).decode()
+        except InvalidToken:
+            raise RuntimeError("Не удалось расшифровать пароль задачи: сменился QUEUE_PAYLOAD_SECRET?")
+    return opened
+
+
+async def _run_ad(payload: Dict[str, Any]):
+    from services.ad_service import create_ad_account
+    return await create_ad_account(**open_secrets(payload))
+
+
+async def _run_mail(payload: Dict[str, Any]):
+    from services.mail_service import create_mail_account_async
+    return await create_mail_account_async(**open_secrets(payload))
+
+
+async def _run_bitwarden(payload: Dict[str, Any]):
+    from services.bitwarden_service import create_bitwarden_password
+    result = await create_bitwarden_password(**open_secrets(payload))
+    if not result.get("success"):
+        raise RuntimeError(result.get("error", "Bitwarden error"))
+    return result
+
+
+HANDLERS: Dict[str, JobHandler] = {
+    JOB_AD: _run_ad,
+    JOB_MAIL: _run_mail,
+    JOB_BITWARDEN: _run_bitwarden,
+}
+
+
+def build_provisioning_jobs(
+        user,
+        login: str,
+        email: str,
+        employee_id: int,
+        max_attempts: int
+) -> List[Tuple[str, Dict[str, Any], int]]:
+    """Собрать задачи (kind, payload, max_attempts) для UserCreateRequest; пароли зашифрованы"""
+    jobs = []
+
+    if user.adRequired:
+        jobs.append((JOB_AD, seal_secrets({
+            "last_name": user.lastName,
+            "first_name": user.firstName,
+            "login": login,
+            "position": user.position,
+            "employee_id": employee_id,
+            "password": user.password,
+        }), max_attempts))
+
+    if user.mailRequired:
+        jobs.append((JOB_MAIL, seal_secrets({
+            "last_name": user.lastName,
+            "first_name": user.firstName,
+            "login": login,
+            "position": user.position,
+            "email": email,
+            "employee_id": employee_id,
+            "custom_password": user.password,
+        }), max_attempts))
+
+    if user.bitwardenRequired:
+        jobs.append((JOB_BITWARDEN, seal_secrets({
+            "login": login,
+            "password": user.password,
+            "position": user.position,
+        }), max_attempts))
+
+    return jobs
+
+
+class ProvisioningWorker:
+    """
+    Воркер очереди provisioning_jobs.
+
+    Для каждого типа задач запускается столько корутин, сколько задано
+    лимитом параллелизма в QueueConfig, поэтому медленный бэкенд
+    не задерживает задачи остальных.
+    """
+
+    def __init__(self, config: Optional[QueueConfig] = None, worker_id: Optional[str] = None):
+        self.config = config or load_config().queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = asyncio.Event()
+
+    def concurrency(self) -> Dict[str, int]:
+        return {
+            JOB_AD: self.config.ad_concurrency,
+            JOB_MAIL: self.config.mail_concurrency,
+            JOB_BITWARDEN: self.config.bitwarden_concurrency,
+        }
+
+    def stop(self):
+        """Остановить воркер после завершения текущих задач"""
+        self._stop.set()
+
+    async def run(self):
+        slots = [
+            asyncio.create_task(self._slot(kind, n), name=f"provisioning-{kind}-{n}")
+            for kind, limit in self.concurrency().items()
+            for n in range(limit)
+        ]
+        logger.info(f"🚀 Воркер {self.worker_id} запущен: {self.concurrency()}")
+        try:
+            await asyncio.gather(*slots)
+        finally:
+            logger.info(f"🛑 Воркер {self.worker_id} остановлен")
+
+    async def _slot(self, kind: str, n: int):
+        slot_id = f"{self.worker_id}/{kind}-{n}"
+        while not self._stop.is_set():
+            try:
+                processed = await self.process_one(kind, slot_id)
+            except Exception as e:
+                logger.error(f"❌ Ошибка воркера {slot_id}: {e}")
+                processed = False
+
+            if not processed:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.config.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def process_one(self, kind: str, slot_id: str) -> bool:
+        """Захватить и выполнить одну задачу. Возвращает False, если очередь пуста"""
+        async with db_connection() as conn:
+            job = await claim_provisioning_job(conn, kind, slot_id, self.config.lease_seconds)
+
+        if not job:
+            return False
+
+        logger.info(f"▶️ Задача {job['id']} ({kind}), попытка {job['attempts']}")
+        error = None
+        with start_trace(job["trace_id"], job["employee_id"]) as trace:
+            trace.add(f"{kind}.queue", job["queued_for"])
+            try:
+                with span(f"{kind}.job"):
+                    await HANDLERS[kind](job["payload"])
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+
+        async with db_connection() as conn:
+            # Задачи, поставленные до появления трассировки, без trace_id
+            if job["trace_id"] is not None:
+                try:
+                    await trace.save(conn)
+                except Exception as e:
+                    logger.warning(f"⚠️ Не удалось записать трассу задачи {job['id']}: {e}")
+
+            if error is None:
+                await complete_provisioning_job(conn, job["id"])
+                logger.info(f"✅ Задача {job['id']} ({kind}) выполнена")
+            else:
+                retry_delay = self._retry_delay(job)
+                await fail_provisioning_job(conn, job["id"], error, retry_delay)
+                if retry_delay is None:
+                    logger.error(f"❌ Задача {job['id']} ({kind}) провалена: {error}")
+                else:
+                    logger.warning(f"⚠️ Задача {job['id']} ({kind}) будет повторена через {retry_delay}с: {error}")
+
+        return True
+
+    def _retry_delay(self, job: Dict[str, Any]) -> Optional[int]:
+        if job["attempts"] >= job["max_attempts"]:
+            return None
+        delay = self.config.retry_base_delay * 2 ** (job["attempts"] - 1)
+        return min(delay, self.config.retry_max_delay)
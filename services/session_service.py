@@ -0,0 +1,77 @@
+import base64
+import hashlib
+import hmac
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from config.config import load_config
+from core.cache import TTLCache
+from database.connection import db_connection
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+# Активные пользователи по id; запись удаляется при деактивации
+_user_cache = TTLCache(ttl=config.auth.user_cache_ttl, maxsize=config.auth.user_cache_size)
+
+
+def _digest(payload: str) -> bytes:
+    digest = hmac.new(config.auth.secret_key.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=")
+
+
+def _sign(payload: str) -> str:
+    return _digest(payload).decode()
+
+
+def create_session_token(user_id: int, ttl: Optional[int] = None) -> str:
+    """Подписанный токен сессии вида "<user_id>.<expires_at>.<hmac>\""""
+    expires_at = int(time.time()) + (ttl or config.auth.session_ttl)
+    payload = f"{user_id}.{expires_at}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_session_token(token: str) -> Optional[int]:
+    """Проверить подпись и срок действия токена; вернуть id пользователя или None"""
+    try:
+        user_id, expires_at, signature = token.split(".")
+        # Сравниваем байты: compare_digest на str с не-ASCII символами
+        # бросает TypeError, а подпись приходит из cookie как есть
+        if not hmac.compare_digest(signature.encode(), _digest(f"{user_id}.{expires_at}")):
+            return None
+        if int(expires_at) < time.time():
+            return None
+        return int(user_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+async def get_session_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Активный пользователь по id.
+
+    Результат кэшируется на auth_user_cache_ttl секунд, поэтому
+    аутентифицированные запросы обычно не обращаются к БД.
+    """
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    async with db_connection() as conn:
+        row = await conn.fetchrow(
+            "SELECT id, username FROM users WHERE id=$1 AND is_active=true",
+            user_id,
+        )
+    if not row:
+        return None
+
+    user = dict(row)
+    _user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id: Optional[int] = None):
+    """Сбросить кэш пользователя (или весь кэш), например при деактивации"""
+    _user_cache.invalidate(user_id)
@@ -0,0 +1,23 @@
+import logging
+from typing import Any, Dict
+
+from config.config import load_config
+from core.cache import TTLCache
+from database.connection import db_connection
+from database.db import get_employee_statistics
+
+logger = logging.getLogger(__name__)
+
+# Дашборд опрашивает /api/stats периодически — короткий кэш снимает нагрузку с БД
+_stats_cache = TTLCache(ttl=load_config().db.stats_cache_ttl, maxsize=1)
+
+
+async def get_statistics_snapshot() -> Dict[str, Any]:
+    """Статистика из дневных счётчиков с in-process кэшем"""
+    stats = _stats_cache.get("stats")
+    if stats is None:
+        async with db_connection() as conn:
+            stats = await get_employee_statistics(conn)
+        _stats_cache.set("stats", stats)
+
+    return dict(stats)
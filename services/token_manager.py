@@ -1,17 +1,14 @@
+import asyncio
 import json
-import time
 import threading
 from datetime import datetime, timedelta
-import requests
 import logging
 from typing import Optional, Dict
 from abc import ABC, abstractmethod
-import urllib3
 
-logger = logging.getLogger(__name__)
+from config.config import load_config
 
-# Отключаем предупреждения SSL
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+logger = logging.getLogger(__name__)
 
 
 class TokenStorage(ABC):
@@ -39,10 +36,18 @@ class FileTokenStorage(TokenStorage):
 
 
 class TokenManager:
+    """
+    Хранитель токенов Mail.ru OAuth.
+
+    Токен обновляется асинхронно: одновременные вызовы ждут один общий
+    запрос обновления, фоновая задача обновляет токен заранее
+    (за mail.token_refresh_margin секунд до истечения), а запись
+    в хранилище выполняется вне event loop.
+    """
     _instance = None
     _lock = threading.Lock()
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
@@ -51,56 +56,148 @@ class TokenManager:
 
     def __init__(self, storage: TokenStorage = None):
         if not hasattr(self, 'initialized'):
+            self.config = load_config().mail
             self.storage = storage or FileTokenStorage()
             self.tokens = self.storage.load() or {}
             # print("Доступные токены: ", self.tokens)
-            self.refresh_lock = threading.Lock()
+            self._refresh_task: Optional[asyncio.Task] = None
+            self._background_task: Optional[asyncio.Task] = None
+            self.refresh_count = 0
+            self.refresh_failures = 0
             self.initialized = True
 
-    def get_access_token(self) -> str:
+    async def get_access_token(self) -> str:
         """Получение валидного access_token с авто-обновлением"""
-        # Если токен отсутствует или просрочен
-        if not self.tokens.get('access_token') or self._is_expired():
-            self._refresh_tokens()
-
+        if self.tokens.get('access_token') and not self._is_expired():
+            # Токен скоро истечёт — обновляем в фоне, не задерживая вызывающего
+            if self._needs_refresh():
+                self._start_refresh()
+            return self.tokens['access_token']
+
+        # Токен отсутствует или просрочен — ждём общий запрос обновления
+        await self._refresh_tokens()
         return self.tokens['access_token']
 
+    def _expires_at(self, tokens: Optional[Dict] = None) -> Optional[datetime]:
+        tokens = self.tokens if tokens is None else tokens
+        if not tokens.get('expires_at'):
+            return None
+        return datetime.fromisoformat(tokens['expires_at'])
+
     def _is_expired(self) -> bool:
         """Проверка истечения срока токена"""
-        if not self.tokens.get('expires_at'):
+        expires_at = self._expires_at()
+        return expires_at is None or datetime.now() >= expires_at
+
+    def _needs_refresh(self, tokens: Optional[Dict] = None) -> bool:
+        """Токен пора обновлять заранее"""
+        expires_at = self._expires_at(tokens)
+        if expires_at is None:
             return True
+        return datetime.now() + timedelta(seconds=self.config.token_refresh_margin) > expires_at
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Запустить обновление, если оно ещё не выполняется (single-flight)"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+        return self._refresh_task
+
+    async def _refresh_tokens(self):
+        """Обновление токенов (ожидание общего запроса)"""
+        await asyncio.shield(self._start_refresh())
+
+    async def _do_refresh(self):
+        """
+        Обновление под advisory-блокировкой в БД.
 
-        expires_at = datetime.fromisoformat(self.tokens['expires_at'])
-        # Обновляем за 5 минут до истечения
-        return datetime.now() + timedelta(minutes=5) > expires_at
+        Веб-процесс и воркеры делят один refresh_token: если провайдер
+        выдаёт новый refresh_token при каждом обновлении, параллельные
+        обновления из разных процессов аннулируют токены друг друга.
+        Под блокировкой хранилище перечитывается — если другой процесс
+        уже обновил токен, берём его без запроса к провайдеру.
+        """
+        from database.connection import db_connection
 
-    def _refresh_tokens(self):
-        """Обновление токенов"""
-        with self.refresh_lock:
-            refresh_token = self.tokens.get('refresh_token')
-            # print("refresh_token: ", refresh_token)
+        async with db_connection(transaction=True) as conn:
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('mail_token_refresh'))")
 
-            if not refresh_token:
-                raise ValueError("No refresh token available")
+            stored = await asyncio.to_thread(self.storage.load)
+            if stored and stored.get('access_token') and not self._needs_refresh(stored):
+                self.tokens = stored
+                logger.info("Токен уже обновлён другим процессом")
+                return
+            if stored and stored.get('refresh_token'):
+                self.tokens = stored
 
+            await self._request_tokens()
+
+    async def _request_tokens(self):
+        import aiohttp
+
+        refresh_token = self.tokens.get('refresh_token')
+        # print("refresh_token: ", refresh_token)
+
+        if not refresh_token:
+            raise ValueError("No refresh token available")
+
+        try:
             # Запрос на обновление токена
-            response = requests.post(
-                "https://o2.mail.ru/token",
-                data={
-                    "client_id": "J34ZMt9oJv3jnx4KuSf2E5RQTxKmNbR5",
-                    "grant_type": "refresh_token",
-                    "refresh_token": refresh_token
-                },
-                verify=False
-            )
-
-            if response.status_code == 200:
-                new_tokens = response.json()
-                self._update_tokens(new_tokens)
-                logger.info("Tokens refreshed successfully")
-            else:
-                logger.error(f"Token refresh failed: {response.text}")
-                raise Exception("Token refresh failed")
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.config.timeout)) as session:
+                async with session.post(
+                    self.config.token_url,
+                    data={
+                        "client_id": self.config.client_id,
+                        "grant_type": "refresh_token",
+                        "refresh_token": refresh_token
+                    },
+                    ssl=False
+                ) as response:
+                    if response.status != 200:
+                        text = await response.text()
+                        logger.error(f"Token refresh failed: {text}")
+                        raise Exception("Token refresh failed")
+                    new_tokens = await response.json(content_type=None)
+        except Exception:
+            self.refresh_failures += 1
+            raise
+
+        await asyncio.to_thread(self._update_tokens, new_tokens)
+        self.refresh_count += 1
+        logger.info("Tokens refreshed successfully")
+
+    def start_background_refresh(self):
+        """Запустить фоновое обновление токена до истечения (вызывается в lifespan)"""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._background_refresh())
+
+    async def stop_background_refresh(self):
+        """Остановить фоновое обновление токена"""
+        if self._background_task is not None:
+            self._background_task.cancel()
+            try:
+                await self._background_task
+            except asyncio.CancelledError:
+                pass
+            self._background_task = None
+
+    async def _background_refresh(self):
+        while True:
+            if not self.tokens.get('refresh_token'):
+                # Токенов ещё нет (get_tokens не выполнялся) — проверим позже
+                await asyncio.sleep(60)
+                continue
+
+            if self._needs_refresh():
+                try:
+                    await self._refresh_tokens()
+                except Exception as e:
+                    logger.error(f"Фоновое обновление токена не удалось: {e}")
+                    await asyncio.sleep(30)
+                    continue
+
+            expires_at = self._expires_at()
+            delay = (expires_at - datetime.now()).total_seconds() - self.config.token_refresh_margin
+            await asyncio.sleep(max(delay, 1))
 
     def _update_tokens(self, new_tokens: Dict):
         """Обновление токенов с сохранением"""
@@ -123,6 +220,3 @@ class TokenManager:
         """Очистка токенов (логаут)"""
         self.tokens = {}
         self.storage.save({})
-
-
-
@@ -0,0 +1,70 @@
+from services.ad_group_resolver import (
+    MATCH_ANY,
+    MATCH_EXACT,
+    MATCH_PREFIX,
+    MATCH_REGEX,
+    GroupRule,
+    GroupRuleMatcher,
+)
+
+
+def rule(id, position, match_type=MATCH_EXACT, groups=("G",), priority=100, merge=False):
+    return GroupRule(id=id, position=position, match_type=match_type,
+                     ad_groups=tuple(groups), priority=priority, merge=merge)
+
+
+def test_exact_match_is_normalized():
+    matcher = GroupRuleMatcher.compile([rule(1, "Ведущий  Инженер", groups=("Engineers",))])
+    assert matcher.resolve("ведущий инженер") == ("Engineers",)
+    assert matcher.resolve("Инженер") == ()
+
+
+def test_null_position_without_any_matches_nobody():
+    # Так вели себя старые правила без должности (position = $1 не совпадало с NULL)
+    matcher = GroupRuleMatcher.compile([rule(1, None, groups=("Everyone",))])
+    assert matcher.resolve("Инженер") == ()
+
+
+def test_any_rule_applies_to_everyone():
+    matcher = GroupRuleMatcher.compile([rule(1, None, MATCH_ANY, groups=("Staff",))])
+    assert matcher.resolve("Инженер") == ("Staff",)
+    assert matcher.resolve("") == ("Staff",)
+
+
+def test_specificity_breaks_priority_ties():
+    matcher = GroupRuleMatcher.compile([
+        rule(1, None, MATCH_ANY, groups=("Any",)),
+        rule(2, ".*инженер", MATCH_REGEX, groups=("Regex",)),
+        rule(3, "ведущий", MATCH_PREFIX, groups=("Short",)),
+        rule(4, "ведущий инж", MATCH_PREFIX, groups=("Long",)),
+        rule(5, "ведущий инженер", groups=("Exact",)),
+    ])
+    assert [r.id for r in matcher.match("Ведущий инженер")] == [5, 4, 3, 2, 1]
+    assert matcher.resolve("Ведущий инженер") == ("Exact",)
+    assert matcher.resolve("Ведущий аналитик") == ("Short",)
+    assert matcher.resolve("Старший инженер") == ("Regex",)
+
+
+def test_priority_wins_over_specificity():
+    matcher = GroupRuleMatcher.compile([
+        rule(1, "инженер", groups=("Exact",), priority=100),
+        rule(2, None, MATCH_ANY, groups=("Any",), priority=10),
+    ])
+    assert matcher.resolve("Инженер") == ("Any",)
+
+
+def test_merge_rules_add_groups_to_the_base_rule():
+    matcher = GroupRuleMatcher.compile([
+        rule(1, "инженер", groups=("Engineers", "VPN")),
+        rule(2, "инж", MATCH_PREFIX, groups=("Jira",), priority=200),
+        rule(3, None, MATCH_ANY, groups=("Staff", "VPN"), priority=300, merge=True),
+    ])
+    assert matcher.resolve("Инженер") == ("Engineers", "VPN", "Staff")
+
+
+def test_invalid_regex_rule_is_skipped():
+    matcher = GroupRuleMatcher.compile([
+        rule(1, "[", MATCH_REGEX, groups=("Broken",)),
+        rule(2, None, MATCH_ANY, groups=("Staff",)),
+    ])
+    assert matcher.resolve("Инженер") == ("Staff",)
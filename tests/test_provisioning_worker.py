@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services.provisioning_worker import JOB_AD, JOB_MAIL, build_provisioning_jobs, open_secrets, seal_secrets
+
+
+def test_jobs_do_not_carry_plaintext_password():
+    user = SimpleNamespace(
+        lastName="Иванов", firstName="Иван", position="Инженер", password="S3cret-pass!",
+        adRequired=True, mailRequired=True, bitwardenRequired=True,
+    )
+    jobs = build_provisioning_jobs(user, "i.ivanov", "i.ivanov@example.com", 1, 5)
+
+    assert len(jobs) == 3
+    for kind, payload, _ in jobs:
+        assert "S3cret-pass!" not in repr(payload)
+        opened = open_secrets(payload)
+        assert opened[("custom_password" if kind == JOB_MAIL else "password")] == "S3cret-pass!"
+    assert open_secrets(jobs[0][1])["login"] == "i.ivanov" and jobs[0][0] == JOB_AD
+
+
+def test_payload_without_secrets_is_unchanged():
+    payload = {"login": "i.ivanov", "position": "Инженер"}
+    assert seal_secrets(payload) == payload
+    assert open_secrets(payload) == payload
+
+
+def test_tampered_secret_fails_the_job():
+    payload = seal_secrets({"password": "x"})
+    payload["password_sealed"] = payload["password_sealed"][:-2] + "AA"
+    with pytest.raises(RuntimeError):
+        open_secrets(payload)
@@ -0,0 +1,26 @@
+import time
+
+from services.session_service import create_session_token, verify_session_token
+
+
+def test_valid_token_returns_user_id():
+    assert verify_session_token(create_session_token(42)) == 42
+
+
+def test_tampered_token_is_rejected():
+    user_id, expires_at, signature = create_session_token(42).split(".")
+    assert verify_session_token(f"43.{expires_at}.{signature}") is None
+    assert verify_session_token(f"{user_id}.{int(expires_at) + 1}.{signature}") is None
+    flipped = "B" if signature[0] == "A" else "A"
+    assert verify_session_token(f"{user_id}.{expires_at}.{flipped}{signature[1:]}") is None
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    token = create_session_token(42, ttl=60)
+    monkeypatch.setattr(time, "time", lambda: 10 ** 12)
+    assert verify_session_token(token) is None
+
+
+def test_malformed_token_is_rejected():
+    for token in ("", "42", "42.1", "a.b.c", "42.1.2.3", "42.9999999999.\xc3\xa9", "42.9999999999.\udcc3"):
+        assert verify_session_token(token) is None
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import signal
+
+from config.config import load_config, Config
+from database.connection import init_db, close_db
+from database.audit_log import start_audit_sink, stop_audit_sink
+from services.provisioning_worker import ProvisioningWorker
+from services.ad_gateway import close_ad_gateway
+from services.mail_service import open_mail_session, close_mail_session, token_manager
+from services.bitwarden_vault_client import close_vault_client
+from services.process_metrics import start_metrics_server, stop_metrics_server
+
+# Загрузка конфигурации
+config: Config = load_config()
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.getLevelName(level=config.log.level),
+    format=config.log.format,
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    """
+    Отдельный процесс-воркер очереди провижининга.
+
+    Вызовы AD, Mail.ru и bw serve идут отсюда, поэтому их метрики
+    выгружаются собственным листенером: http://QUEUE_METRICS_HOST:QUEUE_METRICS_PORT/metrics
+    (по умолчанию 0.0.0.0:9101, QUEUE_METRICS_PORT=0 отключает).
+    """
+    logger.info("🚀 Starting StaffFlow provisioning worker...")
+    await init_db()
+    await start_audit_sink()
+    await open_mail_session()
+    token_manager.start_background_refresh()
+    await start_metrics_server(config.queue.metrics_host, config.queue.metrics_port)
+
+    worker = ProvisioningWorker(config.queue)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        logger.info("🛑 Shutting down StaffFlow provisioning worker...")
+        await stop_metrics_server()
+        close_ad_gateway()
+        await token_manager.stop_background_refresh()
+        await close_mail_session()
+        await close_vault_client()
+        await stop_audit_sink()
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())